@@ -182,6 +182,10 @@ doctype_list_js = {
 # before_install = "kenya_compliance.install.before_install"
 # after_install = "kenya_compliance.kenya_compliance.setup.after_install.after_install"
 
+after_migrate = [
+    "kenya_compliance.kenya_compliance.setup.after_install.create_etims_indexes"
+]
+
 # Uninstallation
 # ------------
 
@@ -244,7 +248,11 @@ doc_events = {
     # 	}
     "Sales Invoice": {
         "on_submit": [
-            "kenya_compliance.kenya_compliance.overrides.server.sales_invoice.on_submit"
+            "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.on_submit",
+            "kenya_compliance.kenya_compliance.overrides.server.sales_invoice.on_submit",
+        ],
+        "on_cancel": [
+            "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.on_cancel"
         ],
         "validate": [
             "kenya_compliance.kenya_compliance.overrides.server.shared_overrides.validate"
@@ -252,17 +260,45 @@ doc_events = {
     },
     "Purchase Invoice": {
         "on_submit": [
-            "kenya_compliance.kenya_compliance.overrides.server.purchase_invoice.on_submit"
+            "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.on_submit",
+            "kenya_compliance.kenya_compliance.overrides.server.purchase_invoice.on_submit",
+        ],
+        "on_cancel": [
+            "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.on_cancel"
         ],
         "validate": [
             "kenya_compliance.kenya_compliance.overrides.server.purchase_invoice.validate"
         ],
     },
+    "POS Invoice": {
+        "on_submit": [
+            "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.on_submit"
+        ],
+        "on_cancel": [
+            "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.on_cancel"
+        ],
+    },
+    "Stock Ledger Entry": {
+        "on_submit": [
+            "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.on_submit"
+        ],
+    },
     "Item": {
         "validate": [
             "kenya_compliance.kenya_compliance.overrides.server.item.validate"
         ],
     },
+    "Item Tax Template": {
+        "on_update": [
+            "kenya_compliance.kenya_compliance.overrides.server.item_tax_template.clear_item_tax_templates_cache"
+        ],
+        "on_trash": [
+            "kenya_compliance.kenya_compliance.overrides.server.item_tax_template.clear_item_tax_templates_cache"
+        ],
+        "after_rename": [
+            "kenya_compliance.kenya_compliance.overrides.server.item_tax_template.clear_item_tax_templates_cache"
+        ],
+    },
 }
 
 # Scheduled Tasks
@@ -272,14 +308,19 @@ scheduler_events = {
     "all": [
         "kenya_compliance.kenya_compliance.background_tasks.tasks.send_stock_information",
         "kenya_compliance.kenya_compliance.background_tasks.tasks.send_item_inventory_information",
+        "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.fold_submission_counters",
+    ],
+    "daily": [
+        "kenya_compliance.kenya_compliance.metrics.delete_old_metrics",
+        "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.rebuild_submission_backlog",
+        "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog.delete_old_throughput",
     ],
-    # 	"daily": [
-    # 		"kenya_compliance.tasks.daily"
-    # 	],
     "hourly": [
         "kenya_compliance.kenya_compliance.background_tasks.tasks.send_sales_invoices_information",
         "kenya_compliance.kenya_compliance.background_tasks.tasks.send_purchase_information",
         "kenya_compliance.kenya_compliance.background_tasks.tasks.refresh_notices",
+        "kenya_compliance.kenya_compliance.background_tasks.tasks.resume_pending_sync_jobs",
+        "kenya_compliance.kenya_compliance.metrics.fold_metrics",
     ],
     # 	"weekly": [
     # 		"kenya_compliance.tasks.weekly"
@@ -320,13 +361,16 @@ scheduler_events = {
 
 # Request Events
 # ----------------
-# before_request = ["kenya_compliance.utils.before_request"]
-# after_request = ["kenya_compliance.utils.after_request"]
+before_request = ["kenya_compliance.kenya_compliance.logger.set_etims_log_level"]
+after_request = ["kenya_compliance.kenya_compliance.metrics.maybe_flush_metrics"]
 
 # Job Events
 # ----------
-# before_job = ["kenya_compliance.utils.before_job"]
-# after_job = ["kenya_compliance.utils.after_job"]
+before_job = ["kenya_compliance.kenya_compliance.logger.set_etims_log_level"]
+after_job = [
+    "kenya_compliance.kenya_compliance.metrics.flush_metrics_after_job",
+    "kenya_compliance.kenya_compliance.logger.flush_etims_logs",
+]
 
 # User Data Protection
 # --------------------
@@ -1,17 +1,32 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Callable, Literal
+import os
+from typing import TYPE_CHECKING, Callable, Literal
 from urllib import parse
 
-import aiohttp
-
 import frappe
 from frappe.integrations.utils import create_request_log
 from frappe.model.document import Document
 
+from ..doctype.doctype_names_mapping import SYNC_JOB_DOCTYPE_NAME
+from ..doctype.navari_etims_sync_job.navari_etims_sync_job import (
+    process_sync_job,
+    remove_spool_file,
+    validate_records_callback,
+)
 from ..logger import etims_logger
-from ..utils import make_post_request, update_last_request_date
+from ..metrics import maybe_flush_metrics, measure
+from ..utils import (
+    make_post_request,
+    make_spooled_post_request,
+    make_streaming_post_request,
+    read_spooled_envelope,
+    update_last_request_date,
+)
+
+if TYPE_CHECKING:
+    import aiohttp
 
 
 class BaseEndpointsBuilder:
@@ -161,6 +176,7 @@ class EndpointsBuilder(BaseEndpointsBuilder):
         self, doctype: Document | str | None = None, document_name: str | None = None
     ) -> None:
         """The function that handles the communication to the remote servers.
+        The duration of each stage of the call is recorded in the eTims metrics.
 
         Args:
             doctype (Document | str | None, optional): The doctype calling this object. Defaults to None.
@@ -169,6 +185,48 @@ class EndpointsBuilder(BaseEndpointsBuilder):
         Returns:
             Any: The response received.
         """
+        from aiohttp import ClientConnectorError, ClientOSError
+
+        try:
+            with measure("total", **self.get_metric_labels(doctype)):
+                self.prepare_remote_call(doctype, document_name)
+
+                try:
+                    with measure("http", **self.get_metric_labels(doctype)):
+                        response = self.send_request()
+
+                    self.handle_response(response)
+
+                except (
+                    ClientConnectorError,
+                    ClientOSError,
+                    asyncio.exceptions.TimeoutError,
+                ) as error:
+                    self.error = error
+                    self.notify()
+
+        finally:
+            maybe_flush_metrics()
+
+    def get_metric_labels(
+        self, doctype: Document | str | None = None
+    ) -> dict[str, str | None]:
+        """The labels of the metrics recorded for this request, i.e. the route, branch, and doctype"""
+        return {
+            "route": parse.urlparse(self._url or "").path.split("/")[-1],
+            "branch_id": (self._headers or {}).get("bhfId"),
+            "doctype": doctype if isinstance(doctype, str) else None,
+        }
+
+    def prepare_remote_call(
+        self, doctype: Document | str | None = None, document_name: str | None = None
+    ) -> None:
+        """Validates the request parameters, and logs the request as an Integration Request
+
+        Args:
+            doctype (Document | str | None, optional): The doctype calling this object. Defaults to None.
+            document_name (str | None, optional): The name of the doctype calling this object. Defaults to None.
+        """
         if (
             self._url is None
             or self._headers is None
@@ -183,28 +241,34 @@ class EndpointsBuilder(BaseEndpointsBuilder):
             )
 
         self.doctype, self.document_name = doctype, document_name
-        parsed_url = parse.urlparse(self._url)
-        route_path = f"/{parsed_url.path.split('/')[-1]}"
 
-        self.integration_request = create_request_log(
-            data=self._payload,
-            is_remote_request=True,
-            service_name="etims",
-            request_headers=self._headers,
-            url=self._url,
-            reference_docname=document_name,
-            reference_doctype=doctype,
-        )
-
-        try:
-            response = asyncio.run(
-                make_post_request(self._url, self._payload, self._headers)
+        with measure("integration_log", **self.get_metric_labels(doctype)):
+            self.integration_request = create_request_log(
+                data=self._payload,
+                is_remote_request=True,
+                service_name="etims",
+                request_headers=self._headers,
+                url=self._url,
+                reference_docname=document_name,
+                reference_doctype=doctype,
             )
 
-            if response["resultCd"] == "000":
-                # Success callback handler here
+    def handle_response(self, response: dict) -> None:
+        """Hands the response to the success or error callback, and updates the Integration Request
+
+        Args:
+            response (dict): The parsed response
+        """
+        parsed_url = parse.urlparse(self._url)
+        route_path = f"/{parsed_url.path.split('/')[-1]}"
+        labels = self.get_metric_labels(self.doctype)
+
+        if response["resultCd"] == "000":
+            # Success callback handler here
+            with measure("success_callback", **labels):
                 self._success_callback_handler(response)
 
+            with measure("integration_log_update", **labels):
                 update_last_request_date(response["resultDt"], route_path)
                 update_integration_request(
                     self.integration_request.name,
@@ -213,28 +277,319 @@ class EndpointsBuilder(BaseEndpointsBuilder):
                     error=None,
                 )
 
-            else:
+        else:
+            with measure("integration_log_update", **labels):
                 update_integration_request(
                     self.integration_request.name,
                     status="Failed",
                     output=None,
                     error=response["resultMsg"],
                 )
-                # Error callback handler here
-                self._error_callback_handler(
-                    response,
-                    url=route_path,
-                    doctype=doctype,
-                    document_name=document_name,
+            # Error callback handler here
+            self._error_callback_handler(
+                response,
+                url=route_path,
+                doctype=self.doctype,
+                document_name=self.document_name,
+            )
+
+    def send_request(self) -> dict:
+        """Sends the request to the remote server.
+
+        Returns:
+            dict: The parsed response
+        """
+        return asyncio.run(make_post_request(self._url, self._payload, self._headers))
+
+    async def send_request_async(self, session: aiohttp.ClientSession) -> dict:
+        """Sends the request to the remote server through an open session.
+
+        Args:
+            session (aiohttp.ClientSession): The session, shared with other concurrent requests
+
+        Returns:
+            dict: The parsed response
+        """
+        return await make_post_request(
+            self._url, self._payload, self._headers, session=session
+        )
+
+
+class StreamingEndpointsBuilder(EndpointsBuilder):
+    """
+    Endpoints Builder for search routes with large responses.
+    The records list in the response is parsed incrementally and handed to the records callback
+    in chunks, so only a single chunk is held in memory at any time.
+    The success callback receives the rest of the response, without the records.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self._records_key: str | None = None
+        self._records_callback_handler: Callable[[list[dict]], None] | None = None
+        self._chunk_size: int = 500
+
+    @property
+    def records_key(self) -> str | None:
+        """The key of the records list under the response's "data" object, e.g. itemClsList
+
+        Returns:
+            str | None: The records key
+        """
+        return self._records_key
+
+    @records_key.setter
+    def records_key(self, new_records_key: str) -> None:
+        self._records_key = new_records_key
+
+    @property
+    def records_callback(self) -> Callable[[list[dict]], None] | None:
+        """Function that handles each chunk of parsed records
+
+        Returns:
+            Callable[[list[dict]], None] | None: The function that handles records
+        """
+        return self._records_callback_handler
+
+    @records_callback.setter
+    def records_callback(self, callback: Callable[[list[dict]], None]) -> None:
+        self._records_callback_handler = callback
+
+    @property
+    def chunk_size(self) -> int:
+        """The number of records handed to the records callback at a time
+
+        Returns:
+            int: The chunk size
+        """
+        return self._chunk_size
+
+    @chunk_size.setter
+    def chunk_size(self, new_chunk_size: int) -> None:
+        self._chunk_size = new_chunk_size
+
+    def send_request(self) -> dict:
+        if self._records_key is None or self._records_callback_handler is None:
+            frappe.throw(
+                "Please supply the records key and records callback for streamed requests",
+                frappe.MandatoryError,
+                title="Setup Error",
+                is_minimizable=True,
+            )
+
+        return asyncio.run(
+            make_streaming_post_request(
+                self._url,
+                self._payload,
+                self._headers,
+                records_prefix=f"data.{self._records_key}.item",
+                on_records=self._records_callback_handler,
+                chunk_size=self._chunk_size,
+            )
+        )
+
+
+class ResumableEndpointsBuilder(StreamingEndpointsBuilder):
+    """
+    Endpoints Builder for search routes whose responses take long to process.
+    The response is spooled to disk and its records processed in checkpointed chunks,
+    tracked by a sync job record. A job that fails or times out is resumed from the last
+    committed chunk by the scheduler, without calling the remote server again.
+    The records callback must be one of the sync job's RECORDS_CALLBACKS, since it is stored by its dotted path.
+    When sent concurrently, the responses are spooled concurrently and processed as each is handled.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+
+        self._spool_file: str | None = None
+
+    def send_request(self) -> dict:
+        spool_file = self.get_spool_file()
+
+        try:
+            asyncio.run(
+                make_spooled_post_request(
+                    self._url, self._payload, self._headers, file_path=spool_file
                 )
+            )
+            response = read_spooled_envelope(spool_file)
+
+        except Exception:
+            remove_spool_file(spool_file)
+            raise
+
+        self.process_spooled_response(response, spool_file)
+
+        return response
+
+    async def send_request_async(self, session: aiohttp.ClientSession) -> dict:
+        spool_file = self.get_spool_file()
+
+        try:
+            await make_spooled_post_request(
+                self._url,
+                self._payload,
+                self._headers,
+                file_path=spool_file,
+                session=session,
+            )
+            response = read_spooled_envelope(spool_file)
+
+        except Exception:
+            remove_spool_file(spool_file)
+            raise
+
+        self._spool_file = spool_file
+
+        return response
+
+    def handle_response(self, response: dict) -> None:
+        if self._spool_file:
+            spool_file, self._spool_file = self._spool_file, None
+            self.process_spooled_response(response, spool_file)
+
+        super().handle_response(response)
+
+    def get_spool_file(self) -> str:
+        """Validates the records parameters, and allocates the file the response is spooled to
+
+        Returns:
+            str: The spool file's path
+        """
+        if self._records_key is None or self._records_callback_handler is None:
+            frappe.throw(
+                "Please supply the records key and records callback for resumable requests",
+                frappe.MandatoryError,
+                title="Setup Error",
+                is_minimizable=True,
+            )
+
+        validate_records_callback(self.get_records_callback_path())
+
+        spool_directory = frappe.get_site_path("private", "etims_sync")
+        os.makedirs(spool_directory, exist_ok=True)
+
+        return os.path.join(spool_directory, f"{frappe.generate_hash()}.json")
+
+    def get_records_callback_path(self) -> str:
+        records_callback = self._records_callback_handler
+
+        return f"{records_callback.__module__}.{records_callback.__qualname__}"
+
+    def process_spooled_response(self, response: dict, spool_file: str) -> None:
+        """Records a successful response's sync job, and processes it. Error responses are discarded
+
+        Args:
+            response (dict): The response's top-level fields
+            spool_file (str): Path of the spooled response
+        """
+        if response.get("resultCd") != "000":
+            remove_spool_file(spool_file)
+            return
+
+        job = frappe.get_doc(
+            {
+                "doctype": SYNC_JOB_DOCTYPE_NAME,
+                "route_path": f"/{parse.urlparse(self._url).path.split('/')[-1]}",
+                "records_key": self._records_key,
+                "records_callback": self.get_records_callback_path(),
+                "chunk_size": self._chunk_size,
+                "result_date": response.get("resultDt"),
+                "spool_file": spool_file,
+            }
+        ).insert(ignore_permissions=True)
+        frappe.db.commit()
+
+        process_sync_job(job.name)
+
+
+def make_concurrent_remote_calls(
+    builders: dict[str, EndpointsBuilder],
+    doctype: Document | str | None = None,
+    concurrency: int = 10,
+    keyed_by_document: bool = False,
+) -> dict[str, dict[str, str]]:
+    """Sends the requests of several builders concurrently on one event loop, e.g. the same search
+    for every branch, then hands each response to its builder's callbacks in turn.
+    A failure in one request does not stop the others from being handled.
+
+    Args:
+        builders (dict[str, EndpointsBuilder]): Fully set up builders, keyed by e.g. the branch
+        doctype (Document | str | None, optional): The doctype calling the builders. Defaults to None.
+        concurrency (int, optional): Maximum number of requests in flight at once. Defaults to 10.
+        keyed_by_document (bool, optional): Whether the builders are keyed by the names of the documents
+            they submit, referenced by their Integration Requests. Defaults to False.
+
+    Returns:
+        dict[str, dict[str, str]]: The status, i.e. Completed or Failed, and message of each request
+    """
+    for key, builder in builders.items():
+        builder.prepare_remote_call(doctype, key if keyed_by_document else None)
+
+    responses = asyncio.run(send_concurrent_requests(builders, concurrency))
+    results = {}
+
+    for key, builder in builders.items():
+        response = responses[key]
+
+        if isinstance(response, BaseException):
+            update_integration_request(
+                builder.integration_request.name,
+                status="Failed",
+                output=None,
+                error=str(response),
+            )
+            etims_logger.exception(response, exc_info=response)
+            frappe.log_error(
+                title="Fatal Error", message=str(response), reference_doctype=doctype
+            )
+
+            results[key] = {"status": "Failed", "message": str(response)}
+            continue
+
+        try:
+            builder.handle_response(response)
+            results[key] = {"status": "Completed", "message": response["resultMsg"]}
+
+        except Exception as error:
+            # Error responses are logged by the error callback before it raises
+            etims_logger.exception(error, exc_info=True)
+            results[key] = {"status": "Failed", "message": str(error)}
+
+    maybe_flush_metrics()
+
+    return results
+
+
+async def send_concurrent_requests(
+    builders: dict[str, EndpointsBuilder], concurrency: int
+) -> dict[str, dict | BaseException]:
+    """Sends the builders' requests concurrently over a shared session
+
+    Args:
+        builders (dict[str, EndpointsBuilder]): The builders, keyed by e.g. the branch
+        concurrency (int): Maximum number of requests in flight at once
+
+    Returns:
+        dict[str, dict | BaseException]: The parsed response, or the raised exception, of each request
+    """
+    from aiohttp import ClientSession, ClientTimeout
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(builder: EndpointsBuilder) -> dict:
+        async with semaphore:
+            with measure("http", **builder.get_metric_labels(builder.doctype)):
+                return await builder.send_request_async(session)
+
+    async with ClientSession(timeout=ClientTimeout(1800)) as session:
+        responses = await asyncio.gather(
+            *(send(builder) for builder in builders.values()), return_exceptions=True
+        )
 
-        except (
-            aiohttp.client_exceptions.ClientConnectorError,
-            aiohttp.client_exceptions.ClientOSError,
-            asyncio.exceptions.TimeoutError,
-        ) as error:
-            self.error = error
-            self.notify()
+    return dict(zip(builders, responses))
 
 
 def update_integration_request(
@@ -1,14 +1,16 @@
 import asyncio
 import json
+from collections import defaultdict
 from datetime import datetime
 from functools import partial
 from secrets import token_hex
-
-import aiohttp
+from typing import Callable, Literal
 
 import frappe
 import frappe.defaults
 from frappe.model.document import Document
+from frappe.utils import cint, flt
+from frappe.utils.background_jobs import is_job_enqueued
 from frappe.utils.dateutils import add_to_date
 
 from ..doctype.doctype_names_mapping import (
@@ -16,102 +18,384 @@ from ..doctype.doctype_names_mapping import (
     SETTINGS_DOCTYPE_NAME,
     USER_DOCTYPE_NAME,
 )
+from ..locks import COALESCED_IN_PROGRESS_MESSAGE, coalesce, get_request_key
+from ..logger import etims_logger
+from ..queues import (
+    enqueue_etims_job,
+    get_etims_queue,
+    is_etims_queue_busy,
+    throw_etims_queue_busy,
+)
 from ..utils import (
     build_datetime_from_string,
     build_headers,
+    build_headers_from_settings,
+    get_active_branch_settings,
+    get_curr_env_etims_settings,
+    get_documents_in_bulk,
     get_route_path,
     get_server_url,
     make_get_request,
     split_user_email,
 )
-from .api_builder import EndpointsBuilder
+from .api_builder import (
+    EndpointsBuilder,
+    ResumableEndpointsBuilder,
+    StreamingEndpointsBuilder,
+    make_concurrent_remote_calls,
+)
 from .remote_response_status_handlers import (
+    IMPORTED_ITEMS_FETCHED_MESSAGE,
     customer_branch_details_submission_on_success,
     customer_insurance_details_submission_on_success,
     customer_search_on_success,
     imported_item_submission_on_success,
-    imported_items_search_on_success,
     item_composition_submission_on_success,
     item_registration_on_success,
+    items_registration_on_success,
     notices_search_on_success,
     on_error,
-    purchase_search_on_success,
+    save_imported_items,
+    save_registered_purchases,
+    save_stock_movements,
     search_branch_request_on_success,
     stock_mvt_search_on_success,
+    streamed_search_on_success,
     submit_inventory_on_success,
     user_details_submission_on_success,
 )
 
 endpoints_builder = EndpointsBuilder()
+streaming_endpoints_builder = StreamingEndpointsBuilder()
+resumable_endpoints_builder = ResumableEndpointsBuilder()
+
+# Bulk submissions are split into chunks of invoices, each submitted by its own background job
+BULK_SUBMISSION_CHUNK_SIZE = 100
+BULK_SUBMISSION_CHUNK_TIMEOUT = 900
+BULK_SUBMISSION_EXPIRY_SECONDS = 24 * 60 * 60
+
+# Items are registered in chunks, each job sending its items' requests concurrently
+ITEM_REGISTRATION_CHUNK_SIZE = 500
+ITEM_REGISTRATION_CHUNK_TIMEOUT = 1800
+ITEM_REGISTRATION_CONCURRENCY = 10
+ITEM_COMPOSITION_CONCURRENCY = 10
+
+# Searches of all branches are sent in the background, spooling and processing each branch's response
+ALL_BRANCHES_SEARCH_TIMEOUT = 1800
+
+# The lastReqDt sent for routes that have not been searched before
+DEFAULT_SEARCH_REQUEST_DATE = "20200101000000"
+ITEM_REGISTRATION_FIELDS = [
+    "name",
+    "item_name",
+    "owner",
+    "modified_by",
+    "valuation_rate",
+    "custom_item_code_etims",
+    "custom_item_classification",
+    "custom_product_type",
+    "custom_etims_country_of_origin_code",
+    "custom_packaging_unit_code",
+    "custom_unit_of_quantity_code",
+    "custom_taxation_type",
+]
 
 
 @frappe.whitelist()
-def bulk_submit_sales_invoices(docs_list: str) -> None:
-    from ..overrides.server.sales_invoice import on_submit
+def bulk_submit_sales_invoices(docs_list: str) -> str | None:
+    return enqueue_bulk_invoice_submission("Sales Invoice", docs_list)
+
+
+@frappe.whitelist()
+def bulk_pos_sales_invoices(docs_list: str) -> str | None:
+    return enqueue_bulk_invoice_submission("POS Invoice", docs_list)
+
+
+def enqueue_bulk_invoice_submission(
+    doctype: Literal["Sales Invoice", "POS Invoice"], docs_list: str
+) -> str | None:
+    """Splits the selected invoices pending submission into chunks, each submitted by a background job.
+    The eTims queue's capacity is checked once, so a submission is either enqueued whole or refused.
+
+    Args:
+        doctype (Literal["Sales Invoice", "POS Invoice"]): The invoices' doctype
+        docs_list (str): The JSON list of selected invoice names
+
+    Returns:
+        str | None: The bulk submission's id, used to poll its progress,
+        or None if none of the invoices is pending submission
+    """
+    pending_invoices = frappe.get_all(
+        doctype,
+        filters={
+            "name": ("in", json.loads(docs_list)),
+            "docstatus": 1,
+            "custom_successfully_submitted": 0,
+        },
+        pluck="name",
+    )
+
+    if not pending_invoices:
+        return None
+
+    if is_etims_queue_busy():
+        throw_etims_queue_busy()
+
+    bulk_job_id = frappe.generate_hash(length=12)
+
+    frappe.cache.set_value(
+        get_bulk_submission_key(bulk_job_id),
+        {"doctype": doctype, "invoices": pending_invoices},
+        expires_in_sec=BULK_SUBMISSION_EXPIRY_SECONDS,
+    )
+
+    for index in range(0, len(pending_invoices), BULK_SUBMISSION_CHUNK_SIZE):
+        frappe.enqueue(
+            submit_invoices_chunk,
+            queue=get_etims_queue(),
+            timeout=BULK_SUBMISSION_CHUNK_TIMEOUT,
+            job_name=f"{bulk_job_id}_bulk_submission_{index}",
+            doctype=doctype,
+            invoices=pending_invoices[index : index + BULK_SUBMISSION_CHUNK_SIZE],
+            bulk_job_id=bulk_job_id,
+        )
+
+    return bulk_job_id
+
+
+def submit_invoices_chunk(
+    doctype: Literal["Sales Invoice", "POS Invoice"],
+    invoices: list[str],
+    bulk_job_id: str,
+) -> None:
+    """Submits a chunk of a bulk submission's invoices through their doctype's on_submit hook.
+
+    Invoices whose submission the eTims queue refuses are counted as deferred, being left pending
+    for the scheduled sweeps. Those the hook does not apply to are counted as skipped.
+    """
+    from ..overrides.server import pos_invoice, sales_invoice
 
-    data = json.loads(docs_list)
-    all_sales_invoices = frappe.db.get_all(
-        "Sales Invoice", {"docstatus": 1, "custom_successfully_submitted": 0}, ["name"]
+    on_submit = (
+        pos_invoice.on_submit if doctype == "POS Invoice" else sales_invoice.on_submit
     )
+    counters = {True: "queued", False: "deferred", None: "skipped"}
 
-    for record in data:
-        for invoice in all_sales_invoices:
-            if record == invoice.name:
-                doc = frappe.get_doc("Sales Invoice", record, for_update=False)
-                on_submit(doc, method=None)
+    for invoice in get_documents_in_bulk(
+        doctype, invoices, table_fields=("items", "taxes")
+    ):
+        try:
+            enqueued = on_submit(invoice, method=None)
+            increment_bulk_submission_counter(bulk_job_id, counters[enqueued])
+
+        except Exception:
+            etims_logger.exception("Bulk submission of %s failed", invoice.name)
+            increment_bulk_submission_counter(bulk_job_id, "failed")
+
+
+def get_bulk_submission_key(bulk_job_id: str, counter: str | None = None) -> str:
+    key = f"etims_bulk_submission:{bulk_job_id}"
+
+    return f"{key}:{counter}" if counter else key
+
+
+def increment_bulk_submission_counter(bulk_job_id: str, counter: str) -> None:
+    # Counters are updated atomically, as the submission's chunks run concurrently
+    key = frappe.cache.make_key(get_bulk_submission_key(bulk_job_id, counter))
+
+    frappe.cache.incr(key)
+    frappe.cache.expire(key, BULK_SUBMISSION_EXPIRY_SECONDS)
 
 
 @frappe.whitelist()
-def bulk_register_item(docs_list: str) -> None:
-    data = json.loads(docs_list)
-    all_items = frappe.db.get_all("Item", {"custom_item_registered": 0}, ["name"])
-
-    for record in data:
-        for item in all_items:
-            if record == item.item_code:
-                request_data = {
-                    "name": item.name,
-                    "company_name": frappe.defaults.get_user_default("Company"),
-                    "itemCd": item.custom_item_code_etims,
-                    "itemClsCd": item.custom_item_classification,
-                    "itemTyCd": item.custom_product_type,
-                    "itemNm": item.item_name,
-                    "temStdNm": None,
-                    "orgnNatCd": item.custom_etims_country_of_origin_code,
-                    "pkgUnitCd": item.custom_packaging_unit_code,
-                    "qtyUnitCd": item.custom_unit_of_quantity_code,
-                    "taxTyCd": item.get("custom_taxation_type", "B"),
-                    "btchNo": None,
-                    "bcd": None,
-                    "dftPrc": round(item.valuation_rate, 2),
-                    "grpPrcL1": None,
-                    "grpPrcL2": None,
-                    "grpPrcL3": None,
-                    "grpPrcL4": None,
-                    "grpPrcL5": None,
-                    "addInfo": None,
-                    "sftyQty": None,
-                    "isrcAplcbYn": "Y",
-                    "useYn": "Y",
-                    "regrId": split_user_email(item.owner),
-                    "regrNm": item.owner,
-                    "modrId": split_user_email(item.modified_by),
-                    "modrNm": item.modified_by,
-                }
-
-                perform_item_registration(request_data=json.dumps(request_data))
+def get_bulk_submission_progress(bulk_job_id: str) -> dict[str, int] | None:
+    """Reports a bulk submission's progress
+
+    Args:
+        bulk_job_id (str): The bulk submission's id
+
+    Returns:
+        dict[str, int] | None: The number of invoices in the submission, those queued for submission,
+        deferred to the scheduled sweeps, skipped or that failed to be, and those already submitted to eTims.
+        None if the submission has expired
+    """
+    bulk_submission = frappe.cache.get_value(get_bulk_submission_key(bulk_job_id))
+
+    if not bulk_submission:
+        return None
+
+    return {
+        "total": len(bulk_submission["invoices"]),
+        **{
+            counter: cint(
+                frappe.cache.get(
+                    frappe.cache.make_key(get_bulk_submission_key(bulk_job_id, counter))
+                )
+            )
+            for counter in ("queued", "deferred", "skipped", "failed")
+        },
+        "submitted": frappe.db.count(
+            bulk_submission["doctype"],
+            {
+                "name": ("in", bulk_submission["invoices"]),
+                "custom_successfully_submitted": 1,
+            },
+        ),
+    }
+
+
+@frappe.whitelist()
+def bulk_register_item(docs_list: str) -> int:
+    """Splits the selected unregistered items into chunks, each registered by a background job.
+    The eTims queue's capacity is checked once, so a registration is either enqueued whole or refused.
+
+    Args:
+        docs_list (str): The JSON list of selected item names
+
+    Returns:
+        int: The number of items queued for registration
+    """
+    unregistered_items = frappe.get_all(
+        "Item",
+        filters={"name": ("in", json.loads(docs_list)), "custom_item_registered": 0},
+        pluck="name",
+    )
+
+    if not unregistered_items:
+        return 0
+
+    if is_etims_queue_busy():
+        throw_etims_queue_busy()
+
+    company_name = frappe.defaults.get_user_default("Company")
+
+    for index in range(0, len(unregistered_items), ITEM_REGISTRATION_CHUNK_SIZE):
+        frappe.enqueue(
+            register_items,
+            queue=get_etims_queue(),
+            timeout=ITEM_REGISTRATION_CHUNK_TIMEOUT,
+            job_name=f"{unregistered_items[index]}_bulk_register_items",
+            company_name=company_name,
+            items=unregistered_items[index : index + ITEM_REGISTRATION_CHUNK_SIZE],
+        )
+
+    return len(unregistered_items)
+
+
+def register_items(company_name: str, items: list[str]) -> None:
+    """Registers a batch of items, sending their requests concurrently over pooled connections.
+    The registered items are then flagged with a single update.
+
+    Args:
+        company_name (str): The company whose settings record is used
+        items (list[str]): The items to register
+    """
+    headers = build_headers(company_name)
+    server_url = get_server_url(company_name)
+    route_path, last_request_date = get_route_path("ItemSaveReq")
+
+    if not (headers and server_url and route_path):
+        return
+
+    url = f"{server_url}{route_path}"
+    registered_items = []
+    builders = {}
+
+    for item in frappe.get_all(
+        "Item",
+        filters={"name": ("in", items), "custom_item_registered": 0},
+        fields=ITEM_REGISTRATION_FIELDS,
+    ):
+        builder = EndpointsBuilder()
+        builder.headers = headers
+        builder.url = url
+        builder.payload = build_item_registration_payload(item)
+        builder.success_callback = (
+            lambda response, document_name=item.name: registered_items.append(
+                document_name
+            )
+        )
+        builder.error_callback = on_error
+
+        builders[item.name] = builder
+
+    make_concurrent_remote_calls(
+        builders,
+        "Item",
+        concurrency=ITEM_REGISTRATION_CONCURRENCY,
+        keyed_by_document=True,
+    )
+    items_registration_on_success(registered_items)
+
+
+def build_item_registration_payload(item: dict) -> dict:
+    """Builds an item's ItemSaveReq payload
+
+    Args:
+        item (dict): The item, with the ITEM_REGISTRATION_FIELDS fields
+
+    Returns:
+        dict: The payload
+    """
+    return {
+        "itemCd": item.custom_item_code_etims,
+        "itemClsCd": item.custom_item_classification,
+        "itemTyCd": item.custom_product_type,
+        "itemNm": item.item_name,
+        "temStdNm": None,
+        "orgnNatCd": item.custom_etims_country_of_origin_code,
+        "pkgUnitCd": item.custom_packaging_unit_code,
+        "qtyUnitCd": item.custom_unit_of_quantity_code,
+        "taxTyCd": item.custom_taxation_type or "B",
+        "btchNo": None,
+        "bcd": None,
+        "dftPrc": round(item.valuation_rate or 0, 2),
+        "grpPrcL1": None,
+        "grpPrcL2": None,
+        "grpPrcL3": None,
+        "grpPrcL4": None,
+        "grpPrcL5": None,
+        "addInfo": None,
+        "sftyQty": None,
+        "isrcAplcbYn": "Y",
+        "useYn": "Y",
+        "regrId": split_user_email(item.owner),
+        "regrNm": item.owner,
+        "modrId": split_user_email(item.modified_by),
+        "modrNm": item.modified_by,
+    }
+
+
+def get_search_request_key(route_function: str) -> Callable[..., str]:
+    """Keys a search API's calls by the route, and the branch and contents of the request data"""
+
+    def key(request_data: str | None = None) -> str:
+        data = json.loads(request_data) if request_data else {}
+
+        return get_request_key(route_function, data.get("branch_code"), data)
+
+    return key
 
 
 @frappe.whitelist()
-def perform_customer_search(request_data: str) -> None:
-    """Search customer details in the eTims Server
+def perform_customer_search(request_data: str) -> bool:
+    """Search customer details in the eTims Server.
+    While an identical search is queued or running, the user is told so instead.
 
     Args:
         request_data (str): Data received from the client
+
+    Returns:
+        bool: True if the search was queued
     """
     data: dict = json.loads(request_data)
 
     company_name = data["company_name"]
+    # Keyed by the customer too, as the result is saved to the customer that searched
+    job_id = f"CustSearchReq:{company_name}:{data['tax_id']}:{data['name']}"
+
+    if is_job_enqueued(job_id):
+        frappe.msgprint(COALESCED_IN_PROGRESS_MESSAGE)
+        return False
 
     headers = build_headers(company_name)
     server_url = get_server_url(company_name)
@@ -129,16 +413,18 @@ def perform_customer_search(request_data: str) -> None:
         )
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        return enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
+            throw_when_busy=True,
             doctype="Customer",
             document_name=data["name"],
             job_name=f"{data['name']}_customer_search",
+            job_id=job_id,
+            deduplicate=True,
         )
 
+    return False
+
 
 @frappe.whitelist()
 def perform_item_registration(request_data: str) -> dict | None:
@@ -161,11 +447,9 @@ def perform_item_registration(request_data: str) -> dict | None:
         )
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
+            throw_when_busy=True,
             doctype="Item",
             document_name=data["name"],
             job_name=f"{data['name']}_register_item",
@@ -203,11 +487,9 @@ def send_insurance_details(request_data: str) -> None:
         )
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
+            throw_when_busy=True,
             doctype="Customer",
             document_name=data["name"],
             job_name=f"{data['name']}_submit_insurance_information",
@@ -250,11 +532,9 @@ def send_branch_customer_details(request_data: str) -> None:
         )
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
+            throw_when_busy=True,
             doctype="Customer",
             document_name=data["name"],
             job_name=f"{data['name']}_submit_customer_branch_details",
@@ -295,11 +575,9 @@ def save_branch_user_details(request_data: str) -> None:
         )
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
+            throw_when_busy=True,
             job_name=f"{data['name']}_send_branch_user_information",
             doctype=USER_DOCTYPE_NAME,
             document_name=data["name"],
@@ -353,6 +631,7 @@ def perform_item_search(request_data: str) -> None:
 
 
 @frappe.whitelist()
+@coalesce(key=get_search_request_key("ImportItemSearchReq"))
 def perform_import_item_search(request_data: str) -> None:
     data: dict = json.loads(request_data)
 
@@ -373,28 +652,212 @@ def perform_import_item_search(request_data: str) -> None:
         url = f"{server_url}{route_path}"
         payload = {"lastReqDt": request_date}
 
-        endpoints_builder.headers = headers
-        endpoints_builder.url = url
-        endpoints_builder.payload = payload
-        endpoints_builder.success_callback = imported_items_search_on_success
-        endpoints_builder.error_callback = on_error
+        streaming_endpoints_builder.headers = headers
+        streaming_endpoints_builder.url = url
+        streaming_endpoints_builder.payload = payload
+        streaming_endpoints_builder.records_key = "itemList"
+        streaming_endpoints_builder.records_callback = save_imported_items
+        streaming_endpoints_builder.success_callback = partial(
+            streamed_search_on_success, message=IMPORTED_ITEMS_FETCHED_MESSAGE
+        )
+        streaming_endpoints_builder.error_callback = on_error
 
-        endpoints_builder.make_remote_call()
+        streaming_endpoints_builder.make_remote_call()
 
 
 @frappe.whitelist()
-def perform_import_item_search_all_branches() -> None:
-    all_credentials = frappe.get_all(
-        SETTINGS_DOCTYPE_NAME,
-        ["name", "bhfid", "communication_key", "tin", "company"],
+def perform_import_item_search_all_branches(request_data: str | None = None) -> None:
+    # From the start of the day, so identical searches during the day share their payload
+    request_date = add_to_date(datetime.now(), years=-1).strftime("%Y%m%d000000")
+
+    perform_search_all_branches(
+        "ImportItemSearchReq",
+        {"lastReqDt": request_date},
+        request_data,
+        records_key="itemList",
+        records_callback=save_imported_items,
+        title="Imported Items Search",
     )
 
-    for credential in all_credentials:
-        request_data = json.dumps(
-            {"company_name": credential.company, "branch_code": credential.bhfid}
-        )
 
-        perform_import_item_search(request_data)
+@frappe.whitelist()
+def perform_purchases_search_all_branches(request_data: str | None = None) -> None:
+    perform_search_all_branches(
+        "TrnsPurchaseSalesReq",
+        None,
+        request_data,
+        records_key="saleList",
+        records_callback=save_registered_purchases,
+        doctype="Purchase Invoice",
+        title="Purchases Search",
+    )
+
+
+@frappe.whitelist()
+def perform_stock_movement_search_all_branches(request_data: str | None = None) -> None:
+    perform_search_all_branches(
+        "StockMoveReq",
+        None,
+        request_data,
+        records_key="stockList",
+        records_callback=save_stock_movements,
+        title="Stock Movements Search",
+    )
+
+
+@frappe.whitelist()
+def search_branch_request_all_branches(request_data: str | None = None) -> None:
+    perform_search_all_branches(
+        "BhfSearchReq",
+        {"lastReqDt": "20240101000000"},
+        request_data,
+        success_callback=search_branch_request_on_success,
+        doctype="Branch",
+        title="Branches Search",
+    )
+
+
+def perform_search_all_branches(
+    route_function: str,
+    payload: dict | None,
+    request_data: str | None = None,
+    *,
+    records_key: str | None = None,
+    records_callback: Callable[[list[dict]], None] | None = None,
+    success_callback: Callable[[dict], None] | None = None,
+    doctype: str | None = None,
+    title: str | None = None,
+) -> None:
+    """Enqueues the same search for every active branch. The searches are sent concurrently
+    in the background, and a summary of each branch's result is shown to the user once done.
+    While an identical search is queued or running, the user is told so instead.
+
+    Searches with a records_key spool each branch's response, handing its records to the records
+    callback in resumable chunks. Others hand each branch's response to the success callback.
+
+    Args:
+        route_function (str): The route's function, e.g. StockMoveReq
+        payload (dict | None): The request payload. The route's last request date is sent if None.
+        request_data (str | None, optional): JSON with an optional company_name, limiting the search
+            to that company's branches. Defaults to None.
+        records_key (str | None, optional): The key of the records list in the response. Defaults to None.
+        records_callback (Callable[[list[dict]], None] | None, optional): Handles each chunk of records.
+            Defaults to None.
+        success_callback (Callable[[dict], None] | None, optional): Handles each branch's successful
+            response, when the records are not streamed. Defaults to None.
+        doctype (str | None, optional): The doctype calling the remote address. Defaults to None.
+        title (str | None, optional): Title of the summary message. Defaults to None.
+    """
+    company_name = (
+        json.loads(request_data).get("company_name") if request_data else None
+    )
+    job_id = f"{route_function}_all_branches_{company_name or ''}"
+
+    # Identical searches are coalesced at enqueue time, rather than by a worker waiting on another
+    if is_job_enqueued(job_id):
+        frappe.msgprint(COALESCED_IN_PROGRESS_MESSAGE, title=title)
+        return
+
+    enqueue_etims_job(
+        search_all_branches,
+        job_name=job_id,
+        job_id=job_id,
+        deduplicate=True,
+        timeout=ALL_BRANCHES_SEARCH_TIMEOUT,
+        throw_when_busy=True,
+        route_function=route_function,
+        payload=payload,
+        company_name=company_name,
+        records_key=records_key,
+        records_callback=records_callback,
+        success_callback=success_callback,
+        doctype=doctype,
+        title=title,
+        user=frappe.session.user,
+    )
+
+    frappe.msgprint(
+        "The search has been queued. You will be notified of each branch's result once done",
+        title=title,
+    )
+
+
+def get_all_branches_search_key(
+    route_function: str, payload: dict | None, *args, company_name: str | None, **kwargs
+) -> str:
+    return get_request_key(
+        route_function, None, {"company_name": company_name, "payload": payload}
+    )
+
+
+@coalesce(key=get_all_branches_search_key)
+def search_all_branches(
+    route_function: str,
+    payload: dict | None,
+    *,
+    company_name: str | None,
+    records_key: str | None,
+    records_callback: Callable[[list[dict]], None] | None,
+    success_callback: Callable[[dict], None] | None,
+    doctype: str | None,
+    title: str | None,
+    user: str,
+) -> dict[str, dict[str, str]]:
+    """Sends the search to every active branch, or the company's, shared by identical concurrent searches
+
+    Returns:
+        dict[str, dict[str, str]]: The status and message of each branch's search
+    """
+    route_path, last_request_date = get_route_path(route_function)
+
+    if payload is None:
+        payload = {
+            "lastReqDt": (
+                last_request_date.strftime("%Y%m%d%H%M%S")
+                if last_request_date
+                else DEFAULT_SEARCH_REQUEST_DATE
+            )
+        }
+
+    builders = {}
+
+    for settings in get_active_branch_settings():
+        if company_name and settings.company != company_name:
+            continue
+
+        if records_key:
+            builder = ResumableEndpointsBuilder()
+            builder.records_key = records_key
+            builder.records_callback = records_callback
+            builder.success_callback = streamed_search_on_success
+
+        else:
+            builder = EndpointsBuilder()
+            builder.success_callback = success_callback
+
+        builder.url = f"{settings.server_url}{route_path}"
+        builder.headers = build_headers_from_settings(settings)
+        builder.payload = payload
+        builder.error_callback = on_error
+
+        builders[f"{settings.company} ({settings.bhfid})"] = builder
+
+    results = make_concurrent_remote_calls(builders, doctype=doctype)
+
+    frappe.publish_realtime(
+        "msgprint",
+        {
+            "message": "<br>".join(
+                f"{branch}: <b>{result['status']}</b> - {result['message']}"
+                for branch, result in results.items()
+            )
+            or "No active branches to search",
+            "title": title,
+        },
+        user=user,
+    )
+
+    return results
 
 
 @frappe.whitelist()
@@ -413,13 +876,15 @@ def perform_purchases_search(request_data: str) -> None:
         url = f"{server_url}{route_path}"
         payload = {"lastReqDt": request_date}
 
-        endpoints_builder.headers = headers
-        endpoints_builder.url = url
-        endpoints_builder.payload = payload
-        endpoints_builder.success_callback = purchase_search_on_success
-        endpoints_builder.error_callback = on_error
+        resumable_endpoints_builder.headers = headers
+        resumable_endpoints_builder.url = url
+        resumable_endpoints_builder.payload = payload
+        resumable_endpoints_builder.records_key = "saleList"
+        resumable_endpoints_builder.records_callback = save_registered_purchases
+        resumable_endpoints_builder.success_callback = streamed_search_on_success
+        resumable_endpoints_builder.error_callback = on_error
 
-        endpoints_builder.make_remote_call(
+        resumable_endpoints_builder.make_remote_call(
             doctype="Purchase Invoice",
         )
 
@@ -428,41 +893,54 @@ def perform_purchases_search(request_data: str) -> None:
 def submit_inventory(request_data: str) -> None:
     data: dict = json.loads(request_data)
 
-    company_name = frappe.defaults.get_user_default("Company")
+    company_name = data.get("company_name") or frappe.defaults.get_user_default(
+        "Company"
+    )
+    settings = get_curr_env_etims_settings(company_name, data["branch_id"])
 
-    headers = build_headers(company_name, data["branch_id"])
-    server_url = get_server_url(company_name, data["branch_id"])
+    if settings:
+        send_inventory(data, settings)
+
+
+def send_inventory(data: dict, settings: dict) -> bool:
+    """Enqueues the submission of an item's stock level to the branch of the given settings
+
+    Args:
+        data (dict): The stock level, with the name and owner of its latest stock ledger entry,
+            and the item_code and residual_qty
+        settings (dict): The branch's settings record
+
+    Returns:
+        bool: True if the submission was enqueued
+    """
     route_path, last_request_date = get_route_path("StockMasterSaveReq")
 
-    if headers and server_url and route_path:
-        url = f"{server_url}{route_path}"
+    if not (settings.get("server_url") and route_path):
+        return False
 
-        payload = {
-            "itemCd": data["item_code"],
-            "rsdQty": data["residual_qty"],
-            "regrId": split_user_email(data["owner"]),
-            "regrNm": data["owner"],
-            "modrId": split_user_email(data["owner"]),
-            "modrNm": data["owner"],
-        }
+    payload = {
+        "itemCd": data["item_code"],
+        "rsdQty": flt(data["residual_qty"]),
+        "regrId": split_user_email(data["owner"]),
+        "regrNm": data["owner"],
+        "modrId": split_user_email(data["owner"]),
+        "modrNm": data["owner"],
+    }
 
-        endpoints_builder.headers = headers
-        endpoints_builder.url = url
-        endpoints_builder.payload = payload
-        endpoints_builder.success_callback = partial(
-            submit_inventory_on_success, document_name=data["name"]
-        )
-        endpoints_builder.error_callback = on_error
+    endpoints_builder.headers = build_headers_from_settings(settings)
+    endpoints_builder.url = f"{settings.get('server_url')}{route_path}"
+    endpoints_builder.payload = payload
+    endpoints_builder.success_callback = partial(
+        submit_inventory_on_success, document_name=data["name"]
+    )
+    endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
-            endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
-            job_name=f"{data['name']}_submit_inventory",
-            doctype="Stock Ledger Entry",
-            document_name=data["name"],
-        )
+    return enqueue_etims_job(
+        endpoints_builder.make_remote_call,
+        job_name=f"{data['name']}_submit_inventory",
+        doctype="Stock Ledger Entry",
+        document_name=data["name"],
+    )
 
 
 @frappe.whitelist()
@@ -558,11 +1036,9 @@ def send_imported_item_request(request_data: str) -> None:
         )
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
+            throw_when_busy=True,
             job_name=f"{data['name']}_submit_imported_item",
             doctype="Item",
             document_name=data["name"],
@@ -618,11 +1094,9 @@ def perform_stock_movement_search(request_data: str) -> None:
         endpoints_builder.success_callback = stock_mvt_search_on_success
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
+            throw_when_busy=True,
             job_name=token_hex(100),
         )
 
@@ -631,69 +1105,122 @@ def perform_stock_movement_search(request_data: str) -> None:
 def submit_item_composition(request_data: str) -> None:
     data: dict = json.loads(request_data)
 
-    company_name = data["company_name"]
+    # Check if item to manufacture is registered before proceeding
+    manufactured_item = frappe.get_value(
+        "Item",
+        {"name": data["item_name"]},
+        ["custom_item_registered", "name"],
+        as_dict=True,
+    )
+
+    if not manufactured_item.custom_item_registered:
+        frappe.throw(
+            f"Please register item: <b>{manufactured_item.name}</b> first to proceed.",
+            title="Integration Error",
+        )
+
+    # Quantities of components on several BOM lines are combined into one request
+    component_quantities = defaultdict(float)
+
+    for item in data["items"]:
+        component_quantities[item["item_code"]] += flt(item["qty"])
 
+    components = {
+        component.name: component
+        for component in frappe.get_all(
+            "Item",
+            filters={"name": ("in", list(component_quantities))},
+            fields=["name", "custom_item_registered", "custom_item_code_etims"],
+        )
+    }
+    unregistered_components = [
+        item_code
+        for item_code in component_quantities
+        if not components.get(item_code, {}).get("custom_item_registered")
+    ]
+
+    if unregistered_components:
+        frappe.throw(
+            f"""
+            Items: <b>{", ".join(unregistered_components)}</b> are not registered.
+            <b>Ensure ALL Items are registered first to submit this composition</b>""",
+            title="Integration Error",
+        )
+
+    enqueue_etims_job(
+        send_item_composition,
+        throw_when_busy=True,
+        job_name=f"{data['name']}_submit_item_composition",
+        company_name=data["company_name"],
+        bom=data["name"],
+        payloads={
+            item_code: {
+                "itemCd": data["item_code"],
+                "cpstItemCd": components[item_code].custom_item_code_etims,
+                "cpstQty": quantity,
+                "regrId": split_user_email(data["registration_id"]),
+                "regrNm": data["registration_id"],
+            }
+            for item_code, quantity in component_quantities.items()
+        },
+        user=frappe.session.user,
+    )
+
+
+def send_item_composition(
+    company_name: str, bom: str, payloads: dict[str, dict], user: str
+) -> dict[str, dict[str, str]]:
+    """Sends the SaveItemComposition request of every component of a BOM concurrently.
+    The BOM is flagged as submitted once every component is, and the user is sent each component's result.
+
+    Args:
+        company_name (str): The company whose settings record is used
+        bom (str): The BOM
+        payloads (dict[str, dict]): The request payload of each component, keyed by its item code
+        user (str): The user who submitted the composition
+
+    Returns:
+        dict[str, dict[str, str]]: The status and message of each component's request
+    """
     headers = build_headers(company_name)
     server_url = get_server_url(company_name)
     route_path, last_request_date = get_route_path("SaveItemComposition")
 
-    if headers and server_url and route_path:
-        url = f"{server_url}{route_path}"
+    if not (headers and server_url and route_path):
+        return {}
 
-        all_items = frappe.db.get_all("Item", ["*"])
+    builders = {}
 
-        # Check if item to manufacture is registered before proceeding
-        manufactured_item = frappe.get_value(
-            "Item",
-            {"name": data["item_name"]},
-            ["custom_item_registered", "name"],
-            as_dict=True,
-        )
+    for item_code, payload in payloads.items():
+        builder = EndpointsBuilder()
+        builder.headers = headers
+        builder.url = f"{server_url}{route_path}"
+        builder.payload = payload
+        builder.success_callback = lambda response: None
+        builder.error_callback = on_error
 
-        if not manufactured_item.custom_item_registered:
-            frappe.throw(
-                f"Please register item: <b>{manufactured_item.name}</b> first to proceed.",
-                title="Integration Error",
-            )
+        builders[item_code] = builder
 
-        for item in data["items"]:
-            for fetched_item in all_items:
-                if item["item_code"] == fetched_item.item_code:
-                    if fetched_item.custom_item_registered == 1:
-                        payload = {
-                            "itemCd": data["item_code"],
-                            "cpstItemCd": fetched_item.custom_item_code_etims,
-                            "cpstQty": item["qty"],
-                            "regrId": split_user_email(data["registration_id"]),
-                            "regrNm": data["registration_id"],
-                        }
-
-                        endpoints_builder.headers = headers
-                        endpoints_builder.url = url
-                        endpoints_builder.payload = payload
-                        endpoints_builder.success_callback = partial(
-                            item_composition_submission_on_success,
-                            document_name=data["name"],
-                        )
-                        endpoints_builder.error_callback = on_error
-
-                        frappe.enqueue(
-                            endpoints_builder.make_remote_call,
-                            is_async=True,
-                            queue="default",
-                            timeout=300,
-                            job_name=f"{data['name']}_submit_item_composition",
-                            doctype="BOM",
-                            document_name=data["name"],
-                        )
-
-                    else:
-                        frappe.throw(
-                            f"""
-                            Item: <b>{fetched_item.name}</b> is not registered.
-                            <b>Ensure ALL Items are registered first to submit this composition</b>""",
-                            title="Integration Error",
-                        )
+    results = make_concurrent_remote_calls(
+        builders, doctype="BOM", concurrency=ITEM_COMPOSITION_CONCURRENCY
+    )
+
+    if all(result["status"] == "Completed" for result in results.values()):
+        item_composition_submission_on_success({}, document_name=bom)
+
+    frappe.publish_realtime(
+        "msgprint",
+        {
+            "message": "<br>".join(
+                f"{item_code}: <b>{result['status']}</b> - {result['message']}"
+                for item_code, result in results.items()
+            ),
+            "title": f"Item Composition: {bom}",
+        },
+        user=user,
+    )
+
+    return results
 
 
 @frappe.whitelist()
@@ -857,6 +1384,8 @@ def create_purchase_invoice_from_request(request_data: str) -> None:
 
 @frappe.whitelist()
 def ping_server(request_data: str) -> None:
+    from aiohttp import ClientConnectorError
+
     url = json.loads(request_data)["server_url"]
 
     try:
@@ -869,7 +1398,7 @@ def ping_server(request_data: str) -> None:
         frappe.msgprint("The Server is Offline")
         return
 
-    except aiohttp.client_exceptions.ClientConnectorError:
+    except ClientConnectorError:
         frappe.msgprint("The Server is Offline")
         return
 
@@ -4,6 +4,7 @@ import deprecation
 from requests.utils import requote_uri
 
 import frappe
+from frappe.utils import now
 
 from ... import __version__
 from ..doctype.doctype_names_mapping import (
@@ -11,6 +12,7 @@ from ..doctype.doctype_names_mapping import (
     ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
     NOTICES_DOCTYPE_NAME,
     PACKAGING_UNIT_DOCTYPE_NAME,
+    PAYMENT_TYPE_DOCTYPE_NAME,
     REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME,
     REGISTERED_PURCHASES_DOCTYPE_NAME,
     REGISTERED_PURCHASES_DOCTYPE_NAME_ITEM,
@@ -18,9 +20,83 @@ from ..doctype.doctype_names_mapping import (
     UNIT_OF_QUANTITY_DOCTYPE_NAME,
     USER_DOCTYPE_NAME,
 )
+from ..doctype.navari_etims_submission_backlog.navari_etims_submission_backlog import (
+    record_submission,
+)
 from ..handlers import handle_errors
 from ..utils import get_qr_code
 
+# Registered purchase fields, mapped to their keys in the TrnsPurchaseSalesReq response
+REGISTERED_PURCHASE_FIELDS = {
+    "supplier_name": "spplrNm",
+    "supplier_pin": "spplrTin",
+    "supplier_branch_id": "spplrBhfId",
+    "supplier_invoice_number": "spplrInvcNo",
+    "receipt_type_code": "rcptTyCd",
+    "remarks": "remark",
+    "validated_date": "cfmDt",
+    "sales_date": "salesDt",
+    "stock_released_date": "stockRlsDt",
+    "total_item_count": "totItemCnt",
+    "taxable_amount_a": "taxblAmtA",
+    "taxable_amount_b": "taxblAmtB",
+    "taxable_amount_c": "taxblAmtC",
+    "taxable_amount_d": "taxblAmtD",
+    "taxable_amount_e": "taxblAmtE",
+    "tax_rate_a": "taxRtA",
+    "tax_rate_b": "taxRtB",
+    "tax_rate_c": "taxRtC",
+    "tax_rate_d": "taxRtD",
+    "tax_rate_e": "taxRtE",
+    "tax_amount_a": "taxAmtA",
+    "tax_amount_b": "taxAmtB",
+    "tax_amount_c": "taxAmtC",
+    "tax_amount_d": "taxAmtD",
+    "tax_amount_e": "taxAmtE",
+    "total_taxable_amount": "totTaxblAmt",
+    "total_tax_amount": "totTaxAmt",
+    "total_amount": "totAmt",
+}
+REGISTERED_PURCHASE_ITEM_FIELDS = {
+    "item_name": "itemNm",
+    "item_code": "itemCd",
+    "item_sequence": "itemSeq",
+    "item_classification_code": "itemClsCd",
+    "barcode": "bcd",
+    "package": "pkg",
+    "packaging_unit_code": "pkgUnitCd",
+    "quantity": "qty",
+    "quantity_unit_code": "qtyUnitCd",
+    "unit_price": "prc",
+    "supply_amount": "splyAmt",
+    "discount_rate": "dcRt",
+    "discount_amount": "dcAmt",
+    "taxation_type_code": "taxTyCd",
+    "taxable_amount": "taxblAmt",
+    "tax_amount": "taxAmt",
+    "total_amount": "totAmt",
+}
+# Registered imported item fields, mapped to their keys in the ImportItemSearchReq response
+REGISTERED_IMPORTED_ITEM_FIELDS = {
+    "item_name": "itemNm",
+    "task_code": "taskCd",
+    "item_sequence": "itemSeq",
+    "declaration_number": "dclNo",
+    "hs_code": "hsCd",
+    "package": "pkg",
+    "quantity": "qty",
+    "gross_weight": "totWt",
+    "net_weight": "netWt",
+    "suppliers_name": "spplrNm",
+    "agent_name": "agntNm",
+    "invoice_foreign_currency_amount": "invcFcurAmt",
+    "invoice_foreign_currency": "invcFcurCd",
+    "invoice_foreign_currency_rate": "invcFcurExcrt",
+}
+IMPORTED_ITEMS_BATCH_SIZE = 500
+
+IMPORTED_ITEMS_FETCHED_MESSAGE = "Imported Items Fetched. Go to <b>Navari eTims Registered Imported Item</b> Doctype for more information"
+
 
 def on_error(
     response: dict | str,
@@ -73,6 +149,20 @@ def item_registration_on_success(response: dict, document_name: str) -> None:
     frappe.db.set_value("Item", document_name, {"custom_item_registered": 1})
 
 
+def items_registration_on_success(document_names: list[str]) -> None:
+    """Flags the items registered in a batch with a single update
+
+    Args:
+        document_names (list[str]): The registered items
+    """
+    if not document_names:
+        return
+
+    frappe.db.set_value(
+        "Item", {"name": ("in", document_names)}, {"custom_item_registered": 1}
+    )
+
+
 def customer_insurance_details_submission_on_success(
     response: dict, document_name: str
 ) -> None:
@@ -153,6 +243,7 @@ def sales_information_submission_on_success(
             "custom_qr_code": qr_code,
         },
     )
+    record_submission(invoice_type, document_name)
 
 
 def item_composition_submission_on_success(response: dict, document_name: str) -> None:
@@ -170,108 +261,163 @@ def purchase_invoice_submission_on_success(response: dict, document_name: str) -
             "custom_submitted_successfully": 1,
         },
     )
+    record_submission("Purchase Invoice", document_name)
 
 
 def stock_mvt_submission_on_success(response: dict, document_name: str) -> None:
     frappe.db.set_value(
         "Stock Ledger Entry", document_name, {"custom_submitted_successfully": 1}
     )
+    record_submission("Stock Ledger Entry", document_name)
+
+
+def streamed_search_on_success(response: dict, message: str | None = None) -> None:
+    """Success callback for streamed searches.
+    The records themselves are handled by the records callback as they are parsed.
+    """
+    if message:
+        frappe.msgprint(message)
 
 
 def purchase_search_on_success(reponse: dict) -> None:
-    sales_list = reponse["data"]["saleList"]
-
-    for sale in sales_list:
-        created_record = create_purchase_from_search_details(sale)
-
-        for item in sale["itemList"]:
-            create_and_link_purchase_item(item, created_record)
-
-
-def create_purchase_from_search_details(fetched_purchase: dict) -> str:
-    doc = frappe.new_doc(REGISTERED_PURCHASES_DOCTYPE_NAME)
-
-    doc.supplier_name = fetched_purchase["spplrNm"]
-    doc.supplier_pin = fetched_purchase["spplrTin"]
-    doc.supplier_branch_id = fetched_purchase["spplrBhfId"]
-    doc.supplier_invoice_number = fetched_purchase["spplrInvcNo"]
-
-    doc.receipt_type_code = fetched_purchase["rcptTyCd"]
-    doc.payment_type_code = frappe.get_doc(
-        "Navari KRA eTims Payment Type", {"code": fetched_purchase["pmtTyCd"]}, ["name"]
-    ).name
-    doc.remarks = fetched_purchase["remark"]
-    doc.validated_date = fetched_purchase["cfmDt"]
-    doc.sales_date = fetched_purchase["salesDt"]
-    doc.stock_released_date = fetched_purchase["stockRlsDt"]
-    doc.total_item_count = fetched_purchase["totItemCnt"]
-    doc.taxable_amount_a = fetched_purchase["taxblAmtA"]
-    doc.taxable_amount_b = fetched_purchase["taxblAmtB"]
-    doc.taxable_amount_c = fetched_purchase["taxblAmtC"]
-    doc.taxable_amount_d = fetched_purchase["taxblAmtD"]
-    doc.taxable_amount_e = fetched_purchase["taxblAmtE"]
-
-    doc.tax_rate_a = fetched_purchase["taxRtA"]
-    doc.tax_rate_b = fetched_purchase["taxRtB"]
-    doc.tax_rate_c = fetched_purchase["taxRtC"]
-    doc.tax_rate_d = fetched_purchase["taxRtD"]
-    doc.tax_rate_e = fetched_purchase["taxRtE"]
-
-    doc.tax_amount_a = fetched_purchase["taxAmtA"]
-    doc.tax_amount_b = fetched_purchase["taxAmtB"]
-    doc.tax_amount_c = fetched_purchase["taxAmtC"]
-    doc.tax_amount_d = fetched_purchase["taxAmtD"]
-    doc.tax_amount_e = fetched_purchase["taxAmtE"]
-
-    doc.total_taxable_amount = fetched_purchase["totTaxblAmt"]
-    doc.total_tax_amount = fetched_purchase["totTaxAmt"]
-    doc.total_amount = fetched_purchase["totAmt"]
-
-    try:
-        doc.submit()
-
-    except frappe.exceptions.DuplicateEntryError:
-        frappe.log_error(title="Duplicate entries")
-
-    return doc.name
-
-
-def create_and_link_purchase_item(item: dict, parent_record: str) -> None:
-    item_cls_code = item["itemClsCd"]
-
-    if not frappe.db.exists(ITEM_CLASSIFICATIONS_DOCTYPE_NAME, item_cls_code):
-        doc = frappe.new_doc(ITEM_CLASSIFICATIONS_DOCTYPE_NAME)
-        doc.itemclscd = item_cls_code
-        doc.taxtycd = item["taxTyCd"]
-        doc.save()
+    save_registered_purchases(reponse["data"]["saleList"])
 
-        item_cls_code = doc.name
 
-    registered_item = frappe.new_doc(REGISTERED_PURCHASES_DOCTYPE_NAME_ITEM)
+def save_registered_purchases(sales_list: list[dict]) -> None:
+    """Bulk inserts fetched purchases, along with their items, skipping those already registered.
 
-    registered_item.parent = parent_record
-    registered_item.parentfield = "items"
-    registered_item.parenttype = "Navari eTims Registered Purchases"
+    The purchases are inserted as submitted records directly, without running document hooks.
 
-    registered_item.item_name = item["itemNm"]
-    registered_item.item_code = item["itemCd"]
-    registered_item.item_sequence = item["itemSeq"]
-    registered_item.item_classification_code = item_cls_code
-    registered_item.barcode = item["bcd"]
-    registered_item.package = item["pkg"]
-    registered_item.packaging_unit_code = item["pkgUnitCd"]
-    registered_item.quantity = item["qty"]
-    registered_item.quantity_unit_code = item["qtyUnitCd"]
-    registered_item.unit_price = item["prc"]
-    registered_item.supply_amount = item["splyAmt"]
-    registered_item.discount_rate = item["dcRt"]
-    registered_item.discount_amount = item["dcAmt"]
-    registered_item.taxation_type_code = item["taxTyCd"]
-    registered_item.taxable_amount = item["taxblAmt"]
-    registered_item.tax_amount = item["taxAmt"]
-    registered_item.total_amount = item["totAmt"]
+    Args:
+        sales_list (list[dict]): The saleList records from the TrnsPurchaseSalesReq response
+    """
+    fetched_purchases = {
+        f"{sale['spplrTin']}-{sale['spplrInvcNo']}": sale for sale in sales_list
+    }
+
+    if not fetched_purchases:
+        return
+
+    registered_purchases = set(
+        frappe.get_all(
+            REGISTERED_PURCHASES_DOCTYPE_NAME,
+            filters={"name": ("in", list(fetched_purchases))},
+            pluck="name",
+        )
+    )
+    new_purchases = {
+        name: sale
+        for name, sale in fetched_purchases.items()
+        if name not in registered_purchases
+    }
+
+    if not new_purchases:
+        return
+
+    payment_types = dict(
+        frappe.get_all(PAYMENT_TYPE_DOCTYPE_NAME, fields=["code", "name"], as_list=True)
+    )
+    save_missing_item_classifications(
+        [item for sale in new_purchases.values() for item in sale["itemList"]]
+    )
+
+    timestamp, user = now(), frappe.session.user
+    parent_fields = list(REGISTERED_PURCHASE_FIELDS)
+    item_fields = list(REGISTERED_PURCHASE_ITEM_FIELDS)
+
+    purchases, purchase_items = [], []
+
+    for name, sale in new_purchases.items():
+        purchases.append(
+            (
+                name,
+                timestamp,
+                timestamp,
+                user,
+                user,
+                1,
+                payment_types.get(sale["pmtTyCd"]),
+                *(sale[key] for key in REGISTERED_PURCHASE_FIELDS.values()),
+            )
+        )
+
+        for index, item in enumerate(sale["itemList"], start=1):
+            purchase_items.append(
+                (
+                    frappe.generate_hash(length=10),
+                    timestamp,
+                    timestamp,
+                    user,
+                    user,
+                    1,
+                    name,
+                    "items",
+                    REGISTERED_PURCHASES_DOCTYPE_NAME,
+                    index,
+                    *(item[key] for key in REGISTERED_PURCHASE_ITEM_FIELDS.values()),
+                )
+            )
+
+    metadata_fields = ["name", "creation", "modified", "owner", "modified_by"]
+
+    frappe.db.bulk_insert(
+        REGISTERED_PURCHASES_DOCTYPE_NAME,
+        [*metadata_fields, "docstatus", "payment_type_code", *parent_fields],
+        purchases,
+    )
+    frappe.db.bulk_insert(
+        REGISTERED_PURCHASES_DOCTYPE_NAME_ITEM,
+        [
+            *metadata_fields,
+            "docstatus",
+            "parent",
+            "parentfield",
+            "parenttype",
+            "idx",
+            *item_fields,
+        ],
+        purchase_items,
+    )
 
-    registered_item.save()
+
+def save_missing_item_classifications(items: list[dict]) -> None:
+    """Inserts the item classification codes referenced by the items that are not yet saved
+
+    Args:
+        items (list[dict]): Fetched items, each with itemClsCd and taxTyCd keys
+    """
+    classifications = {item["itemClsCd"]: item["taxTyCd"] for item in items}
+
+    if not classifications:
+        return
+
+    existing_classifications = set(
+        frappe.get_all(
+            ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
+            filters={"name": ("in", list(classifications))},
+            pluck="name",
+        )
+    )
+    timestamp, user = now(), frappe.session.user
+
+    frappe.db.bulk_insert(
+        ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
+        [
+            "name",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "itemclscd",
+            "taxtycd",
+        ],
+        [
+            (code, timestamp, timestamp, user, user, code, tax_type)
+            for code, tax_type in classifications.items()
+            if code not in existing_classifications
+        ],
+        ignore_duplicates=True,
+    )
 
 
 def notices_search_on_success(response: dict) -> None:
@@ -295,8 +441,10 @@ def notices_search_on_success(response: dict) -> None:
 
 
 def stock_mvt_search_on_success(response: dict) -> None:
-    stock_list = response["data"]["stockList"]
+    save_stock_movements(response["data"]["stockList"])
+
 
+def save_stock_movements(stock_list: list[dict]) -> None:
     for stock in stock_list:
         doc = frappe.new_doc(REGISTERED_STOCK_MOVEMENTS_DOCTYPE_NAME)
 
@@ -340,70 +488,148 @@ def stock_mvt_search_on_success(response: dict) -> None:
 
 
 def imported_items_search_on_success(response: dict) -> None:
-    items = response["data"]["itemList"]
+    save_imported_items(response["data"]["itemList"])
 
-    def create_if_not_exists(doctype: str, code: str) -> str:
-        """Create the code if the record doesn't exist for the doctype
 
-        Args:
-            doctype (str): The doctype to check and create
-            code (str): The code to filter the record
+def save_imported_items(items: list[dict]) -> None:
+    """Bulk inserts fetched imported items, skipping those already registered.
 
-        Returns:
-            str: The code of the created record
-        """
-        present_code = frappe.db.exists(doctype, {"code": code})
+    The country, packaging unit and unit of quantity codes are resolved once for all items,
+    with missing packaging and quantity unit codes created in bulk.
 
-        if not present_code:
-            created = frappe.get_doc(
-                {
-                    "doctype": doctype,
-                    "code": code,
-                    "code_name": code,
-                    "code_description": code,
-                }
-            ).insert(ignore_permissions=True, ignore_if_duplicate=True)
-
-            return created.code_name
-
-        return present_code
-
-    for item in items:
-        doc = frappe.new_doc(REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME)
-
-        doc.item_name = item["itemNm"]
-        doc.task_code = item["taskCd"]
-        doc.declaration_date = datetime.strptime(item["dclDe"], "%d%m%Y")
-        doc.item_sequence = item["itemSeq"]
-        doc.declaration_number = item["dclNo"]
-        doc.hs_code = item["hsCd"]
-        doc.origin_nation_code = frappe.db.get_value(
-            COUNTRIES_DOCTYPE_NAME, {"code": item["orgnNatCd"]}, "code_name"
-        )
-        doc.export_nation_code = frappe.db.get_value(
-            COUNTRIES_DOCTYPE_NAME, {"code": item["exptNatCd"]}, "code_name"
-        )
-        doc.package = item["pkg"]
-        doc.packaging_unit_code = create_if_not_exists(
-            PACKAGING_UNIT_DOCTYPE_NAME, item["pkgUnitCd"]
+    Args:
+        items (list[dict]): The itemList records from the ImportItemSearchReq response
+    """
+    fetched_items = {item["taskCd"]: item for item in items}
+
+    if not fetched_items:
+        return
+
+    registered_items = set(
+        frappe.get_all(
+            REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME,
+            filters={"name": ("in", list(fetched_items))},
+            pluck="name",
         )
-        doc.quantity = item["qty"]
-        doc.quantity_unit_code = create_if_not_exists(
-            UNIT_OF_QUANTITY_DOCTYPE_NAME, item["qtyUnitCd"]
+    )
+    new_items = [
+        item
+        for task_code, item in fetched_items.items()
+        if task_code not in registered_items
+    ]
+
+    if not new_items:
+        return
+
+    countries = dict(
+        frappe.get_all(
+            COUNTRIES_DOCTYPE_NAME,
+            filters={
+                "code": (
+                    "in",
+                    list(
+                        {item["orgnNatCd"] for item in new_items}
+                        | {item["exptNatCd"] for item in new_items}
+                    ),
+                )
+            },
+            fields=["code", "code_name"],
+            as_list=True,
         )
-        doc.gross_weight = item["totWt"]
-        doc.net_weight = item["netWt"]
-        doc.suppliers_name = item["spplrNm"]
-        doc.agent_name = item["agntNm"]
-        doc.invoice_foreign_currency_amount = item["invcFcurAmt"]
-        doc.invoice_foreign_currency = item["invcFcurCd"]
-        doc.invoice_foreign_currency_rate = item["invcFcurExcrt"]
+    )
+    packaging_units = save_missing_codes(
+        PACKAGING_UNIT_DOCTYPE_NAME, {item["pkgUnitCd"] for item in new_items}
+    )
+    units_of_quantity = save_missing_codes(
+        UNIT_OF_QUANTITY_DOCTYPE_NAME, {item["qtyUnitCd"] for item in new_items}
+    )
 
-        doc.save()
+    timestamp, user = now(), frappe.session.user
+
+    frappe.db.bulk_insert(
+        REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME,
+        [
+            "name",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "origin_nation_code",
+            "export_nation_code",
+            "packaging_unit_code",
+            "quantity_unit_code",
+            "declaration_date",
+            *REGISTERED_IMPORTED_ITEM_FIELDS,
+        ],
+        [
+            (
+                item["taskCd"],
+                timestamp,
+                timestamp,
+                user,
+                user,
+                countries.get(item["orgnNatCd"]),
+                countries.get(item["exptNatCd"]),
+                packaging_units.get(item["pkgUnitCd"]),
+                units_of_quantity.get(item["qtyUnitCd"]),
+                datetime.strptime(item["dclDe"], "%d%m%Y").date(),
+                *(item[key] for key in REGISTERED_IMPORTED_ITEM_FIELDS.values()),
+            )
+            for item in new_items
+        ],
+        chunk_size=IMPORTED_ITEMS_BATCH_SIZE,
+    )
+
+
+def save_missing_codes(doctype: str, codes: set[str | None]) -> dict[str, str]:
+    """Creates the codes not yet saved for a code list doctype, using the code as its name and description
 
-    frappe.msgprint(
-        "Imported Items Fetched. Go to <b>Navari eTims Registered Imported Item</b> Doctype for more information"
+    Args:
+        doctype (str): The code list doctype, e.g. Navari eTims Packaging Unit
+        codes (set[str | None]): The codes referenced by fetched records
+
+    Returns:
+        dict[str, str]: The record name of each code
+    """
+    codes.discard(None)
+
+    if not codes:
+        return {}
+
+    saved_codes = dict(
+        frappe.get_all(
+            doctype,
+            filters={"code": ("in", list(codes))},
+            fields=["code", "name"],
+            as_list=True,
+        )
     )
+    missing_codes = codes - saved_codes.keys()
+
+    if missing_codes:
+        timestamp, user = now(), frappe.session.user
+
+        frappe.db.bulk_insert(
+            doctype,
+            [
+                "name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+                "code",
+                "code_name",
+                "code_description",
+            ],
+            [
+                (code, timestamp, timestamp, user, user, code, code, code)
+                for code in missing_codes
+            ],
+            ignore_duplicates=True,
+        )
+        saved_codes.update((code, code) for code in missing_codes)
+
+    return saved_codes
 
 
 def search_branch_request_on_success(response: dict) -> None:
@@ -8,7 +8,7 @@ import frappe
 from frappe.model.delete_doc import delete_doc
 from frappe.tests.utils import FrappeTestCase
 
-from .api_builder import EndpointsBuilder
+from .api_builder import EndpointsBuilder, make_concurrent_remote_calls
 
 
 def patched_update_request_date(*args, **kwargs) -> Any:
@@ -113,3 +113,42 @@ class TestApis(FrappeTestCase):
 
         self.assertIsNotNone(record)
         self.assertEqual(record[0].error, mock_response["resultMsg"])
+
+    @patch(
+        "kenya_compliance.kenya_compliance.apis.api_builder.update_last_request_date",
+        new_callable=patched_update_request_date,
+    )
+    @patch(
+        "kenya_compliance.kenya_compliance.apis.api_builder.make_post_request",
+        new_callable=AsyncMock,
+    )
+    def test_make_concurrent_remote_calls(
+        self, mock_make_post_request: MagicMock, mock_update_request_date: MagicMock
+    ) -> None:
+        mock_response = {
+            "resultCd": "000",
+            "resultMsg": "Success",
+            "resultDt": "20240101000000",
+        }
+        mock_make_post_request.side_effect = [
+            mock_response,
+            asyncio.exceptions.TimeoutError(),
+        ]
+
+        builders = {}
+
+        for branch in ("00", "01"):
+            e = EndpointsBuilder()
+            e.url = "https://test.com/"
+            e.headers = {"Content-Type": "application/json", "bhfId": branch}
+            e.payload = {"test_data": "Test Data"}
+            e.success_callback = lambda *args, **kwargs: None
+            e.error_callback = lambda *args, **kwargs: None
+
+            builders[branch] = e
+
+        results = make_concurrent_remote_calls(builders)
+
+        self.assertEqual(results["00"]["status"], "Completed")
+        self.assertEqual(results["01"]["status"], "Failed")
+        self.assertEqual(mock_make_post_request.await_count, 2)
@@ -0,0 +1,155 @@
+import json
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from ..locks import COALESCED_IN_PROGRESS_MESSAGE
+from .apis import (
+    BULK_SUBMISSION_CHUNK_SIZE,
+    ITEM_REGISTRATION_CHUNK_SIZE,
+    ITEM_REGISTRATION_FIELDS,
+    build_item_registration_payload,
+    bulk_register_item,
+    enqueue_bulk_invoice_submission,
+    get_bulk_submission_progress,
+    increment_bulk_submission_counter,
+    perform_customer_search,
+)
+
+TEST_INVOICES = [f"TEST-SINV-{number:05d}" for number in range(250)]
+TEST_ITEMS = [f"TEST-ITEM-{number:05d}" for number in range(250)]
+TEST_CUSTOMER_SEARCH = json.dumps(
+    {"name": "_Test Customer", "tax_id": "P000000000Z", "company_name": "_Test Company"}
+)
+
+
+class TestApis(FrappeTestCase):
+    """Test Cases"""
+
+    @patch("frappe.enqueue")
+    @patch(f"{__package__}.apis.is_etims_queue_busy", return_value=False)
+    @patch("frappe.get_all", return_value=TEST_INVOICES)
+    def test_bulk_submission_is_chunked(self, _, __, mock_enqueue) -> None:
+        bulk_job_id = enqueue_bulk_invoice_submission(
+            "Sales Invoice", json.dumps(TEST_INVOICES)
+        )
+
+        self.assertEqual(
+            [call.kwargs["invoices"] for call in mock_enqueue.call_args_list],
+            [
+                TEST_INVOICES[index : index + BULK_SUBMISSION_CHUNK_SIZE]
+                for index in range(0, len(TEST_INVOICES), BULK_SUBMISSION_CHUNK_SIZE)
+            ],
+        )
+
+        increment_bulk_submission_counter(bulk_job_id, "queued")
+        increment_bulk_submission_counter(bulk_job_id, "queued")
+        increment_bulk_submission_counter(bulk_job_id, "deferred")
+        increment_bulk_submission_counter(bulk_job_id, "failed")
+
+        self.assertEqual(
+            get_bulk_submission_progress(bulk_job_id),
+            {
+                "total": 250,
+                "queued": 2,
+                "deferred": 1,
+                "skipped": 0,
+                "failed": 1,
+                "submitted": 0,
+            },
+        )
+
+    @patch("frappe.enqueue")
+    @patch(f"{__package__}.apis.is_etims_queue_busy", return_value=True)
+    @patch("frappe.get_all", return_value=TEST_INVOICES)
+    def test_bulk_submission_is_refused_whole_when_busy(
+        self, _, __, mock_enqueue
+    ) -> None:
+        self.assertRaises(
+            frappe.ValidationError,
+            enqueue_bulk_invoice_submission,
+            "Sales Invoice",
+            json.dumps(TEST_INVOICES),
+        )
+        mock_enqueue.assert_not_called()
+
+    @patch("frappe.get_all", return_value=[])
+    def test_bulk_submission_without_pending_invoices(self, _) -> None:
+        self.assertIsNone(
+            enqueue_bulk_invoice_submission("Sales Invoice", json.dumps(TEST_INVOICES))
+        )
+
+    @patch("frappe.enqueue")
+    @patch(f"{__package__}.apis.is_etims_queue_busy", return_value=False)
+    @patch("frappe.get_all", return_value=TEST_ITEMS)
+    def test_bulk_item_registration_is_chunked(self, _, __, mock_enqueue) -> None:
+        self.assertEqual(bulk_register_item(json.dumps(TEST_ITEMS)), len(TEST_ITEMS))
+        self.assertEqual(
+            [call.kwargs["items"] for call in mock_enqueue.call_args_list],
+            [
+                TEST_ITEMS[index : index + ITEM_REGISTRATION_CHUNK_SIZE]
+                for index in range(0, len(TEST_ITEMS), ITEM_REGISTRATION_CHUNK_SIZE)
+            ],
+        )
+
+    @patch("frappe.enqueue")
+    @patch(f"{__package__}.apis.is_etims_queue_busy", return_value=True)
+    @patch("frappe.get_all", return_value=TEST_ITEMS)
+    def test_bulk_item_registration_is_refused_whole_when_busy(
+        self, _, __, mock_enqueue
+    ) -> None:
+        self.assertRaises(
+            frappe.ValidationError, bulk_register_item, json.dumps(TEST_ITEMS)
+        )
+        mock_enqueue.assert_not_called()
+
+    @patch("frappe.msgprint")
+    @patch("frappe.enqueue")
+    @patch(
+        "kenya_compliance.kenya_compliance.queues.is_etims_queue_busy",
+        return_value=False,
+    )
+    @patch(f"{__package__}.apis.get_route_path", return_value=("/selectCustomer", None))
+    @patch(f"{__package__}.apis.get_server_url", return_value="https://etims.test")
+    @patch(f"{__package__}.apis.build_headers", return_value={"tin": "P000000000Z"})
+    def test_identical_customer_search_is_not_enqueued_while_in_flight(
+        self, _, __, ___, ____, mock_enqueue, mock_msgprint
+    ) -> None:
+        with patch(f"{__package__}.apis.is_job_enqueued", return_value=False):
+            self.assertTrue(perform_customer_search(TEST_CUSTOMER_SEARCH))
+
+        self.assertEqual(mock_enqueue.call_count, 1)
+        self.assertTrue(mock_enqueue.call_args.kwargs["deduplicate"])
+
+        # A second click while the first search's job is queued or running
+        with patch(
+            f"{__package__}.apis.is_job_enqueued", return_value=True
+        ) as mock_is_job_enqueued:
+            self.assertFalse(perform_customer_search(TEST_CUSTOMER_SEARCH))
+
+        mock_is_job_enqueued.assert_called_once_with(
+            mock_enqueue.call_args.kwargs["job_id"]
+        )
+        self.assertEqual(mock_enqueue.call_count, 1)
+        mock_msgprint.assert_called_once_with(COALESCED_IN_PROGRESS_MESSAGE)
+
+    def test_build_item_registration_payload(self) -> None:
+        item = frappe._dict(dict.fromkeys(ITEM_REGISTRATION_FIELDS))
+        item.update(
+            {
+                "item_name": "Test Item",
+                "owner": "test@example.com",
+                "modified_by": "test@example.com",
+                "valuation_rate": 10.127,
+                "custom_item_code_etims": "KE1NTXU0000001",
+            }
+        )
+
+        payload = build_item_registration_payload(item)
+
+        self.assertEqual(payload["itemCd"], "KE1NTXU0000001")
+        self.assertEqual(payload["taxTyCd"], "B")
+        self.assertEqual(payload["dftPrc"], 10.13)
+        self.assertEqual(payload["regrId"], "test")
+        self.assertNotIn("name", payload)
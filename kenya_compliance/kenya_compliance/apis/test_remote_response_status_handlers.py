@@ -0,0 +1,176 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from ..doctype.doctype_names_mapping import (
+    ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
+    PACKAGING_UNIT_DOCTYPE_NAME,
+    REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME,
+    REGISTERED_PURCHASES_DOCTYPE_NAME,
+    REGISTERED_PURCHASES_DOCTYPE_NAME_ITEM,
+    UNIT_OF_QUANTITY_DOCTYPE_NAME,
+)
+from ..utils import get_documents_in_bulk
+from .remote_response_status_handlers import (
+    save_imported_items,
+    save_registered_purchases,
+)
+
+TEST_SUPPLIER_PIN = "P000000000T"
+TEST_ITEM_CLASSIFICATION_CODE = "99999998"
+TEST_TASK_CODES = ("TSTTASK1", "TSTTASK2")
+TEST_UNIT_CODE = "TSTU"
+
+
+def build_sale(invoice_number: int) -> dict:
+    return {
+        "spplrTin": TEST_SUPPLIER_PIN,
+        "spplrNm": "Test Supplier",
+        "spplrBhfId": "00",
+        "spplrInvcNo": invoice_number,
+        "rcptTyCd": "S",
+        "pmtTyCd": "01",
+        "cfmDt": "2024-05-01 10:30:00",
+        "salesDt": "20240501",
+        "stockRlsDt": None,
+        "totItemCnt": 1,
+        "taxblAmtA": 0,
+        "taxblAmtB": 100,
+        "taxblAmtC": 0,
+        "taxblAmtD": 0,
+        "taxblAmtE": 0,
+        "taxRtA": 0,
+        "taxRtB": 16,
+        "taxRtC": 0,
+        "taxRtD": 0,
+        "taxRtE": 0,
+        "taxAmtA": 0,
+        "taxAmtB": 16,
+        "taxAmtC": 0,
+        "taxAmtD": 0,
+        "taxAmtE": 0,
+        "totTaxblAmt": 100,
+        "totTaxAmt": 16,
+        "totAmt": 116,
+        "remark": None,
+        "itemList": [
+            {
+                "itemSeq": 1,
+                "itemCd": "KE1NTXU0000001",
+                "itemClsCd": TEST_ITEM_CLASSIFICATION_CODE,
+                "itemNm": "Test Item",
+                "bcd": None,
+                "pkgUnitCd": None,
+                "pkg": 1,
+                "qtyUnitCd": None,
+                "qty": 1,
+                "prc": 100,
+                "splyAmt": 100,
+                "dcRt": 0,
+                "dcAmt": 0,
+                "taxTyCd": "B",
+                "taxblAmt": 100,
+                "taxAmt": 16,
+                "totAmt": 116,
+            }
+        ],
+    }
+
+
+def build_imported_item(task_code: str) -> dict:
+    return {
+        "taskCd": task_code,
+        "dclDe": "01052024",
+        "itemSeq": 1,
+        "dclNo": "24NBOIM000000001",
+        "hsCd": "1231531231",
+        "itemNm": "Test Imported Item",
+        "imptItemsttsCd": "2",
+        "orgnNatCd": "BR",
+        "exptNatCd": "BR",
+        "pkg": 2,
+        "pkgUnitCd": TEST_UNIT_CODE,
+        "qty": 2,
+        "qtyUnitCd": TEST_UNIT_CODE,
+        "totWt": 10,
+        "netWt": 9,
+        "spplrNm": "Test Supplier",
+        "agntNm": "Test Agent",
+        "invcFcurAmt": 500,
+        "invcFcurCd": "USD",
+        "invcFcurExcrt": 130,
+    }
+
+
+class TestRemoteResponseStatusHandlers(FrappeTestCase):
+    """Test Cases"""
+
+    def tearDown(self) -> None:
+        frappe.db.delete(
+            REGISTERED_PURCHASES_DOCTYPE_NAME_ITEM,
+            {"parent": ("like", f"{TEST_SUPPLIER_PIN}-%")},
+        )
+        frappe.db.delete(
+            REGISTERED_PURCHASES_DOCTYPE_NAME, {"supplier_pin": TEST_SUPPLIER_PIN}
+        )
+        frappe.db.delete(
+            ITEM_CLASSIFICATIONS_DOCTYPE_NAME, {"name": TEST_ITEM_CLASSIFICATION_CODE}
+        )
+        frappe.db.delete(
+            REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME, {"name": ("in", TEST_TASK_CODES)}
+        )
+
+        for doctype in (PACKAGING_UNIT_DOCTYPE_NAME, UNIT_OF_QUANTITY_DOCTYPE_NAME):
+            frappe.db.delete(doctype, {"name": TEST_UNIT_CODE})
+
+    def test_save_registered_purchases_skips_registered(self) -> None:
+        save_registered_purchases([build_sale(1)])
+        save_registered_purchases([build_sale(1), build_sale(2)])
+
+        purchase = frappe.get_doc(
+            REGISTERED_PURCHASES_DOCTYPE_NAME, f"{TEST_SUPPLIER_PIN}-1"
+        )
+
+        self.assertEqual(purchase.docstatus, 1)
+        self.assertEqual(len(purchase.items), 1)
+        self.assertEqual(
+            purchase.items[0].item_classification_code, TEST_ITEM_CLASSIFICATION_CODE
+        )
+        self.assertEqual(
+            frappe.db.count(
+                REGISTERED_PURCHASES_DOCTYPE_NAME, {"supplier_pin": TEST_SUPPLIER_PIN}
+            ),
+            2,
+        )
+        self.assertTrue(
+            frappe.db.exists(
+                ITEM_CLASSIFICATIONS_DOCTYPE_NAME, TEST_ITEM_CLASSIFICATION_CODE
+            )
+        )
+
+        purchases = get_documents_in_bulk(
+            REGISTERED_PURCHASES_DOCTYPE_NAME,
+            [f"{TEST_SUPPLIER_PIN}-2", f"{TEST_SUPPLIER_PIN}-1"],
+            table_fields=("items",),
+        )
+
+        self.assertEqual(
+            [purchase.name for purchase in purchases],
+            [f"{TEST_SUPPLIER_PIN}-2", f"{TEST_SUPPLIER_PIN}-1"],
+        )
+        self.assertEqual(purchases[0].items[0].item_code, "KE1NTXU0000001")
+
+    def test_save_imported_items_creates_missing_codes(self) -> None:
+        save_imported_items([build_imported_item(TEST_TASK_CODES[0])])
+        save_imported_items([build_imported_item(code) for code in TEST_TASK_CODES])
+
+        imported_item = frappe.get_doc(
+            REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME, TEST_TASK_CODES[0]
+        )
+
+        self.assertEqual(imported_item.packaging_unit_code, TEST_UNIT_CODE)
+        self.assertEqual(imported_item.quantity_unit_code, TEST_UNIT_CODE)
+        self.assertEqual(str(imported_item.declaration_date), "2024-05-01")
+        self.assertTrue(
+            frappe.db.exists(REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME, TEST_TASK_CODES[1])
+        )
+        self.assertTrue(frappe.db.exists(PACKAGING_UNIT_DOCTYPE_NAME, TEST_UNIT_CODE))
@@ -1,159 +1,633 @@
 import json
+from datetime import datetime
+from hashlib import sha256
+from typing import Callable, Generator
 
 import frappe
-import frappe.defaults
-from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, cstr, now, now_datetime, sbool
 
-from ..apis.api_builder import EndpointsBuilder
-from ..apis.remote_response_status_handlers import on_error
+from ..apis.api_builder import EndpointsBuilder, ResumableEndpointsBuilder
+from ..apis.remote_response_status_handlers import on_error, streamed_search_on_success
 from ..doctype.doctype_names_mapping import (
     COUNTRIES_DOCTYPE_NAME,
     ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
     PACKAGING_UNIT_DOCTYPE_NAME,
     SETTINGS_DOCTYPE_NAME,
+    SWEEP_STATE_DOCTYPE_NAME,
+    SYNC_JOB_DOCTYPE_NAME,
     TAXATION_TYPE_DOCTYPE_NAME,
     UNIT_OF_QUANTITY_DOCTYPE_NAME,
 )
-from ..overrides.server.stock_ledger_entry import on_update
-from ..utils import build_headers, get_route_path, get_server_url
+from ..doctype.navari_etims_sync_job.navari_etims_sync_job import (
+    MAX_SYNC_JOB_ATTEMPTS,
+    process_sync_job,
+)
+from ..locks import single_flight
+from ..logger import etims_logger
+from ..overrides.server.stock_ledger_entry import get_stock_movement_items, on_update
+from ..queues import enqueue_etims_job, is_etims_queue_busy
+from ..utils import (
+    build_headers_from_settings,
+    get_active_branch_settings,
+    get_curr_env_etims_settings,
+    get_documents_in_bulk,
+    get_route_path,
+    insert_many,
+    iter_pending_records,
+)
 
 endpoints_builder = EndpointsBuilder()
+resumable_endpoints_builder = ResumableEndpointsBuilder()
+
+ITEM_CLASSIFICATION_FIELDS = (
+    "itemclscd",
+    "itemclslvl",
+    "itemclsnm",
+    "taxtycd",
+    "useyn",
+    "mjrtgyn",
+)
+ITEM_CLASSIFICATION_BATCH_SIZE = 1000
+
+# Sync jobs still Processing without progress for this long are presumed dead
+SYNC_JOB_STALE_MINUTES = 30
+
+# Queued and failed sync jobs are left alone this long, as the request that created them
+# processes them straight away
+SYNC_JOB_GRACE_MINUTES = 5
+
+# Sweeps for records pending submission handle at most SWEEP_MAX_RECORDS per run,
+# the rest being picked up by the following runs
+SWEEP_BATCH_SIZE = 500
+SWEEP_MAX_RECORDS = 5000
+
+# Sweeps continue from their watermark, except for a full sweep from the oldest record
+# once every SWEEP_FULL_INTERVAL_HOURS, catching records left behind the watermark
+SWEEP_FULL_INTERVAL_HOURS = 24
+
+# Scheduled tasks run as one shard per (company, branch), in at most this many jobs per company,
+# unless set otherwise on the company's settings records
+DEFAULT_SHARD_CONCURRENCY = 4
+SHARD_JOB_TIMEOUT = 1500
+
+# Request dates early enough to fetch the whole catalogue from eTims
+CODE_LISTS_FULL_SYNC_DATE = "20200101000000"
+ITEM_CLASSIFICATIONS_FULL_SYNC_DATE = "20230101000000"
 
 
 def refresh_notices() -> None:
     from ..apis.apis import perform_notice_search
 
-    company = frappe.defaults.get_user_default("Company")
-
-    perform_notice_search(json.dumps({"company_name": company}))
+    # Notices are issued per taxpayer, so one search per company suffices
+    for company_name in {settings.company for settings in get_active_branch_settings()}:
+        enqueue_etims_job(
+            perform_notice_search,
+            job_id=f"{get_task_path(refresh_notices)}:{company_name}",
+            deduplicate=True,
+            request_data=json.dumps({"company_name": company_name}),
+        )
 
 
 def send_sales_invoices_information() -> None:
-    from ..overrides.server.sales_invoice import on_submit
+    enqueue_shards(send_shard_sales_invoices_information)
 
-    all_submitted_unsent: list[Document] = frappe.get_all(
-        "Sales Invoice", {"docstatus": 1, "custom_successfully_submitted": 0}, ["name"]
-    )  # Fetch all Sales Invoice records according to filter
 
-    if all_submitted_unsent:
-        for sales_invoice in all_submitted_unsent:
-            doc = frappe.get_doc(
-                "Sales Invoice", sales_invoice.name, for_update=False
-            )  # Refetch to get the document representation of the record
+def send_pos_invoices_information() -> None:
+    enqueue_shards(send_shard_pos_invoices_information)
 
-            try:
-                on_submit(
-                    doc, method=None
-                )  # Delegate to the on_submit method for sales invoices
 
-            except TypeError:
-                continue
+def send_stock_information() -> None:
+    enqueue_shards(send_shard_stock_information)
 
 
-def send_pos_invoices_information() -> None:
-    from ..overrides.server.sales_invoice import on_submit
+def send_purchase_information() -> None:
+    enqueue_shards(send_shard_purchase_information)
+
+
+def send_item_inventory_information() -> None:
+    enqueue_shards(send_shard_item_inventory_information)
+
 
-    all_pending_pos_invoices: list[Document] = frappe.get_all(
-        "POS Invoice", {"docstatus": 1, "custom_successfully_submitted": 0}, ["name"]
+def enqueue_shards(task: Callable) -> None:
+    """Enqueues a scheduled task as one shard per active (company, branch) settings record.
+
+    Each company's shards are spread across at most its shard concurrency of jobs, each job
+    running its shards in turn, so companies and their branches are processed in parallel.
+    A job still queued or running from a previous run is not enqueued again.
+
+    Args:
+        task (Callable): The shard function, accepting the keyword arguments of a shard
+    """
+    shards_by_company: dict[str, list[dict]] = {}
+
+    for settings in get_active_branch_settings():
+        shards_by_company.setdefault(settings.company, []).append(settings)
+
+    task_path = get_task_path(task)
+
+    for company_name, company_settings in shards_by_company.items():
+        company_settings.sort(key=lambda settings: settings.bhfid)
+        concurrency = min(
+            cint(settings.shard_concurrency) or DEFAULT_SHARD_CONCURRENCY
+            for settings in company_settings
+        )
+        shards = [
+            {
+                "company_name": company_name,
+                "branch_id": settings.bhfid,
+                "shard_size": cint(settings.shard_size) or SWEEP_MAX_RECORDS,
+                # Records without a branch are left to the company's first branch
+                "include_unbranched": index == 0,
+            }
+            for index, settings in enumerate(company_settings)
+        ]
+
+        for lane in range(min(concurrency, len(shards))):
+            frappe.enqueue(
+                run_shards,
+                queue="long",
+                timeout=SHARD_JOB_TIMEOUT,
+                job_id=f"{task_path}:{company_name}:{lane}",
+                deduplicate=True,
+                task_path=task_path,
+                shards=shards[lane::concurrency],
+            )
+
+
+def run_shards(task_path: str, shards: list[dict]) -> None:
+    """Runs a sharded task for each of the given shards. A failing shard does not stop the rest
+
+    Args:
+        task_path (str): The dotted path of the shard function
+        shards (list[dict]): The keyword arguments of each shard
+    """
+    task = frappe.get_attr(task_path)
+
+    for shard in shards:
+        try:
+            task(**shard)
+
+        except Exception:
+            frappe.db.rollback()
+
+            etims_logger.exception(
+                "Shard %s:%s of %s failed",
+                shard["company_name"],
+                shard["branch_id"],
+                task_path,
+            )
+            frappe.log_error(
+                title=f"eTims Shard Failed: {shard['company_name']} {shard['branch_id']}"
+            )
+
+
+def get_shard_lock_key(company_name: str, branch_id: str, **kwargs) -> str:
+    return f"{company_name}:{branch_id}"
+
+
+def get_task_path(task: Callable) -> str:
+    return f"{task.__module__}.{task.__name__}"
+
+
+def get_branch_filter(branch_id: str, include_unbranched: bool) -> list[str | None]:
+    return [branch_id, None] if include_unbranched else [branch_id]
+
+
+def get_shard_warehouses(
+    company_name: str, branch_id: str, include_unbranched: bool
+) -> list[str]:
+    warehouses = frappe.get_all(
+        "Warehouse",
+        filters={"company": company_name, "custom_branch": branch_id},
+        pluck="name",
     )
 
-    if all_pending_pos_invoices:
-        for pos_invoice in all_pending_pos_invoices:
-            doc = frappe.get_doc(
-                "POS Invoice", pos_invoice.name, for_update=False
-            )  # Refetch to get the document representation of the record
+    if include_unbranched:
+        warehouses += frappe.get_all(
+            "Warehouse",
+            filters={"company": company_name, "custom_branch": ("is", "not set")},
+            pluck="name",
+        )
 
-            try:
-                on_submit(
-                    doc, method=None
-                )  # Delegate to the on_submit method for sales invoices
+    return warehouses
 
-            except TypeError:
-                continue
 
+@single_flight(key=get_shard_lock_key)
+def send_shard_sales_invoices_information(
+    company_name: str,
+    branch_id: str,
+    shard_size: int = SWEEP_MAX_RECORDS,
+    include_unbranched: bool = False,
+) -> None:
+    send_invoices_information(
+        "Sales Invoice", company_name, branch_id, shard_size, include_unbranched
+    )
 
-def send_stock_information() -> None:
-    all_stock_ledger_entries: list[Document] = frappe.get_all(
-        "Stock Ledger Entry",
-        {"docstatus": 1, "custom_submitted_successfully": 0},
-        ["name"],
+
+@single_flight(key=get_shard_lock_key)
+def send_shard_pos_invoices_information(
+    company_name: str,
+    branch_id: str,
+    shard_size: int = SWEEP_MAX_RECORDS,
+    include_unbranched: bool = False,
+) -> None:
+    send_invoices_information(
+        "POS Invoice", company_name, branch_id, shard_size, include_unbranched
     )
 
-    for entry in all_stock_ledger_entries:
-        doc = frappe.get_doc(
-            "Stock Ledger Entry", entry.name, for_update=False
-        )  # Refetch to get the document representation of the record
 
-        try:
-            on_update(
-                doc, method=None
-            )  # Delegate to the on_update method for Stock Ledger Entry override
+def send_invoices_information(
+    doctype: str,
+    company_name: str,
+    branch_id: str,
+    shard_size: int,
+    include_unbranched: bool,
+) -> None:
+    from ..overrides.server import pos_invoice, sales_invoice
 
-        except TypeError:
-            continue
+    on_submit = (
+        pos_invoice.on_submit if doctype == "POS Invoice" else sales_invoice.on_submit
+    )
 
+    def submit_batch(batch: list[str]) -> int:
+        # Delegate to the on_submit method of the invoices' doctype
+        return submit_swept_records(
+            batch,
+            get_documents_in_bulk(doctype, batch, table_fields=("items", "taxes")),
+            lambda doc: on_submit(doc, method=None),
+        )
 
-def send_purchase_information() -> None:
+    sweep_pending_records(
+        doctype,
+        {
+            "custom_successfully_submitted": 0,
+            "docstatus": 1,
+            "company": company_name,
+            "branch": get_branch_filter(branch_id, include_unbranched),
+        },
+        submit_batch,
+        max_records=shard_size,
+        company_name=company_name,
+        branch_id=branch_id,
+    )
+
+
+@single_flight(key=get_shard_lock_key)
+def send_shard_stock_information(
+    company_name: str,
+    branch_id: str,
+    shard_size: int = SWEEP_MAX_RECORDS,
+    include_unbranched: bool = False,
+) -> None:
+    warehouses = get_shard_warehouses(company_name, branch_id, include_unbranched)
+
+    if not warehouses:
+        return
+
+    def submit_batch(batch: list[str]) -> int:
+        docs = get_documents_in_bulk("Stock Ledger Entry", batch)
+        # The items, and the vouchers shared by several entries, are loaded once per batch
+        items = get_stock_movement_items({doc.item_code for doc in docs})
+        vouchers = {}
+
+        def submit(doc: dict) -> bool | None:
+            voucher_key = (doc.voucher_type, doc.voucher_no)
+
+            if voucher_key not in vouchers:
+                vouchers[voucher_key] = frappe.get_doc(*voucher_key)
+
+            # Delegate to the on_update method for Stock Ledger Entry override
+            return on_update(
+                doc, method=None, items=items, voucher=vouchers[voucher_key]
+            )
+
+        return submit_swept_records(batch, docs, submit)
+
+    sweep_pending_records(
+        "Stock Ledger Entry",
+        {
+            "custom_submitted_successfully": 0,
+            "docstatus": 1,
+            "warehouse": warehouses,
+        },
+        submit_batch,
+        max_records=shard_size,
+        company_name=company_name,
+        branch_id=branch_id,
+    )
+
+
+@single_flight(key=get_shard_lock_key)
+def send_shard_purchase_information(
+    company_name: str,
+    branch_id: str,
+    shard_size: int = SWEEP_MAX_RECORDS,
+    include_unbranched: bool = False,
+) -> None:
     from ..overrides.server.purchase_invoice import on_submit
 
-    all_submitted_purchase_invoices: list[Document] = frappe.get_all(
+    def submit_batch(batch: list[str]) -> int:
+        return submit_swept_records(
+            batch,
+            get_documents_in_bulk(
+                "Purchase Invoice", batch, table_fields=("items", "taxes")
+            ),
+            lambda doc: on_submit(doc, method=None),
+        )
+
+    sweep_pending_records(
         "Purchase Invoice",
-        {"docstatus": 1, "custom_submitted_successfully": 0},
-        ["name"],
+        {
+            "custom_submitted_successfully": 0,
+            "docstatus": 1,
+            "company": company_name,
+            "branch": get_branch_filter(branch_id, include_unbranched),
+        },
+        submit_batch,
+        max_records=shard_size,
+        company_name=company_name,
+        branch_id=branch_id,
     )
 
-    for invoice in all_submitted_purchase_invoices:
-        doc = frappe.get_doc(
-            "Purchase Invoice", invoice.name, for_update=False
-        )  # Refetch to get the document representation of the record
 
+def submit_swept_records(
+    batch: list[str],
+    docs: list[dict],
+    submit: Callable[[dict], bool | None],
+) -> int:
+    """Submits a batch of swept records in order, stopping at the first whose job the eTims queue refuses
+
+    Args:
+        batch (list[str]): The batch's record names, in the order swept
+        docs (list[dict]): The batch's records, in the same order
+        submit (Callable[[dict], bool | None]): Submits a record, returning False if its job was refused
+
+    Returns:
+        int: The number of leading records of the batch handled, the rest being left pending
+    """
+    if is_etims_queue_busy():
+        return 0
+
+    for doc in docs:
         try:
-            on_submit(doc, method=None)
+            if submit(doc) is False:
+                return batch.index(doc.name)
 
         except TypeError:
             continue
 
+    return len(batch)
+
+
+def sweep_pending_records(
+    doctype: str,
+    filters: dict[str, int | str | list],
+    submit_batch: Callable[[list[str]], int],
+    max_records: int = SWEEP_MAX_RECORDS,
+    company_name: str | None = None,
+    branch_id: str | None = None,
+) -> None:
+    """Hands the names of pending records in batches to submit_batch, continuing from the sweep's
+    persisted watermark.
+
+    The watermark, i.e. the (modified, name) of the last record handled, is saved after each batch,
+    so a sweep only scans records modified since the previous one. Records left behind the watermark,
+    e.g. those whose submission failed, are picked up by the periodic full sweep.
+    Once a record's submission is refused, e.g. as the eTims queue is busy, the sweep stops with its
+    watermark on the record before, so the next run continues from the refused record.
+
+    Args:
+        doctype (str): The doctype to sweep
+        filters (dict[str, int | str | list]): Filters selecting pending records, as taken by iter_pending_records
+        submit_batch (Callable[[list[str]], int]): Submits a batch of record names, returning the number
+            of leading records handled
+        max_records (int, optional): Maximum number of records swept. Defaults to SWEEP_MAX_RECORDS.
+        company_name (str | None, optional): The company of a sharded sweep. Defaults to None.
+        branch_id (str | None, optional): The branch of a sharded sweep. Defaults to None.
+            Each (doctype, company, branch) shard keeps its own watermark.
+    """
+    sweep_key = ":".join(filter(None, (doctype, company_name, branch_id)))
+    state = get_sweep_state(sweep_key, doctype, company_name, branch_id)
+    started_at = now_datetime()
+
+    is_full_sweep = not state.last_full_sweep or state.last_full_sweep <= add_to_date(
+        started_at, hours=-SWEEP_FULL_INTERVAL_HOURS
+    )
+    start = (
+        (state.last_modified, state.last_name or "")
+        if state.last_modified and not is_full_sweep
+        else None
+    )
 
-def send_item_inventory_information() -> None:
-    from ..apis.apis import submit_inventory
+    if is_full_sweep:
+        save_sweep_state(sweep_key, {"last_full_sweep": started_at})
+
+    for batch in iter_pending_records(
+        doctype,
+        filters,
+        batch_size=min(SWEEP_BATCH_SIZE, max_records),
+        max_records=max_records,
+        start=start,
+    ):
+        handled = submit_batch([record.name for record in batch])
+
+        if handled:
+            last_handled = batch[handled - 1]
+            save_sweep_state(
+                sweep_key,
+                {
+                    "last_modified": last_handled.modified,
+                    "last_name": last_handled.name,
+                },
+            )
+
+        if handled < len(batch):
+            break
+
+
+def get_sweep_state(
+    sweep_key: str,
+    doctype: str,
+    company_name: str | None = None,
+    branch_id: str | None = None,
+) -> dict:
+    """Fetches the watermark of a sweep, creating it if missing
+
+    Args:
+        sweep_key (str): The sweep's key, i.e. the doctype, followed by the company and branch for sharded sweeps
+        doctype (str): The swept doctype
+        company_name (str | None, optional): The company of a sharded sweep. Defaults to None.
+        branch_id (str | None, optional): The branch of a sharded sweep. Defaults to None.
+
+    Returns:
+        dict: The sweep state, with last_modified, last_name and last_full_sweep fields
+    """
+    if not frappe.db.exists(SWEEP_STATE_DOCTYPE_NAME, sweep_key):
+        frappe.get_doc(
+            {
+                "doctype": SWEEP_STATE_DOCTYPE_NAME,
+                "sweep_key": sweep_key,
+                "swept_doctype": doctype,
+                "company": company_name,
+                "branch_id": branch_id,
+            }
+        ).insert(ignore_permissions=True)
+
+    return frappe.db.get_value(
+        SWEEP_STATE_DOCTYPE_NAME,
+        sweep_key,
+        ["last_modified", "last_name", "last_full_sweep"],
+        as_dict=True,
+    )
+
+
+def save_sweep_state(sweep_key: str, values: dict) -> None:
+    frappe.db.set_value(SWEEP_STATE_DOCTYPE_NAME, sweep_key, values)
+    frappe.db.commit()
 
-    query = """
-        SELECT sle.name as name,
-            sle.owner,
-            sle.custom_submitted_successfully,
-            sle.custom_inventory_submitted_successfully,
-            qty_after_transaction as residual_qty,
-            sle.warehouse,
-            w.custom_branch as branch_id,
-            i.item_code as item,
-            custom_item_code_etims as item_code
-        FROM `tabStock Ledger Entry` sle
-            INNER JOIN tabItem i ON sle.item_code = i.item_code
-            INNER JOIN tabWarehouse w ON sle.warehouse = w.name
-        WHERE sle.custom_submitted_successfully = '1'
-            AND sle.custom_inventory_submitted_successfully = '0'
-        ORDER BY sle.creation DESC;
-        """
 
-    sles = frappe.db.sql(query, as_dict=True)
+@single_flight(key=get_shard_lock_key)
+def send_shard_item_inventory_information(
+    company_name: str,
+    branch_id: str,
+    shard_size: int = SWEEP_MAX_RECORDS,
+    include_unbranched: bool = False,
+) -> None:
+    from ..apis.apis import send_inventory
 
-    for stock_ledger in sles:
-        response = json.dumps(stock_ledger)
+    warehouses = get_shard_warehouses(company_name, branch_id, include_unbranched)
+    settings = get_curr_env_etims_settings(company_name, branch_id)
 
+    if not warehouses or not settings or is_etims_queue_busy():
+        return
+
+    snapshot_time = now()
+    inventory_snapshot = get_inventory_snapshot(snapshot_time, warehouses)
+
+    for stock_level in inventory_snapshot:
         try:
-            submit_inventory(response)
+            # Submitted to the shard's branch, including the stock of unbranched warehouses it covers
+            send_inventory(stock_level, settings)
 
         except Exception as error:
             # TODO: Suspicious looking type(error)
             frappe.throw("Error Encountered", type(error), title="Error")
 
+    mark_superseded_inventory_entries(
+        snapshot_time,
+        [stock_level.name for stock_level in inventory_snapshot],
+        warehouses,
+    )
+
+
+def get_inventory_snapshot(snapshot_time: str, warehouses: list[str]) -> list[dict]:
+    """Fetches the current stock level of every (item, branch) pair with stock ledger entries
+    pending inventory submission, i.e. one row per pair instead of one per ledger entry.
+
+    The residual quantity is the sum of the latest quantity after transaction in each of the branch's warehouses.
+
+    Args:
+        snapshot_time (str): Only ledger entries created up to this time are considered
+        warehouses (list[str]): The warehouses of the shard's branch
+
+    Returns:
+        list[dict]: The latest pending ledger entry of each pair, with its residual quantity
+    """
+    query = """
+        WITH pending AS (
+            SELECT sle.name,
+                sle.owner,
+                sle.item_code,
+                w.custom_branch AS branch_id,
+                ROW_NUMBER() OVER (
+                    PARTITION BY sle.item_code, w.custom_branch
+                    ORDER BY sle.posting_date DESC, sle.posting_time DESC, sle.creation DESC
+                ) AS entry_rank
+            FROM `tabStock Ledger Entry` sle
+                INNER JOIN tabWarehouse w ON sle.warehouse = w.name
+            WHERE sle.custom_submitted_successfully = 1
+                AND sle.custom_inventory_submitted_successfully = 0
+                AND sle.creation <= %(snapshot_time)s
+                AND sle.warehouse IN %(warehouses)s
+        ),
+        warehouse_levels AS (
+            SELECT sle.item_code,
+                w.custom_branch AS branch_id,
+                sle.qty_after_transaction,
+                ROW_NUMBER() OVER (
+                    PARTITION BY sle.item_code, sle.warehouse
+                    ORDER BY sle.posting_date DESC, sle.posting_time DESC, sle.creation DESC
+                ) AS entry_rank
+            FROM `tabStock Ledger Entry` sle
+                INNER JOIN tabWarehouse w ON sle.warehouse = w.name
+                INNER JOIN pending p ON p.item_code = sle.item_code
+                    AND p.branch_id <=> w.custom_branch
+                    AND p.entry_rank = 1
+            WHERE sle.is_cancelled = 0
+                AND sle.creation <= %(snapshot_time)s
+                AND sle.warehouse IN %(warehouses)s
+        )
+        SELECT p.name,
+            p.owner,
+            p.branch_id,
+            i.item_code AS item,
+            i.custom_item_code_etims AS item_code,
+            SUM(wl.qty_after_transaction) AS residual_qty
+        FROM pending p
+            INNER JOIN tabItem i ON p.item_code = i.item_code
+            INNER JOIN warehouse_levels wl ON wl.item_code = p.item_code
+                AND wl.branch_id <=> p.branch_id
+                AND wl.entry_rank = 1
+        WHERE p.entry_rank = 1
+        GROUP BY p.name, p.owner, p.branch_id, i.item_code, i.custom_item_code_etims;
+        """
+
+    return frappe.db.sql(
+        query, {"snapshot_time": snapshot_time, "warehouses": warehouses}, as_dict=True
+    )
+
+
+def mark_superseded_inventory_entries(
+    snapshot_time: str, latest_entries: list[str], warehouses: list[str]
+) -> None:
+    """Marks the pending stock ledger entries superseded by a later entry for the same (item, branch) as submitted.
+    The latest entries are marked by their submission's success callback.
+
+    Args:
+        snapshot_time (str): The time the inventory snapshot was taken at
+        latest_entries (list[str]): The latest pending ledger entry of each (item, branch) pair
+        warehouses (list[str]): The warehouses of the shard's branch
+    """
+    if not latest_entries:
+        return
+
+    frappe.db.sql(
+        """
+        UPDATE `tabStock Ledger Entry`
+        SET custom_inventory_submitted_successfully = 1
+        WHERE custom_submitted_successfully = 1
+            AND custom_inventory_submitted_successfully = 0
+            AND creation <= %(snapshot_time)s
+            AND warehouse IN %(warehouses)s
+            AND name NOT IN %(latest_entries)s
+        """,
+        {
+            "snapshot_time": snapshot_time,
+            "latest_entries": latest_entries,
+            "warehouses": warehouses,
+        },
+    )
+
 
 @frappe.whitelist()
-def refresh_code_lists() -> str | None:
-    company_name: str | None = frappe.defaults.get_user_default("Company")
+def refresh_code_lists(force_full_sync: bool | str = False) -> str | None:
+    settings = get_code_lists_settings()
+
+    if not settings:
+        return
 
-    headers = build_headers(company_name)
-    server_url = get_server_url(company_name)
+    headers = build_headers_from_settings(settings)
+    server_url = settings.server_url
 
     code_search_route_path, last_request_date = get_route_path(
         "CodeSearchReq"
@@ -162,8 +636,18 @@ def refresh_code_lists() -> str | None:
     if headers and server_url and code_search_route_path:
         url = f"{server_url}{code_search_route_path}"
         payload = {
-            "lastReqDt": "20200101000000"
-        }  # Hard-coded to this date to get all code lists.
+            "lastReqDt": get_sync_request_date(
+                last_request_date,
+                CODE_LISTS_FULL_SYNC_DATE,
+                sbool(force_full_sync),
+                (
+                    UNIT_OF_QUANTITY_DOCTYPE_NAME,
+                    TAXATION_TYPE_DOCTYPE_NAME,
+                    PACKAGING_UNIT_DOCTYPE_NAME,
+                    COUNTRIES_DOCTYPE_NAME,
+                ),
+            )
+        }
 
         endpoints_builder.headers = headers
         endpoints_builder.payload = payload
@@ -178,34 +662,42 @@ def refresh_code_lists() -> str | None:
 
 
 @frappe.whitelist()
-def get_item_classification_codes() -> str | None:
-    company_name: str | None = frappe.defaults.get_user_default("Company")
+def get_item_classification_codes(force_full_sync: bool | str = False) -> str | None:
+    settings = get_code_lists_settings()
+
+    if not settings:
+        return
 
-    headers = build_headers(company_name)
-    server_url = get_server_url(company_name)
+    headers = build_headers_from_settings(settings)
+    server_url = settings.server_url
 
-    item_cls_route_path, last_request_date = get_route_path(
-        "ItemClsSearchReq"
-    )  # overwriting last_request_date since it's not used elsewhere for this task
+    item_cls_route_path, last_request_date = get_route_path("ItemClsSearchReq")
 
     if headers and server_url and item_cls_route_path:
         url = f"{server_url}{item_cls_route_path}"
         payload = {
-            "lastReqDt": "20230101000000"
-        }  # Hard-coded to a this date to get all code lists.
-
-        endpoints_builder.url = url
-        endpoints_builder.headers = headers
-        endpoints_builder.payload = payload
-        endpoints_builder.error_callback = on_error
-
-        # Fetch and update item classification codes from ItemClsSearchReq endpoint
-        endpoints_builder.url = f"{server_url}{item_cls_route_path}"
-        endpoints_builder.success_callback = update_item_classification_codes
+            "lastReqDt": get_sync_request_date(
+                last_request_date,
+                ITEM_CLASSIFICATIONS_FULL_SYNC_DATE,
+                sbool(force_full_sync),
+                (ITEM_CLASSIFICATIONS_DOCTYPE_NAME,),
+            )
+        }
+
+        resumable_endpoints_builder.url = url
+        resumable_endpoints_builder.headers = headers
+        resumable_endpoints_builder.payload = payload
+        resumable_endpoints_builder.error_callback = on_error
+
+        # Fetch and update item classification codes from ItemClsSearchReq endpoint,
+        # saving them in checkpointed batches from the spooled response
+        resumable_endpoints_builder.records_key = "itemClsList"
+        resumable_endpoints_builder.chunk_size = ITEM_CLASSIFICATION_BATCH_SIZE
+        resumable_endpoints_builder.records_callback = save_item_classifications
+        resumable_endpoints_builder.success_callback = streamed_search_on_success
 
-        # endpoints_builder.make_remote_call(doctype=None, document_name=None)
         frappe.enqueue(
-            endpoints_builder.make_remote_call,
+            resumable_endpoints_builder.make_remote_call,
             is_async=True,
             queue="long",
             timeout=1200,
@@ -215,148 +707,374 @@ def get_item_classification_codes() -> str | None:
         return "succeeded"
 
 
-def run_updater_functions(response: dict) -> None:
-    for class_list in response["data"]["clsList"]:
-        if class_list["cdClsNm"] == "Quantity Unit":
-            update_unit_of_quantity(class_list)
+def get_code_lists_settings() -> dict | None:
+    """Picks the settings record used to fetch code lists and item classifications.
+    These catalogues are the same for every taxpayer, so they are fetched once, with the
+    first active settings record, instead of once per company or branch.
 
-        if class_list["cdClsNm"] == "Taxation Type":
-            update_taxation_type(class_list)
+    Returns:
+        dict | None: The settings record, or None if no settings record is active
+    """
+    active_settings = sorted(
+        get_active_branch_settings(),
+        key=lambda settings: (settings.company, settings.bhfid),
+    )
 
-        if class_list["cdClsNm"] == "Packing Unit":
-            update_packaging_units(class_list)
+    return active_settings[0] if active_settings else None
+
+
+def resume_pending_sync_jobs() -> None:
+    """Re-enqueues sync jobs that failed, or whose worker stopped mid-way, e.g. on timeout.
+
+    Each job continues from its last committed chunk of the spooled response.
+    Jobs that have used up their attempts are left for investigation.
+    """
+    stale_before = add_to_date(now_datetime(), minutes=-SYNC_JOB_STALE_MINUTES)
+    grace_before = add_to_date(now_datetime(), minutes=-SYNC_JOB_GRACE_MINUTES)
+    retry_filters = {"attempts": ("<", MAX_SYNC_JOB_ATTEMPTS)}
+
+    pending_jobs = frappe.get_all(
+        SYNC_JOB_DOCTYPE_NAME,
+        filters={
+            **retry_filters,
+            "status": ("in", ("Queued", "Failed")),
+            "modified": ("<", grace_before),
+        },
+        pluck="name",
+    ) + frappe.get_all(
+        SYNC_JOB_DOCTYPE_NAME,
+        filters={
+            **retry_filters,
+            "status": "Processing",
+            "modified": ("<", stale_before),
+        },
+        pluck="name",
+    )
 
-        if class_list["cdClsNm"] == "Country":
-            update_countries(class_list)
+    for job_name in pending_jobs:
+        frappe.enqueue(
+            process_sync_job,
+            queue="long",
+            timeout=1200,
+            job_name=job_name,
+        )
 
 
-def update_unit_of_quantity(data: dict) -> None:
-    doc: Document | None = None
+def get_sync_request_date(
+    last_request_date: datetime | None,
+    full_sync_request_date: str,
+    force_full_sync: bool,
+    synced_doctypes: tuple[str, ...],
+) -> str:
+    """Determines the lastReqDt to send when syncing a catalogue from eTims.
 
-    for unit_of_quantity in data["dtlList"]:
-        try:
-            doc = frappe.get_doc(UNIT_OF_QUANTITY_DOCTYPE_NAME, unit_of_quantity["cd"])
+    The route's last successful request date is used so that only changes since then
+    are fetched. A full sync is performed when forced, when the route has never been
+    called, or when any of the synced doctypes is still empty.
+
+    Args:
+        last_request_date (datetime | None): The route's last successful request date
+        full_sync_request_date (str): The lastReqDt that fetches the whole catalogue
+        force_full_sync (bool): Whether to ignore the last request date
+        synced_doctypes (tuple[str, ...]): The doctypes populated from the catalogue
 
-        except frappe.DoesNotExistError:
-            doc = frappe.new_doc(UNIT_OF_QUANTITY_DOCTYPE_NAME)
+    Returns:
+        str: The lastReqDt value, formatted as %Y%m%d%H%M%S
+    """
+    if (
+        force_full_sync
+        or not last_request_date
+        or not all(frappe.db.count(doctype) for doctype in synced_doctypes)
+    ):
+        return full_sync_request_date
 
-        finally:
-            doc.code = unit_of_quantity["cd"]
-            doc.sort_order = unit_of_quantity["srtOrd"]
-            doc.code_name = unit_of_quantity["cdNm"]
-            doc.code_description = unit_of_quantity["cdDesc"]
+    return last_request_date.strftime("%Y%m%d%H%M%S")
 
-            doc.save()
+
+def run_updater_functions(response: dict) -> None:
+    summary = {"inserted": 0, "updated": 0, "unchanged": 0}
+    updaters = {
+        "Quantity Unit": update_unit_of_quantity,
+        "Taxation Type": update_taxation_type,
+        "Packing Unit": update_packaging_units,
+        "Country": update_countries,
+    }
+
+    try:
+        for class_list in response["data"]["clsList"]:
+            updater = updaters.get(class_list["cdClsNm"])
+
+            if updater:
+                for key, count in updater(class_list).items():
+                    summary[key] += count
+
+    except Exception:
+        frappe.db.rollback()
+        raise
 
     frappe.db.commit()
 
+    message = (
+        "Code lists refreshed. Inserted: %(inserted)s, Updated: %(updated)s, Unchanged: %(unchanged)s"
+        % summary
+    )
+    etims_logger.info(message)
+    frappe.msgprint(message)
 
-def update_taxation_type(data: dict) -> None:
-    doc: Document | None = None
 
-    for taxation_type in data["dtlList"]:
-        try:
-            doc = frappe.get_doc(TAXATION_TYPE_DOCTYPE_NAME, taxation_type["cd"])
+def bulk_upsert_code_list(
+    doctype: str, records: list[dict], naming_field: str
+) -> dict[str, int]:
+    """Writes only new or changed code list records, in bulk.
 
-        except frappe.DoesNotExistError:
-            doc = frappe.new_doc(TAXATION_TYPE_DOCTYPE_NAME)
+    Existing rows are loaded once and diffed against the incoming records.
+    New rows are written as multi-row inserts and changed rows as bulk updates.
+    Committing is left to the caller so a whole code list refresh is one transaction.
 
-        finally:
-            doc.cd = taxation_type["cd"]
-            doc.cdnm = taxation_type["cdNm"]
-            doc.cddesc = taxation_type["cdDesc"]
-            doc.useyn = 1 if taxation_type["useYn"] == "Y" else 0
-            doc.srtord = taxation_type["srtOrd"]
-            doc.userdfncd1 = taxation_type["userDfnCd1"]
-            doc.userdfncd2 = taxation_type["userDfnCd2"]
-            doc.userdfncd3 = taxation_type["userDfnCd3"]
+    Args:
+        doctype (str): The code list doctype
+        records (list[dict]): The incoming records, keyed by the doctype's fieldnames
+        naming_field (str): The field the doctype's records are named from
 
-            doc.save()
+    Returns:
+        dict[str, int]: Number of inserted, updated and unchanged records
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
 
-    frappe.db.commit()
+    if not records:
+        return counts
 
+    fields = list(records[0].keys())
+    existing = {row.name: row for row in frappe.get_all(doctype, ["name", *fields])}
 
-def update_packaging_units(data: dict) -> None:
-    doc: Document | None = None
+    to_insert: dict[str, dict] = {}
+    to_update: dict[str, dict] = {}
 
-    for packaging_unit in data["dtlList"]:
-        try:
-            doc = frappe.get_doc(PACKAGING_UNIT_DOCTYPE_NAME, packaging_unit["cd"])
+    for record in records:
+        name = cstr(record[naming_field])
+        current = existing.get(name)
 
-        except frappe.DoesNotExistError:
-            doc = frappe.new_doc(PACKAGING_UNIT_DOCTYPE_NAME)
+        if current is None:
+            to_insert[name] = record
 
-        finally:
-            doc.code = packaging_unit["cd"]
-            doc.code_name = packaging_unit["cdNm"]
-            doc.sort_order = packaging_unit["srtOrd"]
-            doc.code_description = packaging_unit["cdDesc"]
+        elif any(
+            cstr(current.get(field)) != cstr(value) for field, value in record.items()
+        ):
+            to_update[name] = record
 
-            doc.save()
+        else:
+            counts["unchanged"] += 1
+
+    if to_insert:
+        timestamp, user = now(), frappe.session.user
+
+        # bulk_insert writes the given columns only, so the doctype's defaults are set explicitly
+        defaults = get_insert_defaults(doctype, exclude=fields)
+
+        frappe.db.bulk_insert(
+            doctype,
+            [
+                "name",
+                "creation",
+                "modified",
+                "owner",
+                "modified_by",
+                "docstatus",
+                *fields,
+                *defaults,
+            ],
+            [
+                (
+                    name,
+                    timestamp,
+                    timestamp,
+                    user,
+                    user,
+                    0,
+                    *(record[field] for field in fields),
+                    *defaults.values(),
+                )
+                for name, record in to_insert.items()
+            ],
+        )
 
-    frappe.db.commit()
+    if to_update:
+        frappe.db.bulk_update(doctype, to_update)
 
+    counts["inserted"], counts["updated"] = len(to_insert), len(to_update)
 
-def update_countries(data: dict) -> None:
-    doc: Document | None = None
+    return counts
 
-    for country in data["dtlList"]:
-        try:
-            doc = frappe.get_doc(COUNTRIES_DOCTYPE_NAME, country["cdNm"])
 
-        except frappe.DoesNotExistError:
-            doc = frappe.new_doc(COUNTRIES_DOCTYPE_NAME)
+def get_insert_defaults(
+    doctype: str, exclude: list[str]
+) -> dict[str, str | int | float]:
+    """The default value of each field of a doctype, as a new document of it would be given
 
-        finally:
-            doc.code = country["cd"]
-            doc.code_name = country["cdNm"]
-            doc.sort_order = country["srtOrd"]
-            doc.code_description = country["cdDesc"]
+    Args:
+        doctype (str): The doctype
+        exclude (list[str]): Fields left out, e.g. those set by the caller
 
-            doc.save()
+    Returns:
+        dict[str, str | int | float]: The defaults, keyed by fieldname
+    """
+    new_doc = frappe.new_doc(doctype)
 
-    frappe.db.commit()
+    return {
+        field.fieldname: new_doc.get(field.fieldname)
+        for field in frappe.get_meta(doctype).fields
+        if field.fieldname not in exclude
+        and field.fieldtype not in frappe.model.table_fields
+        and new_doc.get(field.fieldname) not in (None, "")
+    }
+
+
+def update_unit_of_quantity(data: dict) -> dict[str, int]:
+    return bulk_upsert_code_list(
+        UNIT_OF_QUANTITY_DOCTYPE_NAME,
+        [
+            {
+                "code": unit_of_quantity["cd"],
+                "sort_order": unit_of_quantity["srtOrd"],
+                "code_name": unit_of_quantity["cdNm"],
+                "code_description": unit_of_quantity["cdDesc"],
+            }
+            for unit_of_quantity in data["dtlList"]
+        ],
+        naming_field="code",
+    )
+
+
+def update_taxation_type(data: dict) -> dict[str, int]:
+    return bulk_upsert_code_list(
+        TAXATION_TYPE_DOCTYPE_NAME,
+        [
+            {
+                "cd": taxation_type["cd"],
+                "cdnm": taxation_type["cdNm"],
+                "cddesc": taxation_type["cdDesc"],
+                "useyn": 1 if taxation_type["useYn"] == "Y" else 0,
+                "srtord": taxation_type["srtOrd"],
+                "userdfncd1": taxation_type["userDfnCd1"],
+                "userdfncd2": taxation_type["userDfnCd2"],
+                "userdfncd3": taxation_type["userDfnCd3"],
+            }
+            for taxation_type in data["dtlList"]
+        ],
+        naming_field="cd",
+    )
+
+
+def update_packaging_units(data: dict) -> dict[str, int]:
+    return bulk_upsert_code_list(
+        PACKAGING_UNIT_DOCTYPE_NAME,
+        [
+            {
+                "code": packaging_unit["cd"],
+                "code_name": packaging_unit["cdNm"],
+                "sort_order": packaging_unit["srtOrd"],
+                "code_description": packaging_unit["cdDesc"],
+            }
+            for packaging_unit in data["dtlList"]
+        ],
+        naming_field="code",
+    )
+
+
+def update_countries(data: dict) -> dict[str, int]:
+    return bulk_upsert_code_list(
+        COUNTRIES_DOCTYPE_NAME,
+        [
+            {
+                "code": country["cd"],
+                "code_name": country["cdNm"],
+                "sort_order": country["srtOrd"],
+                "code_description": country["cdDesc"],
+            }
+            for country in data["dtlList"]
+        ],
+        naming_field="code_name",
+    )
 
 
 def update_item_classification_codes(response: dict) -> None:
-    code_list = response["data"]["itemClsList"]
-    existing_classifications = {
-        classification["name"]: classification
-        for classification in frappe.get_all(ITEM_CLASSIFICATIONS_DOCTYPE_NAME, ["*"])
+    save_item_classifications(response["data"]["itemClsList"])
+
+
+def save_item_classifications(code_list: list[dict]) -> None:
+    """Upserts item classifications in parameterised batches.
+
+    Rows whose content hash matches the stored row are skipped. Each batch is
+    written with a single multi-row INSERT and committed on its own.
+
+    Args:
+        code_list (list[dict]): The itemClsList records received from eTims
+    """
+    if not code_list:
+        return
+
+    query = f"""
+        SELECT name, {", ".join(ITEM_CLASSIFICATION_FIELDS)}
+        FROM `tab{ITEM_CLASSIFICATIONS_DOCTYPE_NAME}`
+        WHERE name IN %(names)s
+    """
+    existing_hashes = {
+        row[0]: get_content_hash(row[1:])
+        for row in frappe.db.sql(
+            query, {"names": [record["itemClsCd"] for record in code_list]}
+        )
     }
 
+    changed_rows = []
+
     for item_classification in code_list:
-        if item_classification["itemClsCd"] in existing_classifications:
-            # Prefer Raw SQL since using the ORM causes performance degradation. Still under investigation
-            update_query = f"""
-                UPDATE `tab{ITEM_CLASSIFICATIONS_DOCTYPE_NAME}`
-                SET itemclscd = '{item_classification["itemClsCd"]}',
-                    itemclslvl = '{item_classification["itemClsLvl"]}',
-                    itemclsnm = '{item_classification["itemClsNm"].replace("'", " ")}',
-                    taxtycd = '{item_classification["taxTyCd"]}',
-                    useyn = '{1 if item_classification["useYn"] == "Y" else 0}',
-                    mjrtgyn  = '{1 if item_classification["mjrTgYn"] == "Y" else 0}',
-                    modified = SYSDATE()
-                WHERE name = '{item_classification["itemClsCd"]}';
-            """
-
-            frappe.db.sql(update_query)
+        row = (
+            item_classification["itemClsCd"],
+            item_classification["itemClsLvl"],
+            item_classification["itemClsNm"],
+            item_classification["taxTyCd"],
+            1 if item_classification["useYn"] == "Y" else 0,
+            1 if item_classification["mjrTgYn"] == "Y" else 0,
+        )
 
-        else:
-            insert_query = f"""
-                INSERT INTO `tab{ITEM_CLASSIFICATIONS_DOCTYPE_NAME}`
-                    (name, itemclscd, itemclslvl, itemclsnm, taxtycd, useyn, mjrtgyn, creation)
-                VALUES
-                    ('{item_classification["itemClsCd"]}',
-                     '{item_classification["itemClsCd"]}',
-                     '{item_classification["itemClsLvl"]}',
-                     '{item_classification["itemClsNm"].replace("'", " ")}',
-                     '{item_classification["taxTyCd"]}',
-                     '{1 if item_classification["useYn"] == "Y" else 0}',
-                     '{1 if item_classification["mjrTgYn"] == "Y" else 0}',
-                     SYSDATE());
-            """
-
-            frappe.db.sql(insert_query)
+        if existing_hashes.get(row[0]) != get_content_hash(row):
+            changed_rows.append(row)
+
+    insert_statement = f"""
+        INSERT INTO `tab{ITEM_CLASSIFICATIONS_DOCTYPE_NAME}`
+            (name, {", ".join(ITEM_CLASSIFICATION_FIELDS)}, creation, modified, owner, modified_by)
+    """
+    on_duplicate = """
+        ON DUPLICATE KEY UPDATE
+            itemclslvl = VALUES(itemclslvl),
+            itemclsnm = VALUES(itemclsnm),
+            taxtycd = VALUES(taxtycd),
+            useyn = VALUES(useyn),
+            mjrtgyn = VALUES(mjrtgyn),
+            modified = VALUES(modified),
+            modified_by = VALUES(modified_by)
+    """
+    timestamp, user = now(), frappe.session.user
+
+    for start in range(0, len(changed_rows), ITEM_CLASSIFICATION_BATCH_SIZE):
+        batch = changed_rows[start : start + ITEM_CLASSIFICATION_BATCH_SIZE]
+
+        insert_many(
+            insert_statement,
+            [(row[0], *row, timestamp, timestamp, user, user) for row in batch],
+            on_duplicate,
+        )
+        frappe.db.commit()
 
-    frappe.db.commit()
+    etims_logger.info(
+        "Item classifications synced. Written: %s, Unchanged: %s",
+        len(changed_rows),
+        len(code_list) - len(changed_rows),
+    )
+
+
+def get_content_hash(values: tuple) -> bytes:
+    """Hashes a row's values so unchanged rows can be detected cheaply"""
+    return sha256(
+        "\x1f".join(cstr(value) for value in values).encode(), usedforsecurity=False
+    ).digest()
@@ -0,0 +1,267 @@
+from datetime import datetime
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from ..doctype.doctype_names_mapping import (
+    ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
+    SWEEP_STATE_DOCTYPE_NAME,
+    UNIT_OF_QUANTITY_DOCTYPE_NAME,
+)
+from ..utils import iter_pending_records
+from .tasks import (
+    bulk_upsert_code_list,
+    get_sync_request_date,
+    save_item_classifications,
+    sweep_pending_records,
+)
+
+TEST_CODES = ("TSTQ1", "TSTQ2")
+TEST_ITEM_CLASSIFICATION_CODE = "99999999"
+
+
+def build_unit_of_quantity(code: str, description: str) -> dict:
+    return {
+        "code": code,
+        "sort_order": 1,
+        "code_name": code,
+        "code_description": description,
+    }
+
+
+def sweep(doctype: str, filters: dict, handled: int | None = None, **kwargs) -> list:
+    """Runs a sweep, returning its batches. Only the first handled records of a batch are handled if set"""
+    batches = []
+
+    def submit_batch(batch: list[str]) -> int:
+        batches.append(batch)
+        return len(batch) if handled is None else handled
+
+    sweep_pending_records(doctype, filters, submit_batch, **kwargs)
+
+    return batches
+
+
+class TestTasks(FrappeTestCase):
+    """Test Cases"""
+
+    def tearDown(self) -> None:
+        for code in TEST_CODES:
+            frappe.delete_doc_if_exists(UNIT_OF_QUANTITY_DOCTYPE_NAME, code, force=1)
+
+        frappe.delete_doc_if_exists(
+            ITEM_CLASSIFICATIONS_DOCTYPE_NAME, TEST_ITEM_CLASSIFICATION_CODE, force=1
+        )
+        frappe.db.delete(
+            SWEEP_STATE_DOCTYPE_NAME, {"swept_doctype": UNIT_OF_QUANTITY_DOCTYPE_NAME}
+        )
+
+    def test_bulk_upsert_code_list(self) -> None:
+        records = [build_unit_of_quantity(code, code) for code in TEST_CODES]
+
+        counts = bulk_upsert_code_list(
+            UNIT_OF_QUANTITY_DOCTYPE_NAME, records, naming_field="code"
+        )
+
+        self.assertEqual(counts, {"inserted": 2, "updated": 0, "unchanged": 0})
+        self.assertTrue(frappe.db.exists(UNIT_OF_QUANTITY_DOCTYPE_NAME, "TSTQ1"))
+
+        records[0] = build_unit_of_quantity("TSTQ1", "Changed Description")
+
+        counts = bulk_upsert_code_list(
+            UNIT_OF_QUANTITY_DOCTYPE_NAME, records, naming_field="code"
+        )
+
+        self.assertEqual(counts, {"inserted": 0, "updated": 1, "unchanged": 1})
+        self.assertEqual(
+            frappe.db.get_value(
+                UNIT_OF_QUANTITY_DOCTYPE_NAME, "TSTQ1", "code_description"
+            ),
+            "Changed Description",
+        )
+
+    def test_save_item_classifications_keeps_quotes(self) -> None:
+        classification = {
+            "itemClsCd": TEST_ITEM_CLASSIFICATION_CODE,
+            "itemClsLvl": 4,
+            "itemClsNm": "Men's Clothing",
+            "taxTyCd": "B",
+            "useYn": "Y",
+            "mjrTgYn": "N",
+        }
+
+        save_item_classifications([classification])
+        modified = frappe.db.get_value(
+            ITEM_CLASSIFICATIONS_DOCTYPE_NAME, TEST_ITEM_CLASSIFICATION_CODE, "modified"
+        )
+
+        self.assertEqual(
+            frappe.db.get_value(
+                ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
+                TEST_ITEM_CLASSIFICATION_CODE,
+                "itemclsnm",
+            ),
+            "Men's Clothing",
+        )
+
+        # Unchanged rows are skipped, leaving the modified timestamp untouched
+        save_item_classifications([classification])
+
+        self.assertEqual(
+            frappe.db.get_value(
+                ITEM_CLASSIFICATIONS_DOCTYPE_NAME,
+                TEST_ITEM_CLASSIFICATION_CODE,
+                "modified",
+            ),
+            modified,
+        )
+
+    def test_get_sync_request_date(self) -> None:
+        last_request_date = datetime(2024, 5, 1, 10, 30, 0)
+        full_sync_date = "20200101000000"
+
+        self.assertEqual(
+            get_sync_request_date(
+                last_request_date,
+                full_sync_date,
+                False,
+                (UNIT_OF_QUANTITY_DOCTYPE_NAME,),
+            ),
+            "20240501103000",
+        )
+        self.assertEqual(
+            get_sync_request_date(
+                last_request_date,
+                full_sync_date,
+                True,
+                (UNIT_OF_QUANTITY_DOCTYPE_NAME,),
+            ),
+            full_sync_date,
+        )
+        self.assertEqual(
+            get_sync_request_date(
+                None, full_sync_date, False, (UNIT_OF_QUANTITY_DOCTYPE_NAME,)
+            ),
+            full_sync_date,
+        )
+
+    def test_iter_pending_records_pages_by_modified_and_name(self) -> None:
+        bulk_upsert_code_list(
+            UNIT_OF_QUANTITY_DOCTYPE_NAME,
+            [build_unit_of_quantity(code, "Swept") for code in TEST_CODES],
+            naming_field="code",
+        )
+
+        batches = list(
+            iter_pending_records(
+                UNIT_OF_QUANTITY_DOCTYPE_NAME,
+                {"code_description": "Swept"},
+                batch_size=1,
+            )
+        )
+
+        self.assertEqual(
+            [[record.name for record in batch] for batch in batches],
+            [["TSTQ1"], ["TSTQ2"]],
+        )
+
+        # Continuing after the first record yields only the records following it
+        first_record = batches[0][0]
+
+        self.assertEqual(
+            [
+                record.name
+                for batch in iter_pending_records(
+                    UNIT_OF_QUANTITY_DOCTYPE_NAME,
+                    {"code_description": "Swept"},
+                    start=(first_record.modified, first_record.name),
+                )
+                for record in batch
+            ],
+            ["TSTQ2"],
+        )
+
+    def test_sweep_pending_records_continues_from_watermark(self) -> None:
+        bulk_upsert_code_list(
+            UNIT_OF_QUANTITY_DOCTYPE_NAME,
+            [build_unit_of_quantity(code, "Swept") for code in TEST_CODES],
+            naming_field="code",
+        )
+        filters = {"code_description": "Swept"}
+
+        self.assertEqual(
+            sweep(UNIT_OF_QUANTITY_DOCTYPE_NAME, filters),
+            [list(TEST_CODES)],
+        )
+        self.assertEqual(sweep(UNIT_OF_QUANTITY_DOCTYPE_NAME, filters), [])
+
+        # A full sweep starts from the oldest record again
+        frappe.db.set_value(
+            SWEEP_STATE_DOCTYPE_NAME,
+            UNIT_OF_QUANTITY_DOCTYPE_NAME,
+            "last_full_sweep",
+            None,
+        )
+
+        self.assertEqual(
+            sweep(UNIT_OF_QUANTITY_DOCTYPE_NAME, filters),
+            [list(TEST_CODES)],
+        )
+
+    def test_sweep_stops_at_the_first_refused_record(self) -> None:
+        bulk_upsert_code_list(
+            UNIT_OF_QUANTITY_DOCTYPE_NAME,
+            [build_unit_of_quantity(code, "Swept") for code in TEST_CODES],
+            naming_field="code",
+        )
+        filters = {"code_description": "Swept"}
+
+        self.assertEqual(
+            sweep(UNIT_OF_QUANTITY_DOCTYPE_NAME, filters, handled=1),
+            [list(TEST_CODES)],
+        )
+
+        # The watermark is on the last record handled, so the refused record is swept again
+        self.assertEqual(
+            sweep(UNIT_OF_QUANTITY_DOCTYPE_NAME, filters, handled=0),
+            [[TEST_CODES[1]]],
+        )
+        self.assertEqual(
+            sweep(UNIT_OF_QUANTITY_DOCTYPE_NAME, filters), [[TEST_CODES[1]]]
+        )
+        self.assertEqual(sweep(UNIT_OF_QUANTITY_DOCTYPE_NAME, filters), [])
+
+    def test_sharded_sweeps_keep_their_own_watermark(self) -> None:
+        bulk_upsert_code_list(
+            UNIT_OF_QUANTITY_DOCTYPE_NAME,
+            [build_unit_of_quantity(code, "Swept") for code in TEST_CODES],
+            naming_field="code",
+        )
+
+        # A list filter matches any of its values
+        filters = {"code_description": "Swept", "code": [TEST_CODES[0], None]}
+
+        self.assertEqual(
+            sweep(
+                UNIT_OF_QUANTITY_DOCTYPE_NAME,
+                filters,
+                company_name="_Test Company",
+                branch_id="00",
+            ),
+            [[TEST_CODES[0]]],
+        )
+        self.assertEqual(
+            sweep(
+                UNIT_OF_QUANTITY_DOCTYPE_NAME,
+                filters,
+                company_name="_Test Company",
+                branch_id="01",
+            ),
+            [[TEST_CODES[0]]],
+        )
+        self.assertTrue(
+            frappe.db.exists(
+                SWEEP_STATE_DOCTYPE_NAME,
+                f"{UNIT_OF_QUANTITY_DOCTYPE_NAME}:_Test Company:00",
+            )
+        )
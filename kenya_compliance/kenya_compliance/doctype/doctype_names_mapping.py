@@ -37,6 +37,12 @@ REGISTERED_STOCK_MOVEMENTS_ITEM_DOCTYPE_NAME: Final[str] = (
 REGISTERED_IMPORTED_ITEM_DOCTYPE_NAME: Final[str] = (
     "Navari eTims Registered Imported Item"
 )
+SYNC_JOB_DOCTYPE_NAME: Final[str] = "Navari eTims Sync Job"
+SWEEP_STATE_DOCTYPE_NAME: Final[str] = "Navari eTims Sweep State"
+ITEM_CODE_COUNTER_DOCTYPE_NAME: Final[str] = "Navari eTims Item Code Counter"
+METRICS_DOCTYPE_NAME: Final[str] = "Navari eTims Metrics"
+SUBMISSION_BACKLOG_DOCTYPE_NAME: Final[str] = "Navari eTims Submission Backlog"
+SUBMISSION_THROUGHPUT_DOCTYPE_NAME: Final[str] = "Navari eTims Submission Throughput"
 
 # Global Variables
 SANDBOX_SERVER_URL: Final[str] = "https://etims-api-sbx.kra.go.ke/etims-api"
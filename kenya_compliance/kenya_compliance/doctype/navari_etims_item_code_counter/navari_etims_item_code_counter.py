@@ -0,0 +1,128 @@
+# Copyright (c) 2024, Navari Ltd and contributors
+# For license information, please see license.txt
+
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Generator
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now
+
+from ..doctype_names_mapping import ITEM_CODE_COUNTER_DOCTYPE_NAME
+
+if TYPE_CHECKING:
+    from frappe.database.database import Database
+
+# Length of the zero-padded serial number following an item code's prefix
+ITEM_CODE_NUMBER_LENGTH = 7
+
+
+class NavarieTimsItemCodeCounter(Document):
+    """Holds the last serial number issued for an eTims item code prefix"""
+
+
+def reserve_item_codes(prefix: str, count: int = 1) -> list[str]:
+    """Reserves a range of consecutive item codes for a prefix, e.g. for a bulk import.
+
+    The prefix's counter is incremented atomically on a connection of its own, and committed at once,
+    so concurrent reservations never receive the same codes, nor wait for each other's item saves
+    to commit. Codes reserved by a save that is rolled back are not reissued, leaving a gap,
+    as eTims only requires item codes to be unique.
+    A counter is seeded from the highest code already issued for its prefix on first use.
+
+    Args:
+        prefix (str): The item code's country of origin, product type, packaging unit and unit of quantity codes
+        count (int, optional): The number of codes to reserve. Defaults to 1.
+
+    Returns:
+        list[str]: The reserved item codes
+    """
+    with get_autocommit_connection() as db:
+        last_number = increment_counter(db, prefix, count)
+
+    return [
+        f"{prefix}{str(number).zfill(ITEM_CODE_NUMBER_LENGTH)}"
+        for number in range(last_number - count + 1, last_number + 1)
+    ]
+
+
+def get_next_item_code(prefix: str) -> str:
+    return reserve_item_codes(prefix)[0]
+
+
+def increment_counter(db: "Database", prefix: str, count: int) -> int:
+    """Increments a prefix's counter, and commits it, on the given connection
+
+    Returns:
+        int: The counter's new value
+    """
+    timestamp, user = now(), frappe.session.user
+    seed = (
+        0
+        if db.exists(ITEM_CODE_COUNTER_DOCTYPE_NAME, prefix)
+        else get_last_issued_number(db, prefix)
+    )
+
+    # LAST_INSERT_ID(expr) stores the counter's new value for the connection, read back below
+    db.sql(
+        f"""
+        INSERT INTO `tab{ITEM_CODE_COUNTER_DOCTYPE_NAME}`
+            (name, prefix, last_number, creation, modified, owner, modified_by)
+        VALUES (
+            %(prefix)s, %(prefix)s, LAST_INSERT_ID(%(seed)s + %(count)s),
+            %(timestamp)s, %(timestamp)s, %(user)s, %(user)s
+        )
+        ON DUPLICATE KEY UPDATE
+            last_number = LAST_INSERT_ID(last_number + %(count)s),
+            modified = VALUES(modified),
+            modified_by = VALUES(modified_by)
+        """,
+        {
+            "prefix": prefix,
+            "seed": seed,
+            "count": count,
+            "timestamp": timestamp,
+            "user": user,
+        },
+    )
+    last_number = db.sql("SELECT LAST_INSERT_ID()")[0][0]
+    db.commit()
+
+    return last_number
+
+
+@contextmanager
+def get_autocommit_connection() -> Generator["Database", None, None]:
+    """Opens a connection of its own to the site's database, whose commits leave the current
+    transaction untouched
+    """
+    from frappe.database import get_db
+
+    db = get_db(
+        socket=frappe.conf.db_socket,
+        host=frappe.conf.db_host,
+        port=frappe.conf.db_port,
+        user=frappe.conf.db_user or frappe.conf.db_name,
+        cur_db_name=frappe.conf.db_name,
+    )
+    db.connect()
+
+    try:
+        yield db
+
+    finally:
+        db.close()
+
+
+def get_last_issued_number(db: "Database", prefix: str) -> int:
+    """Finds the highest serial number among the item codes issued for a prefix before its counter existed"""
+    last_number = db.sql(
+        """
+        SELECT MAX(CAST(SUBSTRING(custom_item_code_etims, %(number_start)s) AS UNSIGNED))
+        FROM tabItem
+        WHERE custom_item_code_etims LIKE %(pattern)s
+        """,
+        {"number_start": len(prefix) + 1, "pattern": f"{prefix}%"},
+    )[0][0]
+
+    return int(last_number or 0)
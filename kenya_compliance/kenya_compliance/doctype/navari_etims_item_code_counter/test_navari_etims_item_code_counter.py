@@ -0,0 +1,63 @@
+# Copyright (c) 2024, Navari Ltd and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from ..doctype_names_mapping import ITEM_CODE_COUNTER_DOCTYPE_NAME
+from .navari_etims_item_code_counter import (
+    get_autocommit_connection,
+    get_next_item_code,
+    increment_counter,
+    reserve_item_codes,
+)
+
+TEST_PREFIX = "ZZ9TSTU"
+
+
+class TestNavarieTimsItemCodeCounter(FrappeTestCase):
+    """Test Cases"""
+
+    def tearDown(self) -> None:
+        # Reservations are committed on their own connection, so are deleted on one too
+        with get_autocommit_connection() as db:
+            db.delete(ITEM_CODE_COUNTER_DOCTYPE_NAME, {"name": TEST_PREFIX})
+            db.commit()
+
+    def get_last_number(self) -> int:
+        with get_autocommit_connection() as db:
+            return db.get_value(
+                ITEM_CODE_COUNTER_DOCTYPE_NAME, TEST_PREFIX, "last_number"
+            )
+
+    def test_reserved_ranges_follow_each_other(self) -> None:
+        self.assertEqual(get_next_item_code(TEST_PREFIX), f"{TEST_PREFIX}0000001")
+        self.assertEqual(
+            reserve_item_codes(TEST_PREFIX, 3),
+            [f"{TEST_PREFIX}000000{number}" for number in (2, 3, 4)],
+        )
+
+        # A rolled back save leaves a gap rather than reissuing its codes
+        frappe.db.rollback()
+
+        self.assertEqual(get_next_item_code(TEST_PREFIX), f"{TEST_PREFIX}0000005")
+        self.assertEqual(self.get_last_number(), 5)
+
+    def test_concurrent_reservations_do_not_wait_for_each_other(self) -> None:
+        with (
+            get_autocommit_connection() as first,
+            get_autocommit_connection() as second,
+        ):
+            # A reservation waiting on the other's row lock fails instead of blocking the test
+            for db in (first, second):
+                db.sql("SET SESSION innodb_lock_wait_timeout = 1")
+
+            # Each connection then carries on in a transaction, as an item's save would
+            self.assertEqual(increment_counter(first, TEST_PREFIX, 2), 2)
+            first.begin()
+            self.assertEqual(increment_counter(second, TEST_PREFIX, 3), 5)
+            second.begin()
+            self.assertEqual(increment_counter(first, TEST_PREFIX, 1), 6)
+            self.assertEqual(increment_counter(second, TEST_PREFIX, 1), 7)
+
+        self.assertEqual(self.get_last_number(), 7)
@@ -0,0 +1,8 @@
+// Copyright (c) 2024, Navari Ltd and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Navari eTims Metrics", {
+// 	refresh(frm) {
+
+// 	},
+// });
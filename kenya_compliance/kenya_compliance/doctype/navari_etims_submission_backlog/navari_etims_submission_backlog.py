@@ -0,0 +1,365 @@
+# Copyright (c) 2024, Navari Ltd and contributors
+# For license information, please see license.txt
+
+import json
+from collections import defaultdict
+from datetime import datetime
+from functools import partial
+from hashlib import sha256
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, now, now_datetime
+
+from ...locks import single_flight
+from ..doctype_names_mapping import (
+    SUBMISSION_BACKLOG_DOCTYPE_NAME,
+    SUBMISSION_THROUGHPUT_DOCTYPE_NAME,
+)
+
+# The flag marking each tracked doctype's records as submitted, and the route they are submitted through
+TRACKED_DOCTYPES = {
+    "Sales Invoice": ("custom_successfully_submitted", "TrnsSalesSaveWrReq"),
+    "POS Invoice": ("custom_successfully_submitted", "TrnsSalesSaveWrReq"),
+    "Purchase Invoice": ("custom_submitted_successfully", "TrnsPurchaseSaveReq"),
+    "Stock Ledger Entry": ("custom_submitted_successfully", "StockIOSaveReq"),
+}
+
+THROUGHPUT_RETENTION_DAYS = 7
+
+
+class NavarieTimsSubmissionBacklog(Document):
+    """Holds the number of a branch's records of a doctype pending submission to eTims"""
+
+
+def on_submit(doc: Document, method: str | None = None) -> None:
+    """Counts a submitted record as pending submission to eTims, once the submission is committed"""
+    submitted_flag, _ = TRACKED_DOCTYPES[doc.doctype]
+
+    if not doc.get(submitted_flag):
+        frappe.db.after_commit.add(
+            partial(
+                add_pending_record,
+                doc.doctype,
+                doc.company,
+                get_record_branch(doc.doctype, doc),
+            )
+        )
+
+
+def on_cancel(doc: Document, method: str | None = None) -> None:
+    submitted_flag, _ = TRACKED_DOCTYPES[doc.doctype]
+
+    if not doc.get(submitted_flag):
+        frappe.db.after_commit.add(
+            partial(
+                remove_pending_record,
+                doc.doctype,
+                doc.company,
+                get_record_branch(doc.doctype, doc),
+            )
+        )
+
+
+def record_submission(doctype: str, document_name: str) -> None:
+    """Moves a record submitted to eTims from its branch's backlog to the current minute's throughput,
+    once the submission is committed. Called from the submissions' success callbacks.
+
+    Args:
+        doctype (str): The record's doctype, one of TRACKED_DOCTYPES
+        document_name (str): The record's name
+    """
+    _, route = TRACKED_DOCTYPES[doctype]
+    record = frappe.db.get_value(
+        doctype,
+        document_name,
+        ["company", "warehouse" if doctype == "Stock Ledger Entry" else "branch"],
+        as_dict=True,
+    )
+    branch_id = get_record_branch(doctype, record)
+    period = now_datetime().replace(second=0, microsecond=0)
+
+    frappe.db.after_commit.add(
+        partial(
+            increment_counters,
+            {
+                "backlog": ((doctype, record.company, branch_id), -1),
+                "throughput": (
+                    (route, doctype, record.company, branch_id, str(period)),
+                    1,
+                ),
+            },
+        )
+    )
+
+
+def add_pending_record(doctype: str, company: str, branch_id: str | None) -> None:
+    increment_counters({"backlog": ((doctype, company, branch_id), 1)})
+
+
+def remove_pending_record(doctype: str, company: str, branch_id: str | None) -> None:
+    increment_counters({"backlog": ((doctype, company, branch_id), -1)})
+
+
+def increment_counters(increments: dict[str, tuple[tuple, int]]) -> None:
+    """Adds to the changes to the backlog and throughput counters held in Redis until folded
+    into their records, so that submissions never wait on each other to update a shared record
+
+    Args:
+        increments (dict[str, tuple[tuple, int]]): The labels of the counter to change, and the change,
+            keyed by the counters' kind, i.e. backlog or throughput
+    """
+    pipeline = frappe.cache.pipeline(transaction=False)
+
+    for kind, (labels, increment) in increments.items():
+        pipeline.hincrby(get_counters_key(kind), json.dumps(labels), increment)
+
+    pipeline.execute()
+
+
+@single_flight()
+def fold_submission_counters() -> None:
+    """Applies the changes to the backlog and throughput counters accumulated in Redis to their records,
+    and refreshes the oldest pending time of each changed backlog from the pending records.
+    The changes are put back if they can't be applied, so they are folded again later.
+    """
+    pipeline = frappe.cache.pipeline(transaction=True)
+
+    for kind in ("backlog", "throughput"):
+        pipeline.hgetall(get_counters_key(kind))
+        pipeline.delete(get_counters_key(kind))
+
+    backlog, _, throughput, _ = pipeline.execute()
+    backlog = {
+        tuple(json.loads(labels)): int(increment)
+        for labels, increment in backlog.items()
+    }
+    throughput = {
+        tuple(json.loads(labels)): int(increment)
+        for labels, increment in throughput.items()
+    }
+
+    if not backlog and not throughput:
+        return
+
+    try:
+        apply_backlog_increments(backlog)
+        apply_throughput_increments(throughput)
+        frappe.db.commit()
+
+    except Exception:
+        frappe.db.rollback()
+
+        pipeline = frappe.cache.pipeline(transaction=False)
+
+        for kind, increments in (("backlog", backlog), ("throughput", throughput)):
+            for labels, increment in increments.items():
+                pipeline.hincrby(get_counters_key(kind), json.dumps(labels), increment)
+
+        pipeline.execute()
+        raise
+
+
+def apply_backlog_increments(increments: dict[tuple, int]) -> None:
+    timestamp, user = now(), frappe.session.user
+
+    for (doctype, company, branch_id), increment in increments.items():
+        name = get_counter_name(doctype, company, branch_id)
+        frappe.db.sql(
+            f"""
+            INSERT INTO `tab{SUBMISSION_BACKLOG_DOCTYPE_NAME}`
+                (name, reference_doctype, company, branch_id, pending_count,
+                creation, modified, owner, modified_by)
+            VALUES (
+                %(name)s, %(doctype)s, %(company)s, %(branch_id)s, GREATEST(%(increment)s, 0),
+                %(timestamp)s, %(timestamp)s, %(user)s, %(user)s
+            )
+            ON DUPLICATE KEY UPDATE
+                pending_count = GREATEST(pending_count + %(increment)s, 0),
+                modified = VALUES(modified)
+            """,
+            {
+                "name": name,
+                "doctype": doctype,
+                "company": company,
+                "branch_id": branch_id,
+                "increment": increment,
+                "timestamp": timestamp,
+                "user": user,
+            },
+        )
+
+        pending_count = frappe.db.get_value(
+            SUBMISSION_BACKLOG_DOCTYPE_NAME, name, "pending_count"
+        )
+        frappe.db.set_value(
+            SUBMISSION_BACKLOG_DOCTYPE_NAME,
+            name,
+            "oldest_pending",
+            get_oldest_pending(doctype, company, branch_id) if pending_count else None,
+            update_modified=False,
+        )
+
+
+def apply_throughput_increments(increments: dict[tuple, int]) -> None:
+    timestamp, user = now(), frappe.session.user
+
+    for (route, doctype, company, branch_id, period), increment in increments.items():
+        frappe.db.sql(
+            f"""
+            INSERT INTO `tab{SUBMISSION_THROUGHPUT_DOCTYPE_NAME}`
+                (name, route, reference_doctype, company, branch_id, period, submitted_count,
+                creation, modified, owner, modified_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE submitted_count = submitted_count + VALUES(submitted_count)
+            """,
+            (
+                get_counter_name(doctype, company, branch_id, period),
+                route,
+                doctype,
+                company,
+                branch_id,
+                period,
+                increment,
+                timestamp,
+                timestamp,
+                user,
+                user,
+            ),
+        )
+
+
+def get_oldest_pending(
+    doctype: str, company: str, branch_id: str | None
+) -> datetime | None:
+    """The last modified time of a branch's oldest record pending submission,
+    which the submission index keeps cheap to find
+    """
+    return frappe.db.get_value(
+        doctype,
+        get_pending_filters(doctype, company, branch_id),
+        "modified",
+        order_by="modified asc",
+    )
+
+
+def get_counters_key(kind: str) -> str:
+    return frappe.cache.make_key(f"etims_submission_counters:{kind}")
+
+
+def get_pending_filters(
+    doctype: str, company: str, branch_id: str | None
+) -> dict[str, int | str | tuple]:
+    submitted_flag, _ = TRACKED_DOCTYPES[doctype]
+    filters = {submitted_flag: 0, "docstatus": 1, "company": company}
+
+    if doctype == "Stock Ledger Entry":
+        filters["warehouse"] = (
+            "in",
+            frappe.get_all(
+                "Warehouse",
+                filters={
+                    "company": company,
+                    "custom_branch": branch_id or ("is", "not set"),
+                },
+                pluck="name",
+            )
+            or [""],
+        )
+
+    else:
+        filters["branch"] = branch_id or ("is", "not set")
+
+    return filters
+
+
+def get_record_branch(doctype: str, record: Document | dict) -> str | None:
+    """The branch of an invoice, or of a stock ledger entry's warehouse"""
+    if doctype == "Stock Ledger Entry":
+        return frappe.get_cached_value("Warehouse", record.warehouse, "custom_branch")
+
+    return record.branch
+
+
+def get_counter_name(*labels) -> str:
+    return sha256(
+        "\x1f".join(str(label or "") for label in labels).encode(),
+        usedforsecurity=False,
+    ).hexdigest()[:20]
+
+
+@frappe.whitelist()
+def rebuild_submission_backlog() -> None:
+    """Recounts the pending records of every branch from the transaction tables, correcting any
+    drift in the incrementally maintained backlog, e.g. from records submitted before it existed
+    """
+    frappe.only_for("System Manager")
+
+    # The recount includes every committed change not yet folded
+    frappe.cache.delete_value(get_counters_key("backlog"), make_keys=False)
+
+    backlogs = defaultdict(lambda: [0, None])
+    warehouse_branches = dict(
+        frappe.get_all("Warehouse", fields=["name", "custom_branch"], as_list=True)
+    )
+
+    for doctype, (submitted_flag, _) in TRACKED_DOCTYPES.items():
+        group_field = "warehouse" if doctype == "Stock Ledger Entry" else "branch"
+
+        for company, group, pending_count, oldest_pending in frappe.get_all(
+            doctype,
+            filters={submitted_flag: 0, "docstatus": 1},
+            fields=["company", group_field, "count(name)", "min(modified)"],
+            group_by=f"company, {group_field}",
+            as_list=True,
+        ):
+            branch_id = (
+                warehouse_branches.get(group) if group_field == "warehouse" else group
+            )
+            backlog = backlogs[(doctype, company, branch_id or None)]
+            backlog[0] += pending_count
+            backlog[1] = min(filter(None, (backlog[1], oldest_pending)))
+
+    frappe.db.delete(SUBMISSION_BACKLOG_DOCTYPE_NAME)
+
+    timestamp, user = now(), frappe.session.user
+    frappe.db.bulk_insert(
+        SUBMISSION_BACKLOG_DOCTYPE_NAME,
+        fields=[
+            "name",
+            "reference_doctype",
+            "company",
+            "branch_id",
+            "pending_count",
+            "oldest_pending",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+        ],
+        values=[
+            (
+                get_counter_name(doctype, company, branch_id),
+                doctype,
+                company,
+                branch_id,
+                pending_count,
+                oldest_pending,
+                timestamp,
+                timestamp,
+                user,
+                user,
+            )
+            for (doctype, company, branch_id), (
+                pending_count,
+                oldest_pending,
+            ) in backlogs.items()
+        ],
+    )
+
+
+def delete_old_throughput() -> None:
+    frappe.db.delete(
+        SUBMISSION_THROUGHPUT_DOCTYPE_NAME,
+        {"period": ("<", add_days(now_datetime(), -THROUGHPUT_RETENTION_DAYS))},
+    )
@@ -0,0 +1,80 @@
+# Copyright (c) 2024, Navari Ltd and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from ...report.etims_submission_lag.etims_submission_lag import execute
+from ..doctype_names_mapping import SUBMISSION_BACKLOG_DOCTYPE_NAME
+from .navari_etims_submission_backlog import (
+    add_pending_record,
+    fold_submission_counters,
+    get_counter_name,
+    get_counters_key,
+    remove_pending_record,
+)
+
+TEST_BRANCH_ID = "Z9"
+
+
+class TestNavarieTimsSubmissionBacklog(FrappeTestCase):
+    """Test Cases"""
+
+    def setUp(self) -> None:
+        for kind in ("backlog", "throughput"):
+            frappe.cache.delete_value(get_counters_key(kind), make_keys=False)
+
+    def tearDown(self) -> None:
+        frappe.db.delete(SUBMISSION_BACKLOG_DOCTYPE_NAME, {"branch_id": TEST_BRANCH_ID})
+
+    @patch(
+        f"{__package__}.navari_etims_submission_backlog.get_oldest_pending",
+        return_value="2024-05-01 09:30:00",
+    )
+    def test_backlog_is_counted_incrementally(self, mock_get_oldest_pending) -> None:
+        for _ in range(2):
+            add_pending_record("Sales Invoice", "_Test Company", TEST_BRANCH_ID)
+
+        # Nothing is written to the backlog until the changes are folded
+        self.assertFalse(
+            frappe.db.exists(
+                SUBMISSION_BACKLOG_DOCTYPE_NAME, {"branch_id": TEST_BRANCH_ID}
+            )
+        )
+
+        fold_submission_counters()
+
+        backlog = frappe.db.get_value(
+            SUBMISSION_BACKLOG_DOCTYPE_NAME,
+            get_counter_name("Sales Invoice", "_Test Company", TEST_BRANCH_ID),
+            ["pending_count", "oldest_pending"],
+            as_dict=True,
+        )
+
+        self.assertEqual(backlog.pending_count, 2)
+        self.assertEqual(str(backlog.oldest_pending), "2024-05-01 09:30:00")
+        mock_get_oldest_pending.assert_called_once_with(
+            "Sales Invoice", "_Test Company", TEST_BRANCH_ID
+        )
+
+        _, data = execute({"company": "_Test Company", "window": 60})
+        row = next(row for row in data if row["branch_id"] == TEST_BRANCH_ID)
+
+        self.assertEqual(row["route"], "TrnsSalesSaveWrReq")
+        self.assertGreater(row["lag_minutes"], 0)
+
+        for _ in range(3):
+            remove_pending_record("Sales Invoice", "_Test Company", TEST_BRANCH_ID)
+
+        fold_submission_counters()
+
+        self.assertEqual(
+            frappe.db.get_value(
+                SUBMISSION_BACKLOG_DOCTYPE_NAME,
+                get_counter_name("Sales Invoice", "_Test Company", TEST_BRANCH_ID),
+                ["pending_count", "oldest_pending"],
+            ),
+            (0, None),
+        )
@@ -0,0 +1,9 @@
+# Copyright (c) 2024, Navari Ltd and Contributors
+# See license.txt
+
+# import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestNavarieTimsSubmissionThroughput(FrappeTestCase):
+    pass
@@ -0,0 +1,125 @@
+# Copyright (c) 2024, Navari Ltd and contributors
+# For license information, please see license.txt
+
+import os
+
+import frappe
+from frappe.model.document import Document
+
+from ...logger import etims_logger
+from ...utils import iter_spooled_records, update_last_request_date
+from ..doctype_names_mapping import SYNC_JOB_DOCTYPE_NAME
+
+# The functions a sync job may hand its records to, by dotted path
+RECORDS_CALLBACKS = frozenset(
+    {
+        "kenya_compliance.kenya_compliance.apis.remote_response_status_handlers.save_registered_purchases",
+        "kenya_compliance.kenya_compliance.apis.remote_response_status_handlers.save_imported_items",
+        "kenya_compliance.kenya_compliance.apis.remote_response_status_handlers.save_stock_movements",
+        "kenya_compliance.kenya_compliance.background_tasks.tasks.save_item_classifications",
+    }
+)
+
+# Jobs are no longer retried once processed this many times
+MAX_SYNC_JOB_ATTEMPTS = 5
+
+
+class NavarieTimsSyncJob(Document):
+    """Tracks the processing of a spooled eTims search response"""
+
+    def validate(self) -> None:
+        """Validation Hook"""
+        validate_records_callback(self.records_callback)
+
+    def on_trash(self) -> None:
+        """On Delete Hook"""
+        remove_spool_file(self.spool_file)
+
+
+def process_sync_job(job_name: str) -> None:
+    """Hands the records of a spooled response to the job's records callback in chunks.
+
+    Progress is committed after every chunk, so a job that fails or times out
+    continues from the last committed chunk when processed again. Records callbacks
+    must therefore be safe to re-run on a chunk that was partially written.
+
+    Args:
+        job_name (str): The sync job to process
+    """
+    job = frappe.get_doc(SYNC_JOB_DOCTYPE_NAME, job_name)
+
+    if job.status in ("Completed", "Permanently Failed"):
+        return
+
+    if not (job.spool_file and os.path.exists(job.spool_file)):
+        job.db_set(
+            {"status": "Permanently Failed", "error": "The spool file is missing"},
+            commit=True,
+        )
+        return
+
+    validate_records_callback(job.records_callback)
+
+    records_callback = frappe.get_attr(job.records_callback)
+    processed_records = job.processed_records or 0
+    attempts = (job.attempts or 0) + 1
+
+    job.db_set({"status": "Processing", "attempts": attempts}, commit=True)
+
+    try:
+        for chunk in iter_spooled_records(
+            job.spool_file,
+            f"data.{job.records_key}.item",
+            chunk_size=job.chunk_size,
+            skip=processed_records,
+        ):
+            records_callback(chunk)
+            processed_records += len(chunk)
+
+            frappe.db.set_value(
+                SYNC_JOB_DOCTYPE_NAME,
+                job_name,
+                "processed_records",
+                processed_records,
+                update_modified=True,
+            )
+            frappe.db.commit()
+
+    except Exception as error:
+        frappe.db.rollback()
+
+        etims_logger.exception(error, exc_info=True)
+        frappe.db.set_value(
+            SYNC_JOB_DOCTYPE_NAME,
+            job_name,
+            {
+                "status": (
+                    "Permanently Failed"
+                    if attempts >= MAX_SYNC_JOB_ATTEMPTS
+                    else "Failed"
+                ),
+                "error": frappe.get_traceback(),
+            },
+        )
+        frappe.db.commit()
+        raise
+
+    job.db_set({"status": "Completed", "error": None}, commit=True)
+    remove_spool_file(job.spool_file)
+
+    if job.result_date:
+        update_last_request_date(job.result_date, job.route_path)
+
+
+def validate_records_callback(records_callback: str | None) -> None:
+    if records_callback not in RECORDS_CALLBACKS:
+        frappe.throw(
+            f"{records_callback} is not a permitted records callback",
+            frappe.ValidationError,
+            title="Invalid Records Callback",
+        )
+
+
+def remove_spool_file(file_path: str | None) -> None:
+    if file_path and os.path.exists(file_path):
+        os.remove(file_path)
@@ -0,0 +1,148 @@
+# Copyright (c) 2024, Navari Ltd and Contributors
+# See license.txt
+
+import json
+import os
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from ...utils import iter_spooled_records, read_spooled_envelope
+from ..doctype_names_mapping import SYNC_JOB_DOCTYPE_NAME
+from .navari_etims_sync_job import (
+    MAX_SYNC_JOB_ATTEMPTS,
+    RECORDS_CALLBACKS,
+    process_sync_job,
+)
+
+PROCESSED_CHUNKS: list[list[dict]] = []
+
+
+def collect_records(records: list[dict]) -> None:
+    PROCESSED_CHUNKS.append(records)
+
+
+class TestNavarieTimsSyncJob(FrappeTestCase):
+    """Test Cases"""
+
+    def setUp(self) -> None:
+        PROCESSED_CHUNKS.clear()
+
+        callbacks_patcher = patch(
+            f"{process_sync_job.__module__}.RECORDS_CALLBACKS",
+            RECORDS_CALLBACKS | {f"{__name__}.collect_records"},
+        )
+        callbacks_patcher.start()
+        self.addCleanup(callbacks_patcher.stop)
+
+        self.spool_file = frappe.get_site_path("private", "test_etims_sync.json")
+
+        with open(self.spool_file, "w") as spool_file:
+            json.dump(
+                {
+                    "resultCd": "000",
+                    "resultMsg": "It is succeeded",
+                    "resultDt": "20240501103000",
+                    "data": {"itemList": [{"itemSeq": seq} for seq in range(1, 6)]},
+                },
+                spool_file,
+            )
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.spool_file):
+            os.remove(self.spool_file)
+
+    def test_read_spooled_response(self) -> None:
+        self.assertEqual(
+            read_spooled_envelope(self.spool_file),
+            {
+                "resultCd": "000",
+                "resultMsg": "It is succeeded",
+                "resultDt": "20240501103000",
+            },
+        )
+        self.assertEqual(
+            [
+                [record["itemSeq"] for record in chunk]
+                for chunk in iter_spooled_records(
+                    self.spool_file, "data.itemList.item", chunk_size=2, skip=1
+                )
+            ],
+            [[2, 3], [4, 5]],
+        )
+
+    def test_process_sync_job_resumes_from_checkpoint(self) -> None:
+        job = frappe.get_doc(
+            {
+                "doctype": SYNC_JOB_DOCTYPE_NAME,
+                "records_key": "itemList",
+                "records_callback": f"{__name__}.collect_records",
+                "chunk_size": 2,
+                "processed_records": 2,
+                "status": "Failed",
+                "spool_file": self.spool_file,
+            }
+        ).insert()
+
+        process_sync_job(job.name)
+        job.reload()
+
+        self.assertEqual(job.status, "Completed")
+        self.assertEqual(job.processed_records, 5)
+        self.assertEqual(
+            [record["itemSeq"] for chunk in PROCESSED_CHUNKS for record in chunk],
+            [3, 4, 5],
+        )
+        self.assertFalse(os.path.exists(self.spool_file))
+
+    def test_process_sync_job_without_spool_file_fails_permanently(self) -> None:
+        os.remove(self.spool_file)
+        job = frappe.get_doc(
+            {
+                "doctype": SYNC_JOB_DOCTYPE_NAME,
+                "records_key": "itemList",
+                "records_callback": f"{__name__}.collect_records",
+                "chunk_size": 2,
+                "spool_file": self.spool_file,
+            }
+        ).insert()
+
+        process_sync_job(job.name)
+        job.reload()
+
+        self.assertEqual(job.status, "Permanently Failed")
+        self.assertEqual(PROCESSED_CHUNKS, [])
+
+    def test_process_sync_job_fails_permanently_after_last_attempt(self) -> None:
+        job = frappe.get_doc(
+            {
+                "doctype": SYNC_JOB_DOCTYPE_NAME,
+                "records_key": "itemList",
+                "records_callback": f"{__name__}.collect_records",
+                "chunk_size": 2,
+                "attempts": MAX_SYNC_JOB_ATTEMPTS - 1,
+                "spool_file": self.spool_file,
+            }
+        ).insert()
+
+        with patch(f"{__name__}.collect_records", side_effect=ValueError):
+            self.assertRaises(ValueError, process_sync_job, job.name)
+
+        job.reload()
+
+        self.assertEqual(job.status, "Permanently Failed")
+        self.assertEqual(job.attempts, MAX_SYNC_JOB_ATTEMPTS)
+
+    def test_records_callback_must_be_permitted(self) -> None:
+        self.assertRaises(
+            frappe.ValidationError,
+            frappe.get_doc(
+                {
+                    "doctype": SYNC_JOB_DOCTYPE_NAME,
+                    "records_key": "itemList",
+                    "records_callback": "frappe.delete_doc",
+                    "spool_file": self.spool_file,
+                }
+            ).insert,
+        )
@@ -64,6 +64,28 @@ frappe.ui.form.on('Navari KRA eTims Settings', {
         __('eTims Actions'),
       );
 
+      frm.add_custom_button(
+        __('Resync All Codes'),
+        function () {
+          [
+            'kenya_compliance.kenya_compliance.background_tasks.tasks.refresh_code_lists',
+            'kenya_compliance.kenya_compliance.background_tasks.tasks.get_item_classification_codes',
+          ].forEach((method) => {
+            frappe.call({
+              method: method,
+              args: {
+                force_full_sync: 1,
+              },
+              callback: (response) => {},
+              error: (error) => {
+                // Error Handling is Defered to the Server
+              },
+            });
+          });
+        },
+        __('eTims Actions'),
+      );
+
       frm.add_custom_button(
         __('Get Stock Movements'),
         function () {
@@ -3,8 +3,6 @@
 
 import asyncio
 
-import aiohttp
-
 import frappe
 import frappe.defaults
 from frappe.integrations.utils import create_request_log
@@ -231,6 +229,8 @@ class NavariKRAeTimsSettings(Document):
 
     def before_insert(self) -> None:
         """Before Insertion Hook"""
+        from aiohttp import ClientConnectorError, ClientOSError
+
         route_path, last_request_date = get_route_path("DeviceVerificationReq")
 
         if route_path:
@@ -277,7 +277,7 @@ class NavariKRAeTimsSettings(Document):
                         response, route_path, self.name, SETTINGS_DOCTYPE_NAME
                     )
 
-            except aiohttp.client_exceptions.ClientConnectorError as error:
+            except ClientConnectorError as error:
                 self.error_title = "Connection failed during initialisation"
 
                 etims_logger.exception(error, exc_info=True)
@@ -298,7 +298,7 @@ class NavariKRAeTimsSettings(Document):
                     title=self.error_title,
                 )
 
-            except aiohttp.client_exceptions.ClientOSError as error:
+            except ClientOSError as error:
                 self.error_title = "Connection reset by peer"
 
                 etims_logger.exception(error, exc_info=True)
@@ -14,7 +14,7 @@ def handle_errors(
 ) -> None:
     error_message, error_code = response["resultMsg"], response["resultCd"]
 
-    etims_logger.error("%s, Code: %s" % (error_message, error_code))
+    etims_logger.error("%s, Code: %s", error_message, error_code)
 
     try:
         frappe.throw(
@@ -0,0 +1,219 @@
+"""Single-flight locks for eTims jobs, held in Redis"""
+
+import json
+import threading
+from functools import wraps
+from hashlib import sha256
+from typing import Callable
+
+import frappe
+
+from .logger import etims_logger
+
+# The lock expires after the lease unless renewed by the holder's heartbeat,
+# so a lock held by a killed worker is freed without intervention
+LOCK_LEASE_SECONDS = 300
+LOCK_HEARTBEAT_SECONDS = 60
+
+# Only the holder, identified by its token, may renew or release a lock
+RENEW_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Results of coalesced requests are reused for this long, e.g. by repeated clicks
+COALESCED_RESULT_TTL_SECONDS = 30
+COALESCED_IN_PROGRESS_MESSAGE = (
+    "An identical request is already in progress. Please check again shortly"
+)
+
+
+class SingleFlightLock:
+    """
+    A lock ensuring only one run of a job, across all workers, is in flight for the current site.
+    The lock is held under a lease, renewed by a heartbeat thread while the job runs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        lease_seconds: int = LOCK_LEASE_SECONDS,
+        heartbeat_seconds: int = LOCK_HEARTBEAT_SECONDS,
+    ) -> None:
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+
+        # The connection is kept as frappe's context is not available to the heartbeat thread
+        self._redis = frappe.cache
+        self._key = self._redis.make_key(f"etims_lock:{name}")
+        self._token = frappe.generate_hash()
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat: threading.Thread | None = None
+
+    def acquire(self) -> bool:
+        """Acquires the lock if it is free
+
+        Returns:
+            bool: True if the lock was acquired, False if it is held elsewhere
+        """
+        acquired = self._redis.set(
+            self._key, self._token, nx=True, ex=self.lease_seconds
+        )
+
+        if acquired:
+            self._heartbeat = threading.Thread(
+                target=self._renew_lease, name=f"etims-lock-{self.name}", daemon=True
+            )
+            self._heartbeat.start()
+
+        return bool(acquired)
+
+    def release(self) -> None:
+        """Releases the lock, if still held by this instance"""
+        self._stop_heartbeat.set()
+
+        if self._heartbeat:
+            self._heartbeat.join()
+
+        self._redis.eval(RELEASE_LOCK_SCRIPT, 1, self._key, self._token)
+
+    def _renew_lease(self) -> None:
+        while not self._stop_heartbeat.wait(self.heartbeat_seconds):
+            renewed = self._redis.eval(
+                RENEW_LOCK_SCRIPT,
+                1,
+                self._key,
+                self._token,
+                self.lease_seconds * 1000,
+            )
+
+            if not renewed:
+                etims_logger.warning("Lost the lease on lock %s", self.name)
+                return
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *args) -> None:
+        self.release()
+
+
+def single_flight(
+    name: str | None = None,
+    key: Callable[..., str] | None = None,
+    lease_seconds: int = LOCK_LEASE_SECONDS,
+) -> Callable:
+    """Decorates a job so that a run starting while another is in flight is skipped.
+
+    Args:
+        name (str | None, optional): The lock name. Defaults to the job's dotted path.
+        key (Callable[..., str] | None, optional): Builds a suffix for the lock name from the job's
+            arguments, e.g. the branch, to lock each branch separately. Defaults to None.
+        lease_seconds (int, optional): The lock's lease. Defaults to LOCK_LEASE_SECONDS.
+
+    Returns:
+        Callable: The decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        lock_name = name or f"{function.__module__}.{function.__qualname__}"
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            full_lock_name = f"{lock_name}:{key(*args, **kwargs)}" if key else lock_name
+            lock = SingleFlightLock(full_lock_name, lease_seconds=lease_seconds)
+
+            if not lock.acquire():
+                etims_logger.info("Skipped %s as a run is in flight", full_lock_name)
+                return None
+
+            try:
+                return function(*args, **kwargs)
+
+            finally:
+                lock.release()
+
+        return wrapper
+
+    return decorator
+
+
+def coalesce(
+    key: Callable[..., str],
+    ttl_seconds: int = COALESCED_RESULT_TTL_SECONDS,
+) -> Callable:
+    """Decorates a read-only request, e.g. a search, so that identical calls share a single run.
+    A call arriving while an identical one is in flight returns None at once, telling the user
+    the request is already in progress, rather than holding a worker while waiting for it.
+    Results are kept for a short while, so that calls arriving soon after reuse them.
+    A failed run is not shared, the next caller runs the request again.
+
+    Args:
+        key (Callable[..., str]): Builds the key identifying identical calls from the arguments,
+            e.g. with get_request_key
+        ttl_seconds (int, optional): How long results are kept. Defaults to COALESCED_RESULT_TTL_SECONDS.
+
+    Returns:
+        Callable: The decorator
+    """
+
+    def decorator(function: Callable) -> Callable:
+        function_name = f"{function.__module__}.{function.__qualname__}"
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            request_name = f"{function_name}:{key(*args, **kwargs)}"
+            result_key = f"etims_coalesced:{request_name}"
+            cached = frappe.cache.get_value(result_key, expires=True)
+
+            if cached is not None:
+                return cached["result"]
+
+            lock = SingleFlightLock(f"coalesce:{request_name}")
+
+            if not lock.acquire():
+                etims_logger.info("Skipped %s as it is in flight", request_name)
+                frappe.msgprint(COALESCED_IN_PROGRESS_MESSAGE)
+                return None
+
+            try:
+                # The result may have been stored between the lookup and the acquisition
+                cached = frappe.cache.get_value(result_key, expires=True)
+
+                if cached is not None:
+                    return cached["result"]
+
+                result = function(*args, **kwargs)
+                frappe.cache.set_value(
+                    result_key, {"result": result}, expires_in_sec=ttl_seconds
+                )
+
+                return result
+
+            finally:
+                lock.release()
+
+        return wrapper
+
+    return decorator
+
+
+def get_request_key(
+    route_function: str, branch_id: str | None, payload: dict | None
+) -> str:
+    """Identifies a request by its route, branch, and a hash of its payload"""
+    payload_hash = sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode(),
+        usedforsecurity=False,
+    ).hexdigest()[:20]
+
+    return f"{route_function}:{branch_id or ''}:{payload_hash}"
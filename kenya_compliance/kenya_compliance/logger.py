@@ -1,7 +1,143 @@
-"""eTims Logger initialisation"""
+"""eTims Logger initialisation.
+
+Records are handed to a queue and written, as JSON lines, by a listener thread, so logging only
+costs the caller a level check when the level is turned down, and a queue put otherwise.
+The level is set per site from the Current Environment Identifier before each request and job.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
 
 import frappe
-from frappe.utils import logger
+from frappe.utils import get_bench_path
+
+from .doctype.doctype_names_mapping import ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME
+
+LOG_FILE_MAX_BYTES = 10_000_000
+LOG_FILE_COUNT = 5
+DEFAULT_LOG_LEVEL = "INFO"
+
+# Attributes of every log record, anything else on a record having been passed as extra
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "site"}
+
+_log_queue: SimpleQueue = SimpleQueue()
+_listener: QueueListener | None = None
+_listener_lock = threading.Lock()
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats each record as a JSON object, including any extra fields passed with it"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "site": getattr(record, "site", None),
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value)
+            for key, value in vars(record).items()
+            if key not in RECORD_ATTRIBUTES
+        )
+
+        if record.exc_text or record.exc_info:
+            entry["exception"] = record.exc_text or self.formatException(
+                record.exc_info
+            )
+
+        return json.dumps(entry, default=str)
+
+
+class EtimsQueueHandler(QueueHandler):
+    """Queues records without formatting them, the listener thread formats them when written.
+    The traceback is rendered beforehand, as the frames it references may not outlive the caller.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.site = getattr(frappe.local, "site", None)
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        return record
+
+    def emit(self, record: logging.LogRecord) -> None:
+        start_listener()
+        super().emit(record)
+
+
+def start_listener() -> None:
+    """Starts the listener writing queued records, once per process, including forked job processes"""
+    global _listener
+
+    if _listener is not None:
+        return
+
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        file_handler = RotatingFileHandler(
+            os.path.join(get_bench_path(), "logs", "etims.log"),
+            maxBytes=LOG_FILE_MAX_BYTES,
+            backupCount=LOG_FILE_COUNT,
+        )
+        file_handler.setFormatter(JSONFormatter())
+
+        _listener = QueueListener(_log_queue, file_handler)
+        _listener.start()
+
+
+def flush_etims_logs() -> None:
+    """Writes out the queued records and stops the listener, e.g. before a job process exits"""
+    global _listener
+
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def reset_after_fork() -> None:
+    """The listener thread is not copied into a forked process, nor should the parent's queue be used"""
+    global _listener, _log_queue, _listener_lock
+
+    _log_queue, _listener, _listener_lock = SimpleQueue(), None, threading.Lock()
+    queue_handler.queue = _log_queue
+
+
+def set_etims_log_level() -> None:
+    """Applies the current site's eTims log level. Called before each request and job.
+    The default level applies until the log level field exists, e.g. before the site is migrated
+    """
+    try:
+        log_level = frappe.db.get_single_value(
+            ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME, "log_level", cache=True
+        )
+
+    except frappe.ValidationError:
+        log_level = None
+
+    etims_logger.setLevel(log_level or DEFAULT_LOG_LEVEL)
+
+
+queue_handler = EtimsQueueHandler(_log_queue)
+
+etims_logger = logging.getLogger("etims")
+etims_logger.setLevel(DEFAULT_LOG_LEVEL)
+etims_logger.addHandler(queue_handler)
+etims_logger.propagate = False
 
-logger.set_log_level("DEBUG")
-etims_logger = frappe.logger("etims", allow_site=True, file_count=50)
+os.register_at_fork(after_in_child=reset_after_fork)
+atexit.register(flush_etims_logs)
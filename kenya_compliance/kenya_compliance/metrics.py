@@ -0,0 +1,366 @@
+"""Per-stage latency histograms for eTims requests, kept in-process and flushed periodically.
+
+Flushes add to cumulative totals held in Redis, outside any database transaction, through atomic
+increments. Prometheus scrapes those totals, and the totals of each completed hour are folded
+into Navari eTims Metrics records by a scheduled job.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from hashlib import sha256
+from typing import Callable, Generator
+
+from werkzeug.wrappers import Response
+
+import frappe
+from frappe.utils import add_days, now, now_datetime
+
+from .doctype.doctype_names_mapping import METRICS_DOCTYPE_NAME
+from .locks import single_flight
+from .logger import etims_logger
+
+# Upper bounds, in seconds, of the histogram buckets. A final unbounded bucket follows
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Each process flushes its histograms at most once per interval. The hourly totals are kept in Redis
+# until folded into their records, or for METRICS_HOUR_EXPIRY_SECONDS at most
+METRICS_FLUSH_INTERVAL_SECONDS = 60
+METRICS_HOUR_EXPIRY_SECONDS = 2 * 24 * 60 * 60
+METRICS_RETENTION_DAYS = 30
+METRICS_PERIOD_FORMAT = "%Y%m%d%H"
+
+# Histograms keyed by (stage, route, branch_id, reference_doctype), each holding
+# its bucket counts, the number of durations and their sum
+_histograms: dict[tuple[str, str, str, str], list] = {}
+_histograms_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def record_duration(
+    stage: str,
+    seconds: float,
+    route: str | None = None,
+    branch_id: str | None = None,
+    doctype: str | None = None,
+) -> None:
+    """Adds a duration to its stage's histogram
+
+    Args:
+        stage (str): The stage, e.g. http or payload
+        seconds (float): The duration
+        route (str | None, optional): The eTims route, e.g. TrnsSalesSaveWrReq. Defaults to None.
+        branch_id (str | None, optional): The branch the request was sent for. Defaults to None.
+        doctype (str | None, optional): The doctype the request was sent for. Defaults to None.
+    """
+    key = (stage, route or "", branch_id or "", doctype or "")
+    bucket = next(
+        (index for index, bound in enumerate(METRICS_BUCKETS) if seconds <= bound),
+        len(METRICS_BUCKETS),
+    )
+
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+
+        if histogram is None:
+            histogram = _histograms[key] = [[0] * (len(METRICS_BUCKETS) + 1), 0, 0.0]
+
+        histogram[0][bucket] += 1
+        histogram[1] += 1
+        histogram[2] += seconds
+
+
+@contextmanager
+def measure(stage: str, **labels) -> Generator[None, None, None]:
+    """Records the duration of the enclosed block, including when it raises"""
+    start = time.perf_counter()
+
+    try:
+        yield
+
+    finally:
+        record_duration(stage, time.perf_counter() - start, **labels)
+
+
+def timed(stage: str, **labels) -> Callable:
+    """Decorates a function so that the duration of each call is recorded under the stage"""
+
+    def decorator(function: Callable) -> Callable:
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with measure(stage, **labels):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def maybe_flush_metrics(force: bool = False) -> None:
+    """Flushes the process's histograms if the flush interval has elapsed since the last flush.
+    Called after each request, and after remote calls. Metrics are best-effort, so a failed flush
+    is logged without interrupting the caller.
+
+    Args:
+        force (bool, optional): Whether to flush regardless of the interval. Defaults to False.
+    """
+    global _last_flush
+
+    if not force and time.monotonic() - _last_flush < METRICS_FLUSH_INTERVAL_SECONDS:
+        return
+
+    _last_flush = time.monotonic()
+
+    try:
+        flush_metrics()
+
+    except Exception as error:
+        etims_logger.warning("Failed to flush eTims metrics: %s", error)
+
+
+def flush_metrics_after_job() -> None:
+    """Flushes the histograms recorded by each job, as a job's process may exit once it is done"""
+    maybe_flush_metrics(force=True)
+
+
+def flush_metrics() -> None:
+    """Adds the process's histograms to their cumulative, and current hour's, totals in Redis.
+    The histograms are put back if the write fails, so they are flushed again later.
+    """
+    global _histograms
+
+    with _histograms_lock:
+        histograms, _histograms = _histograms, {}
+
+    if not histograms:
+        return
+
+    period = now_datetime().strftime(METRICS_PERIOD_FORMAT)
+    pipeline = frappe.cache.pipeline(transaction=False)
+
+    for labels, (bucket_counts, count, total_seconds) in histograms.items():
+        series_id = get_series_id(labels)
+        hour_id = f"{period}:{series_id}"
+
+        for key in (
+            get_metrics_key("total", series_id),
+            get_metrics_key("hour", hour_id),
+        ):
+            pipeline.hset(key, "labels", json.dumps(labels))
+            pipeline.hincrby(key, "count", count)
+            pipeline.hincrbyfloat(key, "sum", total_seconds)
+
+            for index, bucket_count in enumerate(bucket_counts):
+                if bucket_count:
+                    pipeline.hincrby(key, f"b{index}", bucket_count)
+
+        pipeline.expire(get_metrics_key("hour", hour_id), METRICS_HOUR_EXPIRY_SECONDS)
+        pipeline.sadd(get_metrics_key("series"), series_id)
+        pipeline.sadd(get_metrics_key("hours"), hour_id)
+
+    try:
+        pipeline.execute()
+
+    except Exception:
+        with _histograms_lock:
+            for labels, (bucket_counts, count, total_seconds) in histograms.items():
+                histogram = _histograms.setdefault(
+                    labels, [[0] * (len(METRICS_BUCKETS) + 1), 0, 0.0]
+                )
+                histogram[0] = [
+                    existing + new for existing, new in zip(histogram[0], bucket_counts)
+                ]
+                histogram[1] += count
+                histogram[2] += total_seconds
+
+        raise
+
+
+@single_flight()
+def fold_metrics() -> None:
+    """Writes the totals of each completed hour from Redis to the hour's metrics record.
+    Records are set to the hour's full totals, so a fold interrupted before removing an hour
+    from Redis is repeated without counting it twice.
+    """
+    current_period = now_datetime().strftime(METRICS_PERIOD_FORMAT)
+    hour_ids = [
+        hour_id
+        for hour_id in get_members("hours")
+        if hour_id.split(":")[0] < current_period
+    ]
+
+    if not hour_ids:
+        return
+
+    timestamp, user = now(), frappe.session.user
+
+    for hour_id, values in zip(
+        hour_ids,
+        read_hashes([get_metrics_key("hour", hour_id) for hour_id in hour_ids]),
+    ):
+        if not values:
+            # Expired before being folded
+            continue
+
+        (stage, route, branch_id, doctype), bucket_counts, count, total_seconds = (
+            parse_series(values)
+        )
+        period = datetime.strptime(hour_id.split(":")[0], METRICS_PERIOD_FORMAT)
+
+        frappe.db.sql(
+            f"""
+            INSERT INTO `tab{METRICS_DOCTYPE_NAME}`
+                (name, stage, route, branch_id, reference_doctype, period,
+                count, total_seconds, bucket_counts, creation, modified, owner, modified_by)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                count = VALUES(count),
+                total_seconds = VALUES(total_seconds),
+                bucket_counts = VALUES(bucket_counts),
+                modified = VALUES(modified)
+            """,
+            (
+                get_series_id((stage, route, branch_id, doctype, str(period))),
+                stage,
+                route,
+                branch_id,
+                doctype,
+                period,
+                count,
+                total_seconds,
+                json.dumps(bucket_counts),
+                timestamp,
+                timestamp,
+                user,
+                user,
+            ),
+        )
+
+    frappe.db.commit()
+
+    pipeline = frappe.cache.pipeline(transaction=False)
+    pipeline.srem(get_metrics_key("hours"), *hour_ids)
+    pipeline.delete(*(get_metrics_key("hour", hour_id) for hour_id in hour_ids))
+    pipeline.execute()
+
+
+def get_metrics_key(*parts: str) -> str:
+    return frappe.cache.make_key(":".join(("etims_metrics", *parts)))
+
+
+def get_series_id(labels: tuple[str, ...]) -> str:
+    return sha256("\x1f".join(labels).encode(), usedforsecurity=False).hexdigest()[:20]
+
+
+def get_members(set_name: str) -> list[str]:
+    pipeline = frappe.cache.pipeline(transaction=False)
+    pipeline.smembers(get_metrics_key(set_name))
+
+    return sorted(member.decode() for member in pipeline.execute()[0])
+
+
+def read_hashes(keys: list[str]) -> list[dict[bytes, bytes]]:
+    pipeline = frappe.cache.pipeline(transaction=False)
+
+    for key in keys:
+        pipeline.hgetall(key)
+
+    return pipeline.execute()
+
+
+def parse_series(
+    values: dict[bytes, bytes],
+) -> tuple[tuple[str, str, str, str], list[int], int, float]:
+    """Parses a series' totals, as held in Redis
+
+    Returns:
+        tuple[tuple[str, str, str, str], list[int], int, float]: The labels, bucket counts,
+        number of durations and their sum
+    """
+    return (
+        tuple(json.loads(values[b"labels"])),
+        [
+            int(values.get(f"b{index}".encode(), 0))
+            for index in range(len(METRICS_BUCKETS) + 1)
+        ],
+        int(values.get(b"count", 0)),
+        float(values.get(b"sum", 0)),
+    )
+
+
+def delete_old_metrics() -> None:
+    frappe.db.delete(
+        METRICS_DOCTYPE_NAME,
+        {"period": ("<", add_days(now_datetime(), -METRICS_RETENTION_DAYS))},
+    )
+
+
+@frappe.whitelist()
+def get_prometheus_metrics() -> Response:
+    """Exposes the stage histograms, as cumulative counters since their totals were first kept,
+    and the eTims queue's depth in the Prometheus text format
+
+    Returns:
+        Response: The metrics, as text/plain
+    """
+    from .queues import get_etims_queue, get_queue_depth
+
+    frappe.only_for("System Manager")
+    flush_metrics()
+
+    series = read_hashes(
+        [get_metrics_key("total", series_id) for series_id in get_members("series")]
+    )
+    histograms = {
+        labels: (bucket_counts, count, total_seconds)
+        for labels, bucket_counts, count, total_seconds in (
+            parse_series(values) for values in series if values
+        )
+    }
+
+    lines = [
+        "# HELP etims_stage_duration_seconds Duration of the stages of eTims requests",
+        "# TYPE etims_stage_duration_seconds histogram",
+    ]
+
+    for (stage, route, branch_id, doctype), (
+        bucket_counts,
+        count,
+        total_seconds,
+    ) in histograms.items():
+        labels = format_labels(
+            stage=stage, route=route, branch=branch_id, doctype=doctype
+        )
+        cumulative_count = 0
+
+        for bound, bucket_count in zip((*METRICS_BUCKETS, "+Inf"), bucket_counts):
+            cumulative_count += bucket_count
+            lines.append(
+                f'etims_stage_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative_count}'
+            )
+
+        lines.append(f"etims_stage_duration_seconds_sum{{{labels}}} {total_seconds}")
+        lines.append(f"etims_stage_duration_seconds_count{{{labels}}} {count}")
+
+    queue = get_etims_queue()
+    lines += [
+        "# HELP etims_queue_depth Jobs waiting in the eTims queue",
+        "# TYPE etims_queue_depth gauge",
+        f"etims_queue_depth{{{format_labels(queue=queue)}}} {get_queue_depth(queue)}",
+    ]
+
+    return Response(
+        "\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def format_labels(**labels: str) -> str:
+    def escape(value: str) -> str:
+        return (
+            (value or "").replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        )
+
+    return ",".join(f'{label}="{escape(value)}"' for label, value in labels.items())
@@ -32,7 +32,12 @@ frappe.ui.form.on(doctype, {
                 items: frm.doc.items,
               },
             },
-            callback: (response) => {},
+            callback: (response) => {
+              frappe.show_alert({
+                message: "Item composition submission queued.",
+                indicator: "blue",
+              });
+            },
             error: (r) => {
               // Error Handling is Defered to the Server
             },
@@ -7,7 +7,7 @@ frappe.listview_settings[doctypeName] = {
     listview.page.add_inner_button(__("Get Branches"), function (listview) {
       frappe.call({
         method:
-          "kenya_compliance.kenya_compliance.apis.apis.search_branch_request",
+          "kenya_compliance.kenya_compliance.apis.apis.search_branch_request_all_branches",
         args: {
           request_data: {
             company_name: companyName,
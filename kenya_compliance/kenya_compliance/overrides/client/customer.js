@@ -19,7 +19,9 @@ frappe.ui.form.on(doctype, {
               },
             },
             callback: (response) => {
-              frappe.msgprint("Search queued. Please check in later.");
+              if (response.message) {
+                frappe.msgprint("Search queued. Please check in later.");
+              }
             },
             error: (r) => {
               // Error Handling is Defered to the Server
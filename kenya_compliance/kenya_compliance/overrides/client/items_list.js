@@ -30,7 +30,12 @@ frappe.listview_settings[doctypeName].onload = function (listview) {
         docs_list: itemsToRegister,
       },
       callback: (response) => {
-        frappe.msgprint('Bulk submission queued.');
+        if (!response.message) {
+          frappe.msgprint('None of the selected items is pending registration.');
+          return;
+        }
+
+        frappe.msgprint(`${response.message} items queued for registration.`);
       },
       error: (r) => {
         // Error Handling is Defered to the Server
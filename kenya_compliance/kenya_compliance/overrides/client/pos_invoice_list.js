@@ -16,10 +16,70 @@ function bulkSubmitInvoices(listview, doctype) {
       docs_list: itemsToSubmit,
     },
     callback: (response) => {
-      frappe.msgprint("Bulk submission queued.");
+      const bulkJobId = response.message;
+
+      if (!bulkJobId) {
+        frappe.msgprint("None of the selected invoices is pending submission.");
+        return;
+      }
+
+      frappe.show_alert({ message: "Bulk submission queued.", indicator: "blue" });
+      pollBulkSubmissionProgress(bulkJobId);
     },
     error: (r) => {
       // Error Handling is Defered to the Server
     },
   });
 }
+
+// Polling stops once the counts have not changed for this many polls, e.g. after a chunk job was killed
+const BULK_SUBMISSION_POLL_INTERVAL_MS = 3000;
+const BULK_SUBMISSION_MAX_STALLED_POLLS = 20;
+
+function pollBulkSubmissionProgress(bulkJobId, lastProcessed = -1, stalledPolls = 0) {
+  frappe.call({
+    method:
+      "kenya_compliance.kenya_compliance.apis.apis.get_bulk_submission_progress",
+    args: {
+      bulk_job_id: bulkJobId,
+    },
+    callback: (response) => {
+      const progress = response.message;
+
+      if (!progress) {
+        frappe.hide_progress();
+        return;
+      }
+
+      const processed =
+        progress.queued + progress.deferred + progress.skipped + progress.failed;
+
+      frappe.show_progress(
+        "Bulk Submission to eTims",
+        processed,
+        progress.total,
+        `Queued ${progress.queued}, deferred ${progress.deferred}, skipped ${progress.skipped}, failed ${progress.failed}, submitted ${progress.submitted} of ${progress.total} invoices`,
+        true
+      );
+
+      if (processed >= progress.total) {
+        return;
+      }
+
+      stalledPolls = processed === lastProcessed ? stalledPolls + 1 : 0;
+
+      if (stalledPolls >= BULK_SUBMISSION_MAX_STALLED_POLLS) {
+        frappe.hide_progress();
+        frappe.msgprint(
+          `${progress.total - processed} of ${progress.total} invoices were not processed by the bulk submission. They are left pending for the scheduled submissions.`
+        );
+        return;
+      }
+
+      setTimeout(
+        () => pollBulkSubmissionProgress(bulkJobId, processed, stalledPolls),
+        BULK_SUBMISSION_POLL_INTERVAL_MS
+      );
+    },
+  });
+}
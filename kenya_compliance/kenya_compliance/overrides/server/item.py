@@ -8,7 +8,12 @@ from frappe.model.document import Document
 
 from .... import __version__
 from ...apis.apis import perform_item_registration
+from ...doctype.navari_etims_item_code_counter.navari_etims_item_code_counter import (
+    ITEM_CODE_NUMBER_LENGTH,
+    get_next_item_code,
+)
 from ...utils import split_user_email
+from .item_tax_template import get_item_tax_templates
 
 
 @deprecation.deprecated(
@@ -55,29 +60,27 @@ def before_insert(doc: Document, method: str) -> None:
 
 def validate(doc: Document, method: str) -> None:
     # FIXME Ensure all item code numbers follow a global serial
-    # FIXME Currently, the item code number for each item is incremented if there's an item with same etims item code value
-    if not doc.custom_item_registered or "None" in doc.custom_item_code_etims:
+    current_item_code = doc.custom_item_code_etims or ""
+
+    if not doc.custom_item_registered or "None" in current_item_code:
         # Check if Item code contains None or if it's not present
         item_code = f"{doc.custom_etims_country_of_origin_code}{doc.custom_product_type}{doc.custom_packaging_unit_code}{doc.custom_unit_of_quantity_code}"
-        count = frappe.db.count(
-            "Item", {"custom_item_code_etims": ["like", f"{item_code}%"]}
-        )
 
-        doc.custom_item_code_etims = f"{item_code}{str(count + 1).zfill(7)}"
+        # A code already issued for the item's prefix is kept, so re-saving the item does not use up a number
+        if (
+            "None" in current_item_code
+            or not current_item_code.startswith(item_code)
+            or len(current_item_code) != len(item_code) + ITEM_CODE_NUMBER_LENGTH
+        ):
+            doc.custom_item_code_etims = get_next_item_code(item_code)
 
     is_tax_type_changed = doc.has_value_changed(
         "custom_taxation_type"
     )  # Check if tax type field changed
     if doc.custom_taxation_type and is_tax_type_changed:
-        relevant_tax_templates = frappe.get_all(
-            "Item Tax Template",
-            ["*"],
-            {
-                "custom_etims_taxation_type": doc.custom_taxation_type,
-            },
-        )
+        relevant_tax_templates = get_item_tax_templates(doc.custom_taxation_type)
 
         if relevant_tax_templates:
             doc.set("taxes", [])
             for template in relevant_tax_templates:
-                doc.append("taxes", {"item_tax_template": template.name})
+                doc.append("taxes", {"item_tax_template": template})
@@ -0,0 +1,120 @@
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now
+
+# Maps each eTims taxation type to the names of its Item Tax Templates
+ITEM_TAX_TEMPLATES_CACHE_KEY = "etims_item_tax_templates"
+
+
+def get_item_tax_templates(taxation_type: str) -> list[str]:
+    """Fetches the Item Tax Templates of an eTims taxation type, cached until a template changes
+
+    Args:
+        taxation_type (str): The eTims taxation type, e.g. B
+
+    Returns:
+        list[str]: The template names
+    """
+    return frappe.cache.hget(
+        ITEM_TAX_TEMPLATES_CACHE_KEY,
+        taxation_type,
+        generator=lambda: frappe.get_all(
+            "Item Tax Template",
+            filters={"custom_etims_taxation_type": taxation_type},
+            pluck="name",
+        ),
+    )
+
+
+def clear_item_tax_templates_cache(doc: Document, method: str, *args) -> None:
+    frappe.cache.delete_value(ITEM_TAX_TEMPLATES_CACHE_KEY)
+
+
+@frappe.whitelist()
+def assign_item_tax_templates(items: str | list[str]) -> int:
+    """Replaces the taxes table of many items, e.g. after a data import, with the templates of
+    each item's taxation type. The tables are rewritten with one delete and one bulk insert.
+    Items whose taxation type has no templates are left unchanged.
+
+    Args:
+        items (str | list[str]): The item names, or a JSON list of them
+
+    Returns:
+        int: The number of items updated
+    """
+    frappe.has_permission("Item", "write", throw=True)
+
+    taxation_types = dict(
+        frappe.get_all(
+            "Item",
+            filters={
+                "name": ("in", frappe.parse_json(items)),
+                "custom_taxation_type": ("is", "set"),
+            },
+            fields=["name", "custom_taxation_type"],
+            as_list=True,
+        )
+    )
+    item_templates = {
+        item: templates
+        for item, taxation_type in taxation_types.items()
+        if (templates := get_item_tax_templates(taxation_type))
+    }
+
+    if not item_templates:
+        return 0
+
+    frappe.db.delete(
+        "Item Tax",
+        {
+            "parent": ("in", list(item_templates)),
+            "parenttype": "Item",
+            "parentfield": "taxes",
+        },
+    )
+
+    timestamp, user = now(), frappe.session.user
+    frappe.db.bulk_insert(
+        "Item Tax",
+        fields=[
+            "name",
+            "parent",
+            "parenttype",
+            "parentfield",
+            "idx",
+            "item_tax_template",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+        ],
+        values=[
+            (
+                frappe.generate_hash(length=10),
+                item,
+                "Item",
+                "taxes",
+                idx,
+                template,
+                timestamp,
+                timestamp,
+                user,
+                user,
+            )
+            for item, templates in item_templates.items()
+            for idx, template in enumerate(templates, start=1)
+        ],
+    )
+
+    # The items' modified is bumped, as a save of the items would, so open forms and syncs see the change
+    frappe.db.set_value(
+        "Item",
+        {"name": ("in", list(item_templates))},
+        {"modified": timestamp, "modified_by": user},
+        update_modified=False,
+    )
+
+    for item in item_templates:
+        frappe.clear_document_cache("Item", item)
+
+    return len(item_templates)
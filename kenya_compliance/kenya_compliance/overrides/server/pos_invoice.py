@@ -3,8 +3,12 @@ from frappe.model.document import Document
 from .shared_overrides import generic_invoices_on_submit_override
 
 
-def on_submit(doc: Document, method: str) -> None:
-    """Intercepts POS invoice on submit event"""
+def on_submit(doc: Document, method: str) -> bool | None:
+    """Intercepts POS invoice on submit event
+
+    Returns:
+        bool | None: Whether the submission to eTims was enqueued, None if not applicable
+    """
 
     if not doc.custom_successfully_submitted:
-        generic_invoices_on_submit_override(doc, "POS Invoice")
+        return generic_invoices_on_submit_override(doc, "POS Invoice")
@@ -3,13 +3,14 @@ from functools import partial
 
 import frappe
 from frappe.model.document import Document
-from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
 
 from ...apis.api_builder import EndpointsBuilder
 from ...apis.remote_response_status_handlers import (
     on_error,
     purchase_invoice_submission_on_success,
 )
+from ...metrics import timed
+from ...queues import enqueue_etims_job
 from ...utils import (
     build_headers,
     extract_document_series_number,
@@ -24,6 +25,8 @@ endpoints_builder = EndpointsBuilder()
 
 
 def validate(doc: Document, method: str) -> None:
+    from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
+
     item_taxes = get_itemised_tax_breakup_data(doc)
 
     taxes_breakdown = defaultdict(list)
@@ -59,7 +62,12 @@ def validate(doc: Document, method: str) -> None:
         update_tax_breakdowns(doc, (taxes_breakdown, taxable_breakdown))
 
 
-def on_submit(doc: Document, method: str) -> None:
+def on_submit(doc: Document, method: str) -> bool | None:
+    """Submits a purchase invoice to eTims
+
+    Returns:
+        bool | None: Whether the submission was enqueued, None if not applicable
+    """
     if doc.is_return == 0 and doc.update_stock == 1:
         # TODO: Handle cases when item tax templates have not been picked
         company_name = doc.company
@@ -81,17 +89,15 @@ def on_submit(doc: Document, method: str) -> None:
 
             endpoints_builder.error_callback = on_error
 
-            frappe.enqueue(
+            return enqueue_etims_job(
                 endpoints_builder.make_remote_call,
-                is_async=True,
-                queue="default",
-                timeout=300,
                 job_name=f"{doc.name}_send_purchase_information",
                 doctype="Purchase Invoice",
                 document_name=doc.name,
             )
 
 
+@timed("payload", route="TrnsPurchaseSaveReq", doctype="Purchase Invoice")
 def build_purchase_invoice_payload(doc: Document) -> dict:
     series_no = extract_document_series_number(doc)
     items_list = get_items_details(doc)
@@ -145,6 +151,8 @@ def build_purchase_invoice_payload(doc: Document) -> dict:
 
 
 def get_items_details(doc: Document) -> list:
+    from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
+
     items_list = []
     item_taxes = get_itemised_tax_breakup_data(doc)
 
@@ -4,13 +4,13 @@ from typing import Literal
 
 import frappe
 from frappe.model.document import Document
-from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
 
 from ...apis.api_builder import EndpointsBuilder
 from ...apis.remote_response_status_handlers import (
     on_error,
     sales_information_submission_on_success,
 )
+from ...queues import enqueue_etims_job
 from ...utils import (
     build_headers,
     build_invoice_payload,
@@ -24,13 +24,16 @@ endpoints_builder = EndpointsBuilder()
 
 def generic_invoices_on_submit_override(
     doc: Document, invoice_type: Literal["Sales Invoice", "POS Invoice"]
-) -> None:
+) -> bool | None:
     """Defines a function to handle sending of Sales information from relevant invoice documents
 
     Args:
         doc (Document): The doctype object or record
         invoice_type (Literal[&quot;Sales Invoice&quot;, &quot;POS Invoice&quot;]):
         The Type of the invoice. Either Sales, or POS
+
+    Returns:
+        bool | None: Whether the submission was enqueued, None if the branch has no settings
     """
     company_name = doc.company
 
@@ -58,11 +61,8 @@ def generic_invoices_on_submit_override(
         )
         endpoints_builder.error_callback = on_error
 
-        frappe.enqueue(
+        return enqueue_etims_job(
             endpoints_builder.make_remote_call,
-            is_async=True,
-            queue="default",
-            timeout=300,
             job_name=f"{doc.name}_send_sales_request",
             doctype=invoice_type,
             document_name=doc.name,
@@ -70,6 +70,8 @@ def generic_invoices_on_submit_override(
 
 
 def validate(doc: Document, method: str) -> None:
+    from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
+
     doc.custom_scu_id = get_curr_env_etims_settings(
         frappe.defaults.get_user_default("Company"), doc.branch
     ).scu_id
@@ -4,13 +4,14 @@ from typing import Literal
 
 import frappe
 from frappe.model.document import Document
-from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
 
 from ...apis.api_builder import EndpointsBuilder
 from ...apis.remote_response_status_handlers import (
     on_error,
     stock_mvt_submission_on_success,
 )
+from ...metrics import timed
+from ...queues import enqueue_etims_job
 from ...utils import (
     build_headers,
     extract_document_series_number,
@@ -22,12 +23,94 @@ from ...utils import (
 endpoints_builder = EndpointsBuilder()
 
 
-def on_update(doc: Document, method: str | None = None) -> None:
+# The Item fields read when building a stock movement's item details
+STOCK_MOVEMENT_ITEM_FIELDS = [
+    "name",
+    "item_code",
+    "custom_item_code_etims",
+    "custom_item_classification",
+    "custom_packaging_unit_code",
+    "custom_unit_of_quantity_code",
+    "custom_taxation_type_code",
+    "custom_imported_item_status",
+    "custom_imported_item_task_code",
+]
+
+
+def on_update(
+    doc: Document,
+    method: str | None = None,
+    items: list[dict] | None = None,
+    voucher: Document | None = None,
+) -> bool | None:
+    """Submits a stock ledger entry's movement to eTims
+
+    Args:
+        doc (Document): The stock ledger entry
+        method (str | None, optional): The hook's method. Defaults to None.
+        items (list[dict] | None, optional): The entry's Item, with STOCK_MOVEMENT_ITEM_FIELDS,
+            e.g. preloaded for a batch of entries. Fetched if None. Defaults to None.
+        voucher (Document | None, optional): The entry's voucher, e.g. shared by a batch of entries.
+            Fetched if None. Defaults to None.
+
+    Returns:
+        bool | None: Whether the submission was enqueued, None if not applicable
+    """
     company_name = doc.company
-    all_items = frappe.db.get_all(
-        "Item", ["*"]
-    )  # Get all items to filter and fetch metadata
-    record = frappe.get_doc(doc.voucher_type, doc.voucher_no)
+    all_items = (
+        items if items is not None else get_stock_movement_items([doc.item_code])
+    )
+    record = voucher or frappe.get_doc(doc.voucher_type, doc.voucher_no)
+    stock_movement = build_stock_movement_payload(doc, record, all_items)
+
+    if not stock_movement:
+        return None
+
+    payload, branch_id = stock_movement
+    headers = build_headers(company_name, branch_id)
+    server_url = get_server_url(company_name, record.branch)
+    route_path, last_request_date = get_route_path("StockIOSaveReq")
+
+    if headers and server_url and route_path:
+        url = f"{server_url}{route_path}"
+
+        endpoints_builder.url = url
+        endpoints_builder.headers = headers
+        endpoints_builder.payload = payload
+        endpoints_builder.error_callback = on_error
+        endpoints_builder.success_callback = partial(
+            stock_mvt_submission_on_success, document_name=doc.name
+        )
+
+        job_name = sha256(
+            f"{doc.name}{doc.creation}{doc.modified}".encode(), usedforsecurity=False
+        ).hexdigest()
+
+        return enqueue_etims_job(
+            endpoints_builder.make_remote_call,
+            job_name=job_name,
+            doctype="Stock Ledger Entry",
+            document_name=doc.name,
+        )
+
+
+@timed("payload", route="StockIOSaveReq", doctype="Stock Ledger Entry")
+def build_stock_movement_payload(
+    doc: Document, record: Document, all_items: list[dict]
+) -> tuple[dict, str | None] | None:
+    """Builds the payload of a stock ledger entry's movement
+
+    Args:
+        doc (Document): The stock ledger entry
+        record (Document): The entry's voucher
+        all_items (list[dict]): The entry's Item, with STOCK_MOVEMENT_ITEM_FIELDS
+
+    Returns:
+        tuple[dict, str | None] | None: The payload, and the branch whose headers it is sent with.
+        None if the entry's movement is not submitted
+    """
+    from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
+
     series_no = extract_document_series_number(record)
     payload = {
         "sarNo": series_no,
@@ -47,7 +130,7 @@ def on_update(doc: Document, method: str | None = None) -> None:
         "modrNm": record.modified_by,
         "modrId": split_user_email(record.modified_by),
     }
-    headers = build_headers(company_name, record.branch)
+    branch_id = record.branch
 
     if doc.voucher_type == "Stock Reconciliation":
         items_list = get_stock_recon_movement_items_details(
@@ -99,7 +182,7 @@ def on_update(doc: Document, method: str | None = None) -> None:
 
             if doc.actual_qty < 0:
                 # If the record warehouse is the source warehouse
-                headers = build_headers(doc.company, doc_warehouse_branch_id)
+                branch_id = doc_warehouse_branch_id
                 payload["custBhfId"] = get_warehouse_branch_id(
                     voucher_details.t_warehouse
                 )
@@ -107,7 +190,7 @@ def on_update(doc: Document, method: str | None = None) -> None:
 
             else:
                 # If the record warehouse is the target warehouse
-                headers = build_headers(doc.company, doc_warehouse_branch_id)
+                branch_id = doc_warehouse_branch_id
                 payload["custBhfId"] = get_warehouse_branch_id(
                     voucher_details.s_warehouse
                 )
@@ -174,7 +257,7 @@ def on_update(doc: Document, method: str | None = None) -> None:
             doc.voucher_type == "Sales Invoice"
             and record.custom_successfully_submitted != 1
         ):
-            return
+            return None
 
         items_list = get_notes_docs_items_details(record.items, all_items)
         item_taxes = get_itemised_tax_breakup_data(record)
@@ -220,33 +303,7 @@ def on_update(doc: Document, method: str | None = None) -> None:
         else:
             payload["sarTyCd"] = "11"
 
-    server_url = get_server_url(company_name, record.branch)
-    route_path, last_request_date = get_route_path("StockIOSaveReq")
-
-    if headers and server_url and route_path:
-        url = f"{server_url}{route_path}"
-
-        endpoints_builder.url = url
-        endpoints_builder.headers = headers
-        endpoints_builder.payload = payload
-        endpoints_builder.error_callback = on_error
-        endpoints_builder.success_callback = partial(
-            stock_mvt_submission_on_success, document_name=doc.name
-        )
-
-        job_name = sha256(
-            f"{doc.name}{doc.creation}{doc.modified}".encode(), usedforsecurity=False
-        ).hexdigest()
-
-        frappe.enqueue(
-            endpoints_builder.make_remote_call,
-            queue="default",
-            is_async=True,
-            timeout=300,
-            job_name=job_name,
-            doctype="Stock Ledger Entry",
-            document_name=doc.name,
-        )
+    return payload, branch_id
 
 
 def get_stock_entry_movement_items_details(
@@ -420,6 +477,14 @@ def get_notes_docs_items_details(
     return items_list
 
 
+def get_stock_movement_items(item_codes: list[str] | set[str]) -> list[dict]:
+    return frappe.get_all(
+        "Item",
+        filters={"name": ("in", list(item_codes))},
+        fields=STOCK_MOVEMENT_ITEM_FIELDS,
+    )
+
+
 def get_warehouse_branch_id(warehouse_name: str) -> str | Literal[0]:
     branch_id = frappe.db.get_value(
         "Warehouse", {"name": warehouse_name}, ["custom_branch"], as_dict=True
@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import get_datetime
+
+from .item_tax_template import (
+    ITEM_TAX_TEMPLATES_CACHE_KEY,
+    assign_item_tax_templates,
+    clear_item_tax_templates_cache,
+)
+
+TEST_ITEM = "_Test eTims Tax Template Item"
+TEST_TAXATION_TYPE = "B"
+TEST_TEMPLATES = ["_Test Template 16%", "_Test Template Exempt"]
+TEST_MODIFIED = "2024-01-01 00:00:00"
+
+
+class TestItemTaxTemplate(FrappeTestCase):
+    """Test Cases"""
+
+    def setUp(self) -> None:
+        item = frappe.get_doc(
+            {
+                "doctype": "Item",
+                "name": TEST_ITEM,
+                "item_code": TEST_ITEM,
+                "item_name": TEST_ITEM,
+                "item_group": "All Item Groups",
+                "stock_uom": "Nos",
+                "custom_taxation_type": TEST_TAXATION_TYPE,
+                "creation": TEST_MODIFIED,
+                "modified": TEST_MODIFIED,
+                "taxes": [{"item_tax_template": "_Test Stale Template"}],
+            }
+        )
+        item.set_parent_in_children()
+        item.db_insert()
+
+        for row in item.taxes:
+            row.name = frappe.generate_hash(length=10)
+            row.db_insert()
+
+    def tearDown(self) -> None:
+        frappe.db.delete("Item Tax", {"parent": TEST_ITEM, "parenttype": "Item"})
+        frappe.db.delete("Item", {"name": TEST_ITEM})
+        frappe.clear_document_cache("Item", TEST_ITEM)
+
+    @patch(f"{__package__}.item_tax_template.get_item_tax_templates")
+    def test_assign_item_tax_templates(self, mock_get_item_tax_templates) -> None:
+        mock_get_item_tax_templates.return_value = TEST_TEMPLATES
+
+        # Cached before the assignment, so the cache is shown to be cleared
+        frappe.get_cached_doc("Item", TEST_ITEM)
+
+        self.assertEqual(assign_item_tax_templates([TEST_ITEM]), 1)
+        mock_get_item_tax_templates.assert_called_once_with(TEST_TAXATION_TYPE)
+
+        # The stale row is deleted, and the templates inserted in order
+        self.assertEqual(
+            frappe.get_all(
+                "Item Tax",
+                filters={"parent": TEST_ITEM, "parenttype": "Item"},
+                pluck="item_tax_template",
+                order_by="idx",
+            ),
+            TEST_TEMPLATES,
+        )
+
+        item = frappe.get_cached_doc("Item", TEST_ITEM)
+
+        self.assertEqual([row.item_tax_template for row in item.taxes], TEST_TEMPLATES)
+        self.assertGreater(get_datetime(item.modified), get_datetime(TEST_MODIFIED))
+
+    @patch(f"{__package__}.item_tax_template.get_item_tax_templates", return_value=[])
+    def test_items_without_templates_are_unchanged(self, _) -> None:
+        self.assertEqual(assign_item_tax_templates([TEST_ITEM]), 0)
+        self.assertEqual(
+            str(frappe.db.get_value("Item", TEST_ITEM, "modified")), TEST_MODIFIED
+        )
+
+    def test_templates_cache_is_cleared_when_a_template_changes(self) -> None:
+        doc_events = frappe.get_hooks("doc_events")["Item Tax Template"]
+        hook = f"{clear_item_tax_templates_cache.__module__}.{clear_item_tax_templates_cache.__name__}"
+
+        for event in ("on_update", "on_trash", "after_rename"):
+            self.assertIn(hook, doc_events[event])
+
+        frappe.cache.hset(
+            ITEM_TAX_TEMPLATES_CACHE_KEY, TEST_TAXATION_TYPE, ["_Test Stale Template"]
+        )
+        clear_item_tax_templates_cache(frappe._dict(), "on_update")
+
+        self.assertIsNone(
+            frappe.cache.hget(ITEM_TAX_TEMPLATES_CACHE_KEY, TEST_TAXATION_TYPE)
+        )
@@ -0,0 +1,120 @@
+"""Enqueueing of eTims jobs on a dedicated queue, with backpressure"""
+
+from typing import Callable
+
+import frappe
+from frappe.utils import cint
+from frappe.utils.background_jobs import get_queue, get_queues_timeout
+
+from .doctype.doctype_names_mapping import ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME
+from .logger import etims_logger
+
+# eTims jobs run on their own queue when it is configured under "workers" in common_site_config.json,
+# so a backlog of submissions does not hold up other jobs. Otherwise, they run on the default queue
+ETIMS_QUEUE = "etims"
+FALLBACK_QUEUE = "default"
+
+# Used when no high-water mark is set on the environment identifier
+DEFAULT_QUEUE_HIGH_WATER_MARK = 1000
+
+
+def get_etims_queue() -> str:
+    return ETIMS_QUEUE if ETIMS_QUEUE in get_queues_timeout() else FALLBACK_QUEUE
+
+
+def get_queue_depth(queue: str | None = None) -> int:
+    """Counts the jobs waiting in a queue
+
+    Args:
+        queue (str | None, optional): The queue. Defaults to the eTims queue.
+
+    Returns:
+        int: The number of queued jobs
+    """
+    return get_queue(queue or get_etims_queue()).count
+
+
+def get_queue_high_water_mark() -> int:
+    high_water_mark = frappe.db.get_single_value(
+        ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME, "queue_high_water_mark", cache=True
+    )
+
+    return cint(high_water_mark) or DEFAULT_QUEUE_HIGH_WATER_MARK
+
+
+def is_etims_queue_busy() -> bool:
+    return get_queue_depth() >= get_queue_high_water_mark()
+
+
+def throw_etims_queue_busy() -> None:
+    frappe.throw(
+        "eTims is processing a large backlog of submissions. Please try again in a few minutes",
+        title="eTims Queue Busy",
+    )
+
+
+def enqueue_etims_job(
+    method: Callable,
+    job_name: str | None = None,
+    timeout: int = 300,
+    throw_when_busy: bool = False,
+    **kwargs,
+) -> bool:
+    """Enqueues a job on the eTims queue, unless the queue's backlog is above its high-water mark.
+
+    Jobs submitting records with a pending submission flag, e.g. invoices and stock ledger entries,
+    are skipped when the queue is busy, leaving the records pending for the scheduled sweeps.
+    Jobs without such a durable pending state should pass throw_when_busy, asking the user to retry.
+
+    Args:
+        method (Callable): The job's function
+        job_name (str | None, optional): The job's name. Defaults to None.
+        timeout (int, optional): The job's timeout, in seconds. Defaults to 300.
+        throw_when_busy (bool, optional): Whether to throw, instead of skipping the job, when the queue is busy.
+            Defaults to False.
+        **kwargs: The keyword arguments passed to the job's function
+
+    Returns:
+        bool: True if the job was enqueued, False if it was skipped
+    """
+    if is_etims_queue_busy():
+        if throw_when_busy:
+            throw_etims_queue_busy()
+
+        etims_logger.info(
+            "Left %s pending as the eTims queue is above its high-water mark",
+            job_name or method.__name__,
+        )
+        return False
+
+    frappe.enqueue(
+        method,
+        queue=get_etims_queue(),
+        is_async=True,
+        timeout=timeout,
+        job_name=job_name,
+        **kwargs,
+    )
+
+    return True
+
+
+@frappe.whitelist()
+def get_etims_queue_status() -> dict[str, str | int | bool]:
+    """Reports the eTims queue's depth against its high-water mark
+
+    Returns:
+        dict[str, str | int | bool]: The queue, its depth and high-water mark, and whether it is busy
+    """
+    frappe.only_for("System Manager")
+
+    queue = get_etims_queue()
+    depth = get_queue_depth(queue)
+    high_water_mark = get_queue_high_water_mark()
+
+    return {
+        "queue": queue,
+        "depth": depth,
+        "high_water_mark": high_water_mark,
+        "busy": depth >= high_water_mark,
+    }
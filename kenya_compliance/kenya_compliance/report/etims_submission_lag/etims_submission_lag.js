@@ -0,0 +1,20 @@
+// Copyright (c) 2024, Navari Ltd and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["eTims Submission Lag"] = {
+  filters: [
+    {
+      fieldname: "company",
+      label: __("Company"),
+      fieldtype: "Link",
+      options: "Company",
+    },
+    {
+      fieldname: "window",
+      label: __("Throughput Window (Minutes)"),
+      fieldtype: "Int",
+      default: 60,
+      reqd: 1,
+    },
+  ],
+};
@@ -0,0 +1,145 @@
+# Copyright (c) 2024, Navari Ltd and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.utils import add_to_date, cint, flt, now_datetime, time_diff_in_seconds
+
+from ...doctype.doctype_names_mapping import (
+    SUBMISSION_BACKLOG_DOCTYPE_NAME,
+    SUBMISSION_THROUGHPUT_DOCTYPE_NAME,
+)
+from ...doctype.navari_etims_submission_backlog.navari_etims_submission_backlog import (
+    TRACKED_DOCTYPES,
+)
+
+
+def execute(filters: dict | None = None) -> tuple[list[dict], list[dict]]:
+    """Reports each branch's records pending submission to eTims, and recent submissions per minute.
+    Only the pre-aggregated backlog and throughput counters are read, not the transaction tables.
+    """
+    filters = frappe._dict(filters or {})
+    window = cint(filters.window) or 60
+    counter_filters = {"company": filters.company} if filters.company else {}
+    rows = {}
+
+    for backlog in frappe.get_all(
+        SUBMISSION_BACKLOG_DOCTYPE_NAME,
+        filters=counter_filters,
+        fields=[
+            "reference_doctype",
+            "company",
+            "branch_id",
+            "pending_count",
+            "oldest_pending",
+        ],
+    ):
+        rows[(backlog.reference_doctype, backlog.company, backlog.branch_id)] = {
+            **backlog,
+            "lag_minutes": (
+                time_diff_in_seconds(now_datetime(), backlog.oldest_pending) / 60
+                if backlog.pending_count and backlog.oldest_pending
+                else 0
+            ),
+        }
+
+    for throughput in frappe.get_all(
+        SUBMISSION_THROUGHPUT_DOCTYPE_NAME,
+        filters={
+            **counter_filters,
+            "period": (">=", add_to_date(now_datetime(), minutes=-window)),
+        },
+        fields=[
+            "reference_doctype",
+            "company",
+            "branch_id",
+            "sum(submitted_count) as submitted_count",
+        ],
+        group_by="reference_doctype, company, branch_id",
+    ):
+        row = rows.setdefault(
+            (throughput.reference_doctype, throughput.company, throughput.branch_id),
+            {
+                "reference_doctype": throughput.reference_doctype,
+                "company": throughput.company,
+                "branch_id": throughput.branch_id,
+                "pending_count": 0,
+            },
+        )
+        row["submitted_count"] = throughput.submitted_count
+        row["submissions_per_minute"] = flt(throughput.submitted_count / window, 2)
+
+    for row in rows.values():
+        row["route"] = TRACKED_DOCTYPES[row["reference_doctype"]][1]
+
+    return get_columns(window), sorted(
+        rows.values(),
+        key=lambda row: (
+            row["reference_doctype"],
+            row["company"],
+            row["branch_id"] or "",
+        ),
+    )
+
+
+def get_columns(window: int) -> list[dict]:
+    return [
+        {
+            "fieldname": "reference_doctype",
+            "label": _("Document Type"),
+            "fieldtype": "Link",
+            "options": "DocType",
+            "width": 160,
+        },
+        {
+            "fieldname": "route",
+            "label": _("Route"),
+            "fieldtype": "Data",
+            "width": 160,
+        },
+        {
+            "fieldname": "company",
+            "label": _("Company"),
+            "fieldtype": "Link",
+            "options": "Company",
+            "width": 180,
+        },
+        {
+            "fieldname": "branch_id",
+            "label": _("Branch Id"),
+            "fieldtype": "Data",
+            "width": 100,
+        },
+        {
+            "fieldname": "pending_count",
+            "label": _("Pending"),
+            "fieldtype": "Int",
+            "width": 100,
+        },
+        {
+            "fieldname": "oldest_pending",
+            "label": _("Oldest Pending"),
+            "fieldtype": "Datetime",
+            "width": 170,
+        },
+        {
+            "fieldname": "lag_minutes",
+            "label": _("Lag (Minutes)"),
+            "fieldtype": "Float",
+            "precision": 1,
+            "width": 120,
+        },
+        {
+            "fieldname": "submitted_count",
+            "label": _("Submitted (Last {0} Minutes)").format(window),
+            "fieldtype": "Int",
+            "width": 170,
+        },
+        {
+            "fieldname": "submissions_per_minute",
+            "label": _("Submissions per Minute"),
+            "fieldtype": "Float",
+            "precision": 2,
+            "width": 170,
+        },
+    ]
@@ -1,5 +1,43 @@
 import frappe
 
+# Composite indexes backing the scheduler sweeps for records pending submission to eTims,
+# keyed by the doctype they are created on, then the index name
+ETIMS_INDEXES = {
+    "Sales Invoice": {
+        "etims_submission_index": (
+            "custom_successfully_submitted",
+            "docstatus",
+            "modified",
+        )
+    },
+    "POS Invoice": {
+        "etims_submission_index": (
+            "custom_successfully_submitted",
+            "docstatus",
+            "modified",
+        )
+    },
+    "Purchase Invoice": {
+        "etims_submission_index": (
+            "custom_submitted_successfully",
+            "docstatus",
+            "modified",
+        )
+    },
+    "Stock Ledger Entry": {
+        "etims_submission_index": (
+            "custom_submitted_successfully",
+            "docstatus",
+            "modified",
+        ),
+        "etims_inventory_submission_index": (
+            "custom_submitted_successfully",
+            "custom_inventory_submitted_successfully",
+            "modified",
+        ),
+    },
+}
+
 
 def after_install() -> None:
     query = """
@@ -9,3 +47,15 @@ def after_install() -> None:
     """
 
     frappe.db.sql_ddl(query)
+
+    create_etims_indexes()
+
+
+def create_etims_indexes() -> None:
+    """Creates the indexes used by the pending submission sweeps, if missing.
+    Indexes whose columns are not yet created, e.g. before the custom fields are synced, are skipped.
+    """
+    for doctype, indexes in ETIMS_INDEXES.items():
+        for index_name, fields in indexes.items():
+            if all(frappe.db.has_column(doctype, field) for field in fields):
+                frappe.db.add_index(doctype, list(fields), index_name=index_name)
@@ -0,0 +1,68 @@
+import json
+import subprocess
+import sys
+
+from frappe.tests.utils import FrappeTestCase
+
+# Upper bound, in seconds, on the cold import of the modules loaded by the app's document hooks,
+# in a process that has already imported frappe, as every web and worker process has
+IMPORT_TIME_BUDGET_SECONDS = 0.5
+
+HOOK_MODULES = (
+    "kenya_compliance.kenya_compliance.overrides.server.sales_invoice",
+    "kenya_compliance.kenya_compliance.overrides.server.pos_invoice",
+    "kenya_compliance.kenya_compliance.overrides.server.purchase_invoice",
+    "kenya_compliance.kenya_compliance.overrides.server.shared_overrides",
+    "kenya_compliance.kenya_compliance.overrides.server.stock_ledger_entry",
+    "kenya_compliance.kenya_compliance.overrides.server.item",
+    "kenya_compliance.kenya_compliance.overrides.server.item_tax_template",
+    "kenya_compliance.kenya_compliance.doctype.navari_etims_submission_backlog.navari_etims_submission_backlog",
+)
+
+# Dependencies only needed once a request is sent to eTims, or a receipt's QR code is drawn
+LAZY_MODULES = (
+    "aiohttp",
+    "ijson",
+    "qrcode",
+    "PIL",
+    "erpnext.controllers.taxes_and_totals",
+)
+
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+
+import frappe
+import frappe.model.document
+
+start = time.perf_counter()
+
+for module in {hook_modules!r}:
+    importlib.import_module(module)
+
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "loaded": [module for module in {lazy_modules!r} if module in sys.modules],
+}}))
+"""
+
+
+class TestImportTime(FrappeTestCase):
+    """Test Cases"""
+
+    def test_cold_import_of_hook_modules(self) -> None:
+        output = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                IMPORT_SCRIPT.format(
+                    hook_modules=HOOK_MODULES, lazy_modules=LAZY_MODULES
+                ),
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+
+        self.assertEqual(result["loaded"], [])
+        self.assertLess(result["seconds"], IMPORT_TIME_BUDGET_SECONDS)
@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from .locks import SingleFlightLock, coalesce, get_request_key, single_flight
+
+TEST_LOCK_NAME = "test_single_flight_lock"
+
+
+class TestLocks(FrappeTestCase):
+    """Test Cases"""
+
+    def test_lock_is_exclusive_until_released(self) -> None:
+        lock = SingleFlightLock(TEST_LOCK_NAME)
+        competing_lock = SingleFlightLock(TEST_LOCK_NAME)
+
+        self.assertTrue(lock.acquire())
+        self.assertFalse(competing_lock.acquire())
+
+        # Releasing a lock held elsewhere leaves it in place
+        competing_lock.release()
+        self.assertFalse(SingleFlightLock(TEST_LOCK_NAME).acquire())
+
+        lock.release()
+        self.assertTrue(competing_lock.acquire())
+        competing_lock.release()
+
+    def test_single_flight_skips_overlapping_runs(self) -> None:
+        runs = []
+
+        @single_flight(name=TEST_LOCK_NAME)
+        def job() -> str:
+            runs.append(1)
+
+            # A run starting while this one is in flight is skipped
+            self.assertIsNone(job())
+
+            return "done"
+
+        self.assertEqual(job(), "done")
+        self.assertEqual(len(runs), 1)
+
+    def test_coalesced_calls_share_a_result(self) -> None:
+        runs = []
+
+        @coalesce(key=lambda payload: get_request_key("TestSearchReq", "00", payload))
+        def search(payload: dict) -> dict:
+            runs.append(payload)
+
+            if payload.get("fail"):
+                frappe.throw("Search failed")
+
+            return {"count": len(runs)}
+
+        payload = {"lastReqDt": "20240101000000", "nonce": frappe.generate_hash()}
+
+        self.assertEqual(search(payload), {"count": 1})
+        self.assertEqual(search(dict(reversed(payload.items()))), {"count": 1})
+        self.assertEqual(
+            search({**payload, "lastReqDt": "20240102000000"}), {"count": 2}
+        )
+
+        # An identical call in flight elsewhere is not waited for
+        with patch(f"{__package__}.locks.SingleFlightLock.acquire", return_value=False):
+            self.assertIsNone(search({**payload, "lastReqDt": "20240103000000"}))
+
+        # Failures are not shared
+        for _ in range(2):
+            self.assertRaises(frappe.ValidationError, search, {**payload, "fail": 1})
+
+        self.assertEqual(len(runs), 4)
@@ -0,0 +1,45 @@
+import json
+import logging
+from unittest.mock import MagicMock
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from .logger import JSONFormatter, etims_logger, queue_handler
+
+
+class TestLogger(FrappeTestCase):
+    """Test Cases"""
+
+    def setUp(self) -> None:
+        self.level = etims_logger.level
+
+    def tearDown(self) -> None:
+        etims_logger.setLevel(self.level)
+
+    def test_records_below_the_level_are_not_formatted(self) -> None:
+        etims_logger.setLevel(logging.WARNING)
+        argument = MagicMock()
+
+        etims_logger.info("Submitted %s", argument)
+
+        argument.__str__.assert_not_called()
+
+    def test_records_are_formatted_as_json(self) -> None:
+        record = etims_logger.makeRecord(
+            "etims",
+            logging.ERROR,
+            __file__,
+            1,
+            "%s, Code: %s",
+            ("Invalid PIN", "910"),
+            None,
+            extra={"document_name": "ACC-SINV-2024-00001"},
+        )
+
+        entry = json.loads(JSONFormatter().format(queue_handler.prepare(record)))
+
+        self.assertEqual(entry["level"], "ERROR")
+        self.assertEqual(entry["message"], "Invalid PIN, Code: 910")
+        self.assertEqual(entry["document_name"], "ACC-SINV-2024-00001")
+        self.assertEqual(entry["site"], frappe.local.site)
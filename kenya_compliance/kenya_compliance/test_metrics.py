@@ -0,0 +1,106 @@
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import now_datetime
+
+from .doctype.doctype_names_mapping import METRICS_DOCTYPE_NAME
+from .metrics import (
+    METRICS_FLUSH_INTERVAL_SECONDS,
+    flush_metrics,
+    fold_metrics,
+    get_metrics_key,
+    get_prometheus_metrics,
+    get_series_id,
+    parse_series,
+    read_hashes,
+    record_duration,
+    timed,
+)
+
+TEST_ROUTE = "TestSaveReq"
+
+
+class TestMetrics(FrappeTestCase):
+    """Test Cases"""
+
+    def setUp(self) -> None:
+        frappe.cache.delete_keys("etims_metrics")
+
+    def tearDown(self) -> None:
+        frappe.cache.delete_keys("etims_metrics")
+        frappe.db.delete(METRICS_DOCTYPE_NAME, {"route": TEST_ROUTE})
+
+    def record_test_durations(self) -> None:
+        for seconds in (0.004, 0.3, 42):
+            record_duration("http", seconds, route=TEST_ROUTE, branch_id="00")
+
+        flush_metrics()
+        record_duration("http", 0.3, route=TEST_ROUTE, branch_id="00")
+        flush_metrics()
+
+    def test_flushes_add_up_in_the_cumulative_counters(self) -> None:
+        self.record_test_durations()
+
+        text = get_prometheus_metrics().get_data(as_text=True)
+
+        self.assertIn(
+            'etims_stage_duration_seconds_bucket{stage="http",route="TestSaveReq",'
+            'branch="00",doctype="",le="0.5"} 3',
+            text,
+        )
+        self.assertIn(
+            'etims_stage_duration_seconds_count{stage="http",route="TestSaveReq",'
+            'branch="00",doctype=""} 4',
+            text,
+        )
+        self.assertFalse(frappe.db.exists(METRICS_DOCTYPE_NAME, {"route": TEST_ROUTE}))
+
+    def test_completed_hours_are_folded_into_their_record(self) -> None:
+        self.record_test_durations()
+
+        next_hour = now_datetime() + timedelta(hours=1)
+
+        with patch(f"{__package__}.metrics.now_datetime", return_value=next_hour):
+            fold_metrics()
+            # Folding again, e.g. after an interrupted fold, must not count the hour twice
+            fold_metrics()
+
+        record = frappe.get_all(
+            METRICS_DOCTYPE_NAME,
+            filters={"route": TEST_ROUTE},
+            fields=["count", "bucket_counts"],
+        )
+
+        self.assertEqual(len(record), 1)
+        self.assertEqual(record[0].count, 4)
+        self.assertEqual(
+            frappe.parse_json(record[0].bucket_counts),
+            [1, 0, 0, 0, 0, 0, 2, 0, 0, 0, 0, 0, 1],
+        )
+
+    def test_web_stages_are_flushed_after_the_request(self) -> None:
+        @timed("payload", route=TEST_ROUTE)
+        def build_payload() -> dict:
+            return {}
+
+        build_payload()
+
+        hook = "kenya_compliance.kenya_compliance.metrics.maybe_flush_metrics"
+        self.assertIn(hook, frappe.get_hooks("after_request"))
+
+        # As if the process last flushed a whole interval ago
+        with patch(
+            f"{__package__}.metrics._last_flush",
+            time.monotonic() - METRICS_FLUSH_INTERVAL_SECONDS,
+        ):
+            frappe.get_attr(hook)()
+
+        (values,) = read_hashes(
+            [get_metrics_key("total", get_series_id(("payload", TEST_ROUTE, "", "")))]
+        )
+        _, _, count, _ = parse_series(values)
+
+        self.assertEqual(count, 1)
@@ -0,0 +1,41 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from .doctype.doctype_names_mapping import ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME
+from .queues import enqueue_etims_job, get_etims_queue_status
+
+
+def job() -> None:
+    pass
+
+
+class TestQueues(FrappeTestCase):
+    """Test Cases"""
+
+    def setUp(self) -> None:
+        frappe.db.set_single_value(
+            ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME, "queue_high_water_mark", 10
+        )
+
+    def tearDown(self) -> None:
+        frappe.db.set_single_value(
+            ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME, "queue_high_water_mark", 1000
+        )
+
+    def test_jobs_are_left_pending_above_high_water_mark(self) -> None:
+        with patch("frappe.enqueue") as enqueue:
+            with patch(f"{__package__}.queues.get_queue_depth", return_value=9):
+                self.assertTrue(enqueue_etims_job(job, document_name="TEST-0001"))
+
+            with patch(f"{__package__}.queues.get_queue_depth", return_value=10):
+                self.assertFalse(enqueue_etims_job(job, document_name="TEST-0002"))
+
+                with self.assertRaises(frappe.ValidationError):
+                    enqueue_etims_job(job, throw_when_busy=True)
+
+                self.assertTrue(get_etims_queue_status()["busy"])
+
+        enqueue.assert_called_once()
+        self.assertEqual(enqueue.call_args.kwargs["document_name"], "TEST-0001")
@@ -1,19 +1,20 @@
-"""Utility functions"""
+"""Utility functions.
+
+aiohttp, ijson, qrcode and ERPNext's taxes_and_totals are imported where used, rather than here,
+as this module is loaded by document hooks in every web and worker process.
+"""
+
+from __future__ import annotations
 
 import re
 from base64 import b64encode
 from datetime import datetime, timedelta
 from decimal import ROUND_DOWN, Decimal
 from io import BytesIO
-from typing import Literal
-
-import aiohttp
-import qrcode
-from aiohttp import ClientTimeout
+from typing import TYPE_CHECKING, Callable, Generator, Literal
 
 import frappe
 from frappe.model.document import Document
-from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
 
 from .doctype.doctype_names_mapping import (
     ENVIRONMENT_SPECIFICATION_DOCTYPE_NAME,
@@ -22,6 +23,10 @@ from .doctype.doctype_names_mapping import (
     SETTINGS_DOCTYPE_NAME,
 )
 from .logger import etims_logger
+from .metrics import measure, timed
+
+if TYPE_CHECKING:
+    import aiohttp
 
 
 def is_valid_kra_pin(pin: str) -> bool:
@@ -48,6 +53,8 @@ async def make_get_request(url: str) -> dict[str, str] | str:
     Returns:
         dict: The Response
     """
+    import aiohttp
+
     async with aiohttp.ClientSession() as session:
         async with session.get(url) as response:
             if response.content_type.startswith("text"):
@@ -60,6 +67,7 @@ async def make_post_request(
     url: str,
     data: dict[str, str] | None = None,
     headers: dict[str, str | int] | None = None,
+    session: aiohttp.ClientSession | None = None,
 ) -> dict[str, str | dict]:
     """Make an Asynchronous POST Request to specified URL
 
@@ -67,16 +75,321 @@ async def make_post_request(
         url (str): The URL
         data (dict[str, str] | None, optional): Data to send to server. Defaults to None.
         headers (dict[str, str | int] | None, optional): Headers to set. Defaults to None.
+        session (aiohttp.ClientSession | None, optional): An open session to send the request through,
+            e.g. one shared by concurrent requests. A new session is created if None. Defaults to None.
 
     Returns:
         dict: The Server Response
     """
+    from aiohttp import ClientSession, ClientTimeout
+
+    if session is not None:
+        async with session.post(url, json=data, headers=headers) as response:
+            return await response.json()
+
     # TODO: Refactor to a more efficient handling of creation of the session object
     # as described in documentation
-    async with aiohttp.ClientSession(timeout=ClientTimeout(1800)) as session:
+    async with ClientSession(timeout=ClientTimeout(1800)) as session:
         # Timeout of 1800 or 30 mins, especially for fetching Item classification
+        return await make_post_request(url, data, headers, session)
+
+
+async def make_streaming_post_request(
+    url: str,
+    data: dict[str, str] | None = None,
+    headers: dict[str, str | int] | None = None,
+    *,
+    records_prefix: str,
+    on_records: Callable[[list[dict]], None],
+    chunk_size: int = 500,
+) -> dict[str, str]:
+    """Make an Asynchronous POST Request, parsing the response body as it arrives.
+
+    Records found under records_prefix are handed to on_records in chunks
+    instead of being collected, so memory use does not grow with the response size.
+
+    Args:
+        url (str): The URL
+        data (dict[str, str] | None, optional): Data to send to server. Defaults to None.
+        headers (dict[str, str | int] | None, optional): Headers to set. Defaults to None.
+        records_prefix (str): The ijson prefix of the records, e.g. data.itemClsList.item
+        on_records (Callable[[list[dict]], None]): Receives each chunk of records
+        chunk_size (int, optional): Number of records per chunk. Defaults to 500.
+
+    Returns:
+        dict[str, str]: The top-level response fields, i.e. resultCd, resultMsg and resultDt
+    """
+    import ijson
+    from aiohttp import ClientSession, ClientTimeout
+
+    envelope, records, builder = {}, [], None
+
+    async with ClientSession(timeout=ClientTimeout(1800)) as session:
         async with session.post(url, json=data, headers=headers) as response:
-            return await response.json()
+            async for prefix, event, value in ijson.parse_async(
+                response.content, use_float=True
+            ):
+                if (
+                    builder is None
+                    and prefix == records_prefix
+                    and event == "start_map"
+                ):
+                    builder = ijson.ObjectBuilder()
+
+                if builder is not None:
+                    builder.event(event, value)
+
+                    if prefix == records_prefix and event == "end_map":
+                        records.append(builder.value)
+                        builder = None
+
+                        if len(records) >= chunk_size:
+                            on_records(records)
+                            records = []
+
+                elif prefix in ("resultCd", "resultMsg", "resultDt"):
+                    envelope[prefix] = value
+
+    if records:
+        on_records(records)
+
+    return envelope
+
+
+async def make_spooled_post_request(
+    url: str,
+    data: dict[str, str] | None = None,
+    headers: dict[str, str | int] | None = None,
+    *,
+    file_path: str,
+    chunk_size: int = 65536,
+    session: aiohttp.ClientSession | None = None,
+) -> None:
+    """Make an Asynchronous POST Request, writing the response body to a file as it arrives
+
+    Args:
+        url (str): The URL
+        data (dict[str, str] | None, optional): Data to send to server. Defaults to None.
+        headers (dict[str, str | int] | None, optional): Headers to set. Defaults to None.
+        file_path (str): Path of the file to write the response body to
+        chunk_size (int, optional): Number of bytes written at a time. Defaults to 65536.
+        session (aiohttp.ClientSession | None, optional): An open session to send the request through,
+            e.g. one shared by concurrent requests. A new session is created if None. Defaults to None.
+    """
+    from aiohttp import ClientSession, ClientTimeout
+
+    if session is not None:
+        async with session.post(url, json=data, headers=headers) as response:
+            with open(file_path, "wb") as spool_file:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    spool_file.write(chunk)
+
+        return
+
+    async with ClientSession(timeout=ClientTimeout(1800)) as session:
+        await make_spooled_post_request(
+            url,
+            data,
+            headers,
+            file_path=file_path,
+            chunk_size=chunk_size,
+            session=session,
+        )
+
+
+def read_spooled_envelope(file_path: str) -> dict[str, str]:
+    """Reads the top-level response fields of a spooled response, skipping the records
+
+    Args:
+        file_path (str): Path of the spooled response
+
+    Returns:
+        dict[str, str]: The top-level response fields, i.e. resultCd, resultMsg and resultDt
+    """
+    import ijson
+
+    envelope = {}
+
+    with open(file_path, "rb") as spool_file:
+        for prefix, _, value in ijson.parse(spool_file, use_float=True):
+            if prefix in ("resultCd", "resultMsg", "resultDt"):
+                envelope[prefix] = value
+
+    return envelope
+
+
+def iter_spooled_records(
+    file_path: str, records_prefix: str, chunk_size: int = 500, skip: int = 0
+) -> Generator[list[dict], None, None]:
+    """Yields the records of a spooled response in chunks
+
+    Args:
+        file_path (str): Path of the spooled response
+        records_prefix (str): The ijson prefix of the records, e.g. data.itemClsList.item
+        chunk_size (int, optional): Number of records per chunk. Defaults to 500.
+        skip (int, optional): Number of leading records to skip, i.e. those already processed. Defaults to 0.
+
+    Yields:
+        list[dict]: A chunk of records
+    """
+    import ijson
+
+    records = []
+
+    with open(file_path, "rb") as spool_file:
+        for index, record in enumerate(
+            ijson.items(spool_file, records_prefix, use_float=True)
+        ):
+            if index < skip:
+                continue
+
+            records.append(record)
+
+            if len(records) >= chunk_size:
+                yield records
+                records = []
+
+    if records:
+        yield records
+
+
+def iter_pending_records(
+    doctype: str,
+    filters: dict[str, int | str | list],
+    batch_size: int = 500,
+    max_records: int = 5000,
+    start: tuple[datetime, str] | None = None,
+) -> Generator[list[dict], None, None]:
+    """Yields records matching filters in batches, paging by (modified, name).
+
+    Keyset pagination lets each batch seek from the previous one on an index ending in modified,
+    e.g. those created by create_etims_indexes, instead of scanning and sorting the whole table.
+
+    Args:
+        doctype (str): The doctype to sweep
+        filters (dict[str, int | str | list]): Equality filters, e.g. {"docstatus": 1, "custom_submitted_successfully": 0}.
+            A list value matches any of its values, a None in the list also matching NULL.
+        batch_size (int, optional): Number of records per batch. Defaults to 500.
+        max_records (int, optional): Maximum number of records yielded in a sweep. Defaults to 5000.
+        start (tuple[datetime, str] | None, optional): The (modified, name) to continue after.
+            The sweep starts from the oldest record if None. Defaults to None.
+
+    Yields:
+        list[dict]: A batch of records, with their name and modified fields
+    """
+    conditions = " AND ".join(
+        get_filter_condition(field, value) for field, value in filters.items()
+    )
+    query = f"""
+        SELECT name, modified
+        FROM `tab{doctype}`
+        WHERE {conditions}
+            AND (
+                modified > %(last_modified)s
+                OR (modified = %(last_modified)s AND name > %(last_name)s)
+            )
+        ORDER BY modified, name
+        LIMIT %(batch_size)s
+        """
+    last_modified, last_name = start or (datetime.min, "")
+    values = {**filters, "last_modified": last_modified, "last_name": last_name}
+    swept_records = 0
+
+    while swept_records < max_records:
+        values["batch_size"] = min(batch_size, max_records - swept_records)
+        records = frappe.db.sql(query, values, as_dict=True)
+
+        if not records:
+            return
+
+        yield records
+
+        swept_records += len(records)
+        values["last_modified"], values["last_name"] = (
+            records[-1].modified,
+            records[-1].name,
+        )
+
+
+def get_filter_condition(field: str, value: int | str | list) -> str:
+    if not isinstance(value, list):
+        return f"`{field}` = %({field})s"
+
+    condition = f"`{field}` IN %({field})s"
+
+    if None in value:
+        condition = f"({condition} OR `{field}` IS NULL)"
+
+    return condition
+
+
+def get_documents_in_bulk(
+    doctype: str, names: list[str], table_fields: tuple[str, ...] = ()
+) -> list[frappe._dict]:
+    """Loads records, along with the given child tables, in one query per table.
+    This avoids loading each record with frappe.get_doc when building payloads for many records.
+
+    The records are returned as frappe._dict objects, without running any controller code.
+
+    Args:
+        doctype (str): The doctype of the records
+        names (list[str]): The record names
+        table_fields (tuple[str, ...], optional): Fieldnames of the child tables to load,
+            e.g. ("items", "taxes"). Defaults to ().
+
+    Returns:
+        list[frappe._dict]: The records, in the order of names
+    """
+    if not names:
+        return []
+
+    records = {
+        record.name: record
+        for record in frappe.get_all(
+            doctype, filters={"name": ("in", names)}, fields=["*"]
+        )
+    }
+    meta = frappe.get_meta(doctype)
+
+    for record in records.values():
+        record.doctype = doctype
+
+    for fieldname in table_fields:
+        for record in records.values():
+            record[fieldname] = []
+
+        for row in frappe.get_all(
+            meta.get_field(fieldname).options,
+            filters={
+                "parent": ("in", names),
+                "parenttype": doctype,
+                "parentfield": fieldname,
+            },
+            fields=["*"],
+            order_by="idx",
+        ):
+            records[row.parent][fieldname].append(row)
+
+    return [records[name] for name in names if name in records]
+
+
+def insert_many(statement: str, rows: list[tuple], on_duplicate: str = "") -> None:
+    """Inserts rows with a single multi-row VALUES statement
+
+    Args:
+        statement (str): The INSERT clause, with its column list
+        rows (list[tuple]): The values of each row
+        on_duplicate (str, optional): An ON DUPLICATE KEY UPDATE clause. Defaults to "".
+    """
+    if not rows:
+        return
+
+    row_placeholder = f"({', '.join(['%s'] * len(rows[0]))})"
+
+    frappe.db.sql(
+        f"{statement} VALUES {', '.join([row_placeholder] * len(rows))} {on_duplicate}",
+        tuple(value for row in rows for value in row),
+    )
 
 
 def build_datetime_from_string(
@@ -109,6 +422,7 @@ def is_valid_url(url: str) -> bool:
     return bool(re.match(pattern, url))
 
 
+@timed("route_lookup")
 def get_route_path(
     search_field: str,
     routes_table_doctype: str = ROUTES_TABLE_CHILD_DOCTYPE_NAME,
@@ -214,14 +528,46 @@ def build_headers(company_name: str, branch_id: str = "00") -> dict[str, str] |
     settings = get_curr_env_etims_settings(company_name, branch_id=branch_id)
 
     if settings:
-        headers = {
-            "tin": settings.get("tin"),
-            "bhfId": settings.get("bhfid"),
-            "cmcKey": settings.get("communication_key"),
-            "Content-Type": "application/json",
-        }
+        return build_headers_from_settings(settings)
+
 
-        return headers
+def build_headers_from_settings(settings: dict) -> dict[str, str]:
+    """Builds the request headers from an already fetched settings record
+
+    Args:
+        settings (dict): The settings record, with tin, bhfid and communication_key fields
+
+    Returns:
+        dict[str, str]: The request headers
+    """
+    return {
+        "tin": settings.get("tin"),
+        "bhfId": settings.get("bhfid"),
+        "cmcKey": settings.get("communication_key"),
+        "Content-Type": "application/json",
+    }
+
+
+def get_active_branch_settings() -> list[dict]:
+    """Fetches the active settings record of every branch in the current environment
+
+    Returns:
+        list[dict]: The settings records
+    """
+    return frappe.get_all(
+        SETTINGS_DOCTYPE_NAME,
+        filters={"is_active": 1, "env": get_current_environment_state()},
+        fields=[
+            "name",
+            "company",
+            "bhfid",
+            "server_url",
+            "tin",
+            "communication_key",
+            "shard_size",
+            "shard_concurrency",
+        ],
+    )
 
 
 def extract_document_series_number(document: Document) -> int | None:
@@ -234,6 +580,7 @@ def extract_document_series_number(document: Document) -> int | None:
         return int(split_invoice_name[-2])
 
 
+@timed("payload", route="TrnsSalesSaveWrReq")
 def build_invoice_payload(
     invoice: Document, invoice_type_identifier: Literal["S", "C"], company_name: str
 ) -> dict[str, str | int]:
@@ -269,7 +616,8 @@ def build_invoice_payload(
     payload = {
         # FIXME: Use document's naming series to get invcNo and not etims_serial_number field
         # FIXME: The document's number series should be based off of the branch. Switching branches should reset the number series
-        "invcNo": frappe.db.get_value(
+        "invcNo": invoice.get("etims_serial_number")
+        or frappe.db.get_value(
             "Sales Invoice", {"name": invoice.name}, ["etims_serial_number"]
         ),
         "orgInvcNo": (
@@ -343,6 +691,8 @@ def get_invoice_items_list(invoice: Document) -> list[dict[str, str | int | None
     Returns:
         list[dict[str, str | int | None]]: The parsed data as a list of dictionaries
     """
+    from erpnext.controllers.taxes_and_totals import get_itemised_tax_breakup_data
+
     # FIXME: Handle cases where same item can appear on different lines with different rates etc.
     item_taxes = get_itemised_tax_breakup_data(invoice)
     items_list = []
@@ -401,9 +751,12 @@ def update_last_request_date(
     )
 
     doc.save()
-    frappe.db.commit()
+
+    with measure("commit", route=route.strip("/")):
+        frappe.db.commit()
 
 
+@timed("settings_lookup")
 def get_curr_env_etims_settings(
     company_name: str, branch_id: str = "00"
 ) -> Document | None:
@@ -451,6 +804,8 @@ def add_file_info(data: str) -> str:
 
 def get_qr_code_bytes(data: bytes | str, format: str = "PNG") -> bytes:
     """Create a QR code and return the bytes."""
+    import qrcode
+
     img = qrcode.make(data)
 
     buffered = BytesIO()